@@ -0,0 +1,53 @@
+#!/usr/bin/env python
+from __future__ import unicode_literals, print_function
+
+# Benchmark AES-128-CBC decryption throughput of the available backends of
+# youtube_dl/aes.py against the int list reference implementation.
+#
+# Usage: devscripts/bench_aes.py [SIZE_KB]
+
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from youtube_dl.aes import AES_BACKENDS, aes_decrypt, key_expansion, xor
+from youtube_dl.utils import bytes_to_intlist, intlist_to_bytes
+
+
+def reference_cbc_decrypt(data, key, iv):
+    # The per-byte implementation aes_cbc_decrypt used before the backends
+    data = bytes_to_intlist(data)
+    expanded_key = key_expansion(bytes_to_intlist(key))
+    decrypted_data = []
+    previous_cipher_block = bytes_to_intlist(iv)
+    for i in range(0, len(data), 16):
+        block = data[i:i + 16]
+        decrypted_data += xor(aes_decrypt(block, expanded_key), previous_cipher_block)
+        previous_cipher_block = block
+    return intlist_to_bytes(decrypted_data)
+
+
+def main():
+    size = (int(sys.argv[1]) if len(sys.argv) > 1 else 256) * 1024
+    data = os.urandom(size)
+    key = os.urandom(16)
+    iv = os.urandom(16)
+
+    def bench(name, decrypt):
+        start = time.time()
+        result = decrypt(data, key, iv)
+        elapsed = time.time() - start
+        print('%-14s %10.1f KiB/s' % (name, size / 1024.0 / elapsed))
+        return result
+
+    expected = bench('reference', reference_cbc_decrypt)
+    for backend in AES_BACKENDS:
+        result = bench(backend.name, lambda d, k, i: backend.cbc_decrypt(k, i, d))
+        if result != expected:
+            print('%s: result mismatch' % backend.name)
+
+
+if __name__ == '__main__':
+    main()
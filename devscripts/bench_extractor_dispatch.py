@@ -0,0 +1,67 @@
+#!/usr/bin/env python
+from __future__ import unicode_literals, print_function
+
+# Benchmark extractor lookup by URL: the literal index of
+# youtube_dl/extractor/dispatch.py against a linear scan of suitable().
+#
+# Usage: devscripts/bench_extractor_dispatch.py [ROUNDS]
+
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from youtube_dl.extractor import gen_extractor_classes, gen_extractors
+from youtube_dl.extractor.dispatch import ExtractorDispatcher
+
+
+def linear_find(ies, url):
+    for ie in ies:
+        if ie.suitable(url):
+            return ie
+
+
+def main():
+    rounds = int(sys.argv[1]) if len(sys.argv) > 1 else 3
+    ies = gen_extractor_classes()
+    urls = [
+        tc['url']
+        for ie in gen_extractors()
+        for tc in ie.get_testcases(include_onlymatching=True)]
+
+    start = time.time()
+    dispatcher = ExtractorDispatcher(ies)
+    build_time = time.time() - start
+
+    # Warm up regular expression caches so that only lookups are measured
+    for url in urls:
+        linear_find(ies, url)
+
+    mismatches = 0
+    for url in urls:
+        if linear_find(ies, url) is not dispatcher.find(url):
+            mismatches += 1
+
+    def bench(find):
+        best = None
+        for _ in range(rounds):
+            start = time.time()
+            for url in urls:
+                find(url)
+            elapsed = time.time() - start
+            best = elapsed if best is None else min(best, elapsed)
+        return best
+
+    linear_time = bench(lambda url: linear_find(ies, url))
+    index_time = bench(dispatcher.find)
+
+    print('%d extractors, %d URLs, %d mismatches' % (len(ies), len(urls), mismatches))
+    print('index build:  %8.1f ms' % (build_time * 1000))
+    print('linear scan:  %8.1f us/URL' % (linear_time / len(urls) * 1e6))
+    print('index lookup: %8.1f us/URL (%.1fx)' % (
+        index_time / len(urls) * 1e6, linear_time / index_time))
+
+
+if __name__ == '__main__':
+    main()
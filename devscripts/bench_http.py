@@ -0,0 +1,119 @@
+#!/usr/bin/env python
+from __future__ import unicode_literals, print_function
+
+# Benchmark HttpFD throughput and CPU usage against a local HTTP server
+# running in a separate process, with the readinto() read loop and
+# coalesced progress updates ("current") and with read() and a progress hook
+# call per block as before ("legacy").
+#
+# Usage: devscripts/bench_http.py [SIZE_MB [BUFFER_SIZE_KB]]
+#
+# With BUFFER_SIZE_KB the block size is fixed (--no-resize-buffer), which
+# shows the per-block overhead better than the default of resizing blocks
+# up to 4 MiB.
+
+import os
+import subprocess
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from youtube_dl import YoutubeDL
+from youtube_dl.compat import compat_http_server
+from youtube_dl.downloader.http import HttpFD
+
+
+class BenchRequestHandler(compat_http_server.BaseHTTPRequestHandler):
+    def log_message(self, format, *args):
+        pass
+
+    def do_GET(self):
+        size = self.server.size
+        block = b'\0' * (1024 * 1024)
+        self.send_response(200)
+        self.send_header('Content-Type', 'application/octet-stream')
+        self.send_header('Content-Length', str(size))
+        self.end_headers()
+        while size > 0:
+            self.wfile.write(block[:size])
+            size -= len(block)
+
+
+def serve(size):
+    httpd = compat_http_server.HTTPServer(('127.0.0.1', 0), BenchRequestHandler)
+    httpd.size = size
+    print(httpd.socket.getsockname()[1])
+    sys.stdout.flush()
+    httpd.serve_forever()
+
+
+class ReadOnlyResponse(object):
+    # Hides readinto() of the response
+    def __init__(self, response):
+        self._response = response
+
+    def __getattr__(self, name):
+        if name == 'readinto':
+            raise AttributeError(name)
+        return getattr(self._response, name)
+
+
+class Logger(object):
+    def debug(self, msg):
+        pass
+
+    warning = error = debug
+
+
+def bench(name, url, size, buffersize, legacy):
+    params = {'logger': Logger(), 'quiet': True, 'noprogress': True}
+    if legacy:
+        params['progress_rate'] = 0
+    if buffersize:
+        params.update({'buffersize': buffersize, 'noresizebuffer': True})
+    ydl = YoutubeDL(params)
+    hook_calls = []
+    if legacy:
+        urlopen = ydl.urlopen
+        ydl.urlopen = lambda req: ReadOnlyResponse(urlopen(req))
+    downloader = HttpFD(ydl, params)
+    downloader.add_progress_hook(lambda d: hook_calls.append(d['status']))
+    fd, filename = tempfile.mkstemp(suffix='.bin')
+    os.close(fd)
+    os.remove(filename)
+    try:
+        cpu_start = sum(os.times()[:2])
+        start = time.time()
+        downloader.real_download(filename, {'url': url})
+        elapsed = time.time() - start
+        cpu = sum(os.times()[:2]) - cpu_start
+        assert os.path.getsize(filename) == size
+    finally:
+        os.remove(filename)
+    print('%-8s %8.1f MB/s %6.1f%% CPU %6.2f CPU s/GB %8d progress hook calls' % (
+        name, size / 1048576.0 / elapsed, cpu * 100 / elapsed,
+        cpu * 1073741824 / size, len(hook_calls)))
+
+
+def main():
+    if len(sys.argv) > 2 and sys.argv[1] == '--serve':
+        serve(int(sys.argv[2]))
+        return
+    size = (int(sys.argv[1]) if len(sys.argv) > 1 else 256) * 1024 * 1024
+    buffersize = int(sys.argv[2]) * 1024 if len(sys.argv) > 2 else None
+    server = subprocess.Popen(
+        [sys.executable, os.path.abspath(__file__), '--serve', str(size)],
+        stdout=subprocess.PIPE)
+    try:
+        url = 'http://127.0.0.1:%d/' % int(server.stdout.readline())
+        bench('legacy', url, size, buffersize, True)
+        bench('current', url, size, buffersize, False)
+    finally:
+        server.terminate()
+        server.wait()
+
+
+if __name__ == '__main__':
+    main()
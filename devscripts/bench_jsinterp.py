@@ -0,0 +1,95 @@
+#!/usr/bin/env python
+from __future__ import unicode_literals, print_function
+
+# Benchmark JSInterpreter function calls: functions compiled once into
+# closures against interpreting their statements on every call.
+#
+# Player files downloaded by test/test_youtube_signature.py into test/testdata
+# are benchmarked as well.
+#
+# Usage: devscripts/bench_jsinterp.py [ROUNDS]
+
+import glob
+import io
+import os
+import string
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from test.helper import FakeYDL
+from youtube_dl.extractor import YoutubeIE
+from youtube_dl.jsinterp import JSInterpreter, _CompileError
+
+
+class LegacyJSInterpreter(JSInterpreter):
+    def _compile_function(self, argnames, code):
+        raise _CompileError('Compilation disabled')
+
+
+# (code, function name, arguments), mostly from test/test_jsinterp.py
+CASES = [
+    ('function x4(a){return 2*a+1;}', 'x4', (3, )),
+    ('function $_xY1 ($_axY1) { var $_axY2 = $_axY1 + 1; return $_axY2; }', '$_xY1', (20, )),
+    ('function f(){var x = [1,2,3]; x[0] = 4; x[0] = 5; x[2] = 7; return x;}', 'f', ()),
+    ('function f(){return (1) + (2) * ((( (( (((((3)))))) )) ));}', 'f', ()),
+    ('function f(){var x = 20; x += 30 + 1; return x;}', 'f', ()),
+    ('function x() {var a = [10, 20, 30, 40, 50]; var b = 6; a[0]=a[b%a.length]; return a;}', 'x', ()),
+    ('function x() { return 2; } function y(a) { return x() + a; } function z() { return y(3); }', 'z', ()),
+    ('var Xy={ab:function(a,b){a.splice(0,b)},cd:function(a){a.reverse()},'
+     'ef:function(a,b){var c=a[0];a[0]=a[b%a.length];a[b%a.length]=c}};'
+     'sig=function(a){a=a.split("");Xy.cd(a,63);Xy.ef(a,12);Xy.ab(a,3);Xy.ef(a,41);'
+     'Xy.cd(a,21);Xy.ef(a,7);Xy.ab(a,1);return a.join("")};', 'sig', (string.printable[:86], )),
+]
+
+
+def bench(func, args, rounds):
+    best = None
+    for _ in range(rounds):
+        start = time.time()
+        for _ in range(100):
+            func(list(args))
+        elapsed = (time.time() - start) / 100
+        best = elapsed if best is None else min(best, elapsed)
+    return best
+
+
+def main():
+    rounds = int(sys.argv[1]) if len(sys.argv) > 1 else 5
+    cases = [
+        (code[:40], lambda cls, code=code, name=name: cls(code).extract_function(name), args)
+        for code, name, args in CASES]
+
+    testdata = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'test', 'testdata')
+    ie = YoutubeIE(FakeYDL())
+    for fn in sorted(glob.glob(os.path.join(testdata, 'player-*.js'))):
+        with io.open(fn, encoding='utf-8') as f:
+            jscode = f.read()
+        funcname = ie._search_regex(
+            r'(?P<sig>[a-zA-Z0-9$]+)\s*=\s*function\(\s*a\s*\)\s*{\s*a\s*=\s*a\.split\(\s*""\s*\)',
+            jscode, 'signature function name', default=None)
+        if funcname:
+            cases.append((
+                os.path.basename(fn),
+                lambda cls, jscode=jscode, funcname=funcname: cls(jscode).extract_function(funcname),
+                (string.printable[:86], )))
+
+    total_legacy = total_compiled = 0
+    for name, make, args in cases:
+        legacy = make(LegacyJSInterpreter)
+        compiled = make(JSInterpreter)
+        if legacy(list(args)) != compiled(list(args)):
+            print('%-42s result mismatch' % name)
+        legacy_time = bench(legacy, args, rounds)
+        compiled_time = bench(compiled, args, rounds)
+        total_legacy += legacy_time
+        total_compiled += compiled_time
+        print('%-42s %8.1f us -> %8.1f us (%.1fx)' % (
+            name, legacy_time * 1e6, compiled_time * 1e6, legacy_time / compiled_time))
+    print('%-42s %8.1f us -> %8.1f us (%.1fx)' % (
+        'total', total_legacy * 1e6, total_compiled * 1e6, total_legacy / total_compiled))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,112 @@
+#!/usr/bin/env python
+from __future__ import unicode_literals, print_function
+
+# Benchmark turning an m3u8 media playlist into the fragments HlsFD
+# downloads: the two line-scanning passes HlsFD used to make ("legacy"),
+# parse_m3u8() followed by HlsFD._build_fragments() ("parse + build") and
+# _build_fragments() alone, for playlists the extractor has already parsed
+# ("build").
+#
+# Usage: devscripts/bench_m3u8.py [SEGMENTS]
+
+import binascii
+import os
+import re
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from youtube_dl import YoutubeDL
+from youtube_dl.compat import compat_urlparse
+from youtube_dl.downloader.hls import HlsFD
+from youtube_dl.m3u8 import parse_m3u8
+from youtube_dl.utils import parse_m3u8_attributes
+
+
+def make_playlist(segments):
+    lines = [
+        '#EXTM3U',
+        '#EXT-X-TARGETDURATION:6',
+        '#EXT-X-MEDIA-SEQUENCE:0',
+    ]
+    for i in range(segments):
+        if i % 1000 == 0:
+            lines.append('#EXT-X-KEY:METHOD=AES-128,URI="key%d.bin",IV=0x%032x' % (i, i))
+        lines.extend(['#EXTINF:6.006,', 'segment-%05d.ts?token=abcdef' % i])
+    lines.append('#EXT-X-ENDLIST')
+    return '\n'.join(lines)
+
+
+def legacy_fragments(s, man_url):
+    # The counting and parsing passes of HlsFD.real_download before
+    # youtube_dl/m3u8.py, without ad markers
+    media_frags = 0
+    for line in s.splitlines():
+        line = line.strip()
+        if not line or line.startswith('#'):
+            continue
+        media_frags += 1
+
+    media_sequence = 0
+    decrypt_info = {'METHOD': 'NONE'}
+    frag_index = 0
+    fragments = []
+    for line in s.splitlines():
+        line = line.strip()
+        if line:
+            if not line.startswith('#'):
+                frag_index += 1
+                frag_url = (
+                    line
+                    if re.match(r'^https?://', line)
+                    else compat_urlparse.urljoin(man_url, line))
+                fragments.append({
+                    'frag_index': frag_index,
+                    'url': frag_url,
+                    'headers': None,
+                    'decrypt_info': decrypt_info,
+                    'media_sequence': media_sequence,
+                })
+                media_sequence += 1
+            elif line.startswith('#EXT-X-KEY'):
+                decrypt_info = parse_m3u8_attributes(line[11:])
+                if decrypt_info['METHOD'] == 'AES-128':
+                    if 'IV' in decrypt_info:
+                        decrypt_info['IV'] = binascii.unhexlify(decrypt_info['IV'][2:].zfill(32))
+                    if not re.match(r'^https?://', decrypt_info['URI']):
+                        decrypt_info['URI'] = compat_urlparse.urljoin(
+                            man_url, decrypt_info['URI'])
+            elif line.startswith('#EXT-X-MEDIA-SEQUENCE'):
+                media_sequence = int(line[22:])
+    return fragments
+
+
+def main():
+    segments = int(sys.argv[1]) if len(sys.argv) > 1 else 10000
+    doc = make_playlist(segments)
+    man_url = 'https://example.com/hls/video/index.m3u8'
+    downloader = HlsFD(YoutubeDL({'quiet': True}), {})
+    info_dict = {'url': man_url}
+    playlist = parse_m3u8(doc, man_url)
+
+    def bench(name, func, runs=5):
+        best = None
+        for _ in range(runs):
+            start = time.time()
+            result = func()
+            elapsed = time.time() - start
+            best = elapsed if best is None else min(best, elapsed)
+        print('%-14s %8.1f ms %10.0f segments/s' % (name, best * 1000, segments / best))
+        return result
+
+    expected = bench('legacy', lambda: legacy_fragments(doc, man_url))
+    for name, func in (
+            ('parse + build', lambda: downloader._build_fragments(parse_m3u8(doc, man_url), info_dict)),
+            ('build', lambda: downloader._build_fragments(playlist, info_dict))):
+        if bench(name, func) != expected:
+            print('%s: fragments mismatch' % name)
+
+
+if __name__ == '__main__':
+    main()
@@ -16,6 +16,7 @@ if os.path.exists(lazy_extractors_filename):
 
 from youtube_dl.extractor import _ALL_CLASSES
 from youtube_dl.extractor.common import InfoExtractor, SearchInfoExtractor
+from youtube_dl.extractor.dispatch import url_literals
 
 with open('devscripts/lazy_load_template.py', 'rt') as f:
     module_template = f.read()
@@ -28,6 +29,7 @@ ie_template = '''
 class {name}({bases}):
     _VALID_URL = {valid_url!r}
     _module = '{module}'
+    _URL_LITERALS = {url_literals!r}
 '''
 
 make_valid_template = '''
@@ -52,7 +54,8 @@ def build_lazy_ie(ie, name):
         name=name,
         bases=', '.join(map(get_base_name, ie.__bases__)),
         valid_url=valid_url,
-        module=ie.__module__)
+        module=ie.__module__,
+        url_literals=url_literals(ie))
     if ie.suitable.__func__ is not InfoExtractor.suitable.__func__:
         s += '\n' + getsource(ie.suitable)
     if hasattr(ie, '_make_valid_url'):
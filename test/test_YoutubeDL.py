@@ -10,14 +10,22 @@ import unittest
 sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 
 import copy
+import threading
+import time
 
-from test.helper import FakeYDL, assertRegexpMatches
+from test.helper import FakeYDL, assertRegexpMatches, try_rm
 from youtube_dl import YoutubeDL
 from youtube_dl.compat import compat_str, compat_urllib_error
 from youtube_dl.extractor import YoutubeIE
 from youtube_dl.extractor.common import InfoExtractor
+from youtube_dl.postprocessor import ExecAfterDownloadPP
 from youtube_dl.postprocessor.common import PostProcessor
-from youtube_dl.utils import ExtractorError, match_filter_func
+from youtube_dl.utils import (
+    ExtractorError,
+    OnDemandPagedList,
+    PostProcessingError,
+    match_filter_func,
+)
 
 TEST_URL = 'http://localhost/sample.mp4'
 
@@ -713,6 +721,91 @@ class TestYoutubeDL(unittest.TestCase):
         self.assertTrue(os.path.exists(filename), '%s doesn\'t exist' % filename)
         os.unlink(filename)
 
+    def test_postprocessor_workers(self):
+        lock = threading.Lock()
+        events = []
+
+        class SlowPP(PostProcessor):
+            def run(self, info):
+                # The first files take the longest
+                time.sleep(0.05 * (4 - info['id']))
+                if info['id'] == 2:
+                    raise PostProcessingError('failed')
+                with lock:
+                    events.append(('pp', info['id']))
+                return [], info
+
+        class ExecPP(ExecAfterDownloadPP):
+            def run(self, info):
+                with lock:
+                    events.append(('exec', info['id']))
+                return [], info
+
+        ydl = YoutubeDL({'postprocessor_workers': 4, 'ignoreerrors': True, 'quiet': True})
+        ydl.add_post_processor(SlowPP())
+        ydl.add_post_processor(ExecPP(None, 'true'))
+        ydl.record_download_archive = lambda info: events.append(('archive', info['id']))
+        ydl.to_stderr = lambda message: None
+        for i in range(4):
+            ydl._post_process_in_background('file%d' % i, {'id': i})
+        ydl._wait_for_postprocessors()
+        self.assertEqual(
+            sorted(e for e in events if e[0] == 'pp'),
+            [('pp', 0), ('pp', 1), ('pp', 3)])
+        self.assertEqual([e for e in events if e[0] != 'pp'], [
+            ('exec', 0), ('archive', 0), ('exec', 1), ('archive', 1),
+            ('exec', 2), ('archive', 2), ('exec', 3), ('archive', 3)])
+        # The files were post-processed concurrently, the quickest first
+        self.assertEqual(events[0], ('pp', 3))
+        self.assertEqual(ydl._download_retcode, 1)
+
+    def test_postprocessor_workers_exit(self):
+        archive_fn = 'postprocessor-workers-archive.txt'
+        try_rm(archive_fn)
+
+        class SlowPP(PostProcessor):
+            def run(self, info):
+                time.sleep(0.1)
+                return [], info
+
+        try:
+            with YoutubeDL({
+                    'postprocessor_workers': 2,
+                    'download_archive': archive_fn,
+                    'quiet': True}) as ydl:
+                ydl.add_post_processor(SlowPP())
+                for i in range(3):
+                    ydl._post_process_in_background(
+                        'file%d' % i, {'id': '%d' % i, 'extractor_key': 'Test'})
+            # Leaving the context waits for the postprocessors
+            with open(archive_fn) as f:
+                self.assertEqual(f.read(), 'test 0\ntest 1\ntest 2\n')
+        finally:
+            try_rm(archive_fn)
+
+    def test_in_process_fields(self):
+        playlist = {'segments': [{'url': 'http://localhost/seg0.ts'}]}
+        info = {
+            'id': '1',
+            'title': 'Title',
+            'formats': [{'url': 'http://localhost/index.m3u8', 'hls_playlist': playlist}],
+        }
+        info['requested_formats'] = info['formats']
+        expected = {
+            'id': '1',
+            'title': 'Title',
+            'formats': [{'url': 'http://localhost/index.m3u8'}],
+        }
+        self.assertEqual(YoutubeDL.filter_requested_info(info), expected)
+        # The info dict is left as it is for the downloader
+        self.assertEqual(info['formats'][0]['hls_playlist'], playlist)
+
+        ydl = YoutubeDL({'forcejson': True})
+        output = []
+        ydl.to_stdout = output.append
+        ydl._YoutubeDL__forced_printings(info, None, incomplete=False)
+        self.assertTrue('hls_playlist' not in output[0])
+
     def test_match_filter(self):
         class FilterYDL(YDL):
             def __init__(self, *args, **kwargs):
@@ -880,6 +973,85 @@ class TestYoutubeDL(unittest.TestCase):
         self.assertEqual(result[1]['playlist_index'], 2)
         # @}
 
+    def test_lazy_playlist(self):
+        fetched = []
+
+        def get_page(pagenum):
+            fetched.append(pagenum)
+            for i in range(pagenum * 3 + 1, min(pagenum * 3 + 4, 11)):
+                yield {'id': compat_str(i), 'title': compat_str(i), 'url': TEST_URL}
+
+        def entries():
+            for i in range(1, 11):
+                fetched.append(i)
+                yield {'id': compat_str(i), 'title': compat_str(i), 'url': TEST_URL}
+
+        class LazyYDL(YDL):
+            def process_info(self, info_dict):
+                # Pages and entries fetched so far
+                info_dict['_fetched'] = list(fetched)
+                super(LazyYDL, self).process_info(info_dict)
+
+        def process(ie_entries, params):
+            del fetched[:]
+            ydl = LazyYDL(dict(params, lazy_playlist=True))
+            res = ydl.process_ie_result({
+                '_type': 'playlist',
+                'id': 'test',
+                'entries': ie_entries,
+                'extractor': 'test:playlist',
+                'extractor_key': 'test:playlist',
+                'webpage_url': 'http://example.com',
+            })
+            return ydl.downloaded_info_dicts, res
+
+        infos, res = process(OnDemandPagedList(get_page, 3), {})
+        self.assertEqual([int(v['id']) for v in infos], list(range(1, 11)))
+        self.assertEqual([v['playlist_index'] for v in infos], list(range(1, 11)))
+        self.assertEqual(infos[0]['_fetched'], [0])
+        self.assertEqual(infos[3]['_fetched'], [0, 1])
+        self.assertEqual(res['entries'], [])
+        self.assertEqual(infos[0]['n_entries'], None)
+
+        infos, _ = process(entries(), {'playlist_items': '2,5-6'})
+        self.assertEqual([v['playlist_index'] for v in infos], [2, 5, 6])
+        self.assertEqual(infos[0]['_fetched'], [1, 2])
+        self.assertEqual(fetched, list(range(1, 7)))
+
+        infos, _ = process(entries(), {'playlist_items': '6,2'})
+        self.assertEqual([v['playlist_index'] for v in infos], [6, 2])
+
+        infos, _ = process(OnDemandPagedList(get_page, 3), {'playliststart': 5, 'playlistend': 7})
+        self.assertEqual([v['playlist_index'] for v in infos], [5, 6, 7])
+
+        # Reversing needs the whole playlist
+        infos, _ = process(entries(), {'playlistreverse': True})
+        self.assertEqual([int(v['id']) for v in infos], list(range(10, 0, -1)))
+        self.assertEqual(infos[0]['n_entries'], 10)
+
+    def test_playlist_jobs(self):
+        entries = [{
+            'id': compat_str(i),
+            'title': compat_str(i),
+            'url': TEST_URL,
+        } for i in range(1, 9)]
+        playlist = {
+            '_type': 'playlist',
+            'id': 'test',
+            'entries': entries,
+            'extractor': 'test:playlist',
+            'extractor_key': 'test:playlist',
+            'webpage_url': 'http://example.com',
+        }
+        ydl = YDL({'jobs': 4, 'playlist_items': '2-8'})
+        res = ydl.process_ie_result(copy.deepcopy(playlist))
+        self.assertEqual(
+            sorted(int(v['id']) for v in ydl.downloaded_info_dicts),
+            list(range(2, 9)))
+        # Results keep the playlist order
+        self.assertEqual(
+            [v['playlist_index'] for v in res['entries']], list(range(2, 9)))
+
     def test_urlopen_no_file_protocol(self):
         # see https://github.com/ytdl-org/youtube-dl/issues/8227
         ydl = YDL()
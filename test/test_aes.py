@@ -8,9 +8,11 @@ import sys
 import unittest
 sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 
-from youtube_dl.aes import aes_decrypt, aes_encrypt, aes_cbc_decrypt, aes_cbc_encrypt, aes_decrypt_text
+from youtube_dl.aes import aes_decrypt, aes_encrypt, aes_cbc_decrypt, aes_cbc_encrypt, aes_decrypt_text, key_expansion, AES_BACKENDS
 from youtube_dl.utils import bytes_to_intlist, intlist_to_bytes
 import base64
+import binascii
+import random
 
 # the encrypted data can be generate with 'devscripts/generate_aes_testdata.py'
 
@@ -58,6 +60,37 @@ class TestAES(unittest.TestCase):
         decrypted = (aes_decrypt_text(encrypted, password, 32))
         self.assertEqual(decrypted, self.secret_msg)
 
+    def test_backends(self):
+        # FIPS-197 appendix C
+        plaintext = binascii.unhexlify('00112233445566778899aabbccddeeff')
+        key = bytes(bytearray(range(32)))
+        expected = {
+            16: '69c4e0d86a7b0430d8cdb78070b4c55a',
+            24: 'dda97ca4864cdfe06eaf70a0ec0d7191',
+            32: '8ea2b7ca516745bfeafc49904b496089',
+        }
+        rng = random.Random(0)
+        data = bytes(bytearray(rng.randrange(256) for _ in range(16 * 20 + 5)))
+        iv = bytes(bytearray(rng.randrange(256) for _ in range(16)))
+        for backend in AES_BACKENDS:
+            for key_size, ciphertext in expected.items():
+                self.assertEqual(
+                    binascii.hexlify(backend.ecb_encrypt(key[:key_size], plaintext)).decode('ascii'),
+                    ciphertext, '%s %d' % (backend.name, key_size))
+                # Compare with the reference implementation, including an
+                # incomplete last block
+                expanded_key = key_expansion(bytes_to_intlist(key[:key_size]))
+                reference = []
+                previous_block = bytes_to_intlist(iv)
+                for i in range(0, len(data), 16):
+                    block = bytes_to_intlist(data[i:i + 16])
+                    block += [0] * (16 - len(block))
+                    reference += [x ^ y for x, y in zip(aes_decrypt(block, expanded_key), previous_block)]
+                    previous_block = block
+                self.assertEqual(
+                    backend.cbc_decrypt(key[:key_size], iv, data),
+                    intlist_to_bytes(reference[:len(data)]), '%s %d' % (backend.name, key_size))
+
 
 if __name__ == '__main__':
     unittest.main()
@@ -17,6 +17,7 @@ from youtube_dl.extractor import (
     gen_extractors,
     YoutubeIE,
 )
+from youtube_dl.extractor.dispatch import ExtractorDispatcher
 
 
 class TestAllURLsMatching(unittest.TestCase):
@@ -112,6 +113,16 @@ class TestAllURLsMatching(unittest.TestCase):
         self.assertMatch('http://video.pbs.org/viralplayer/2365173446/', ['pbs'])
         self.assertMatch('http://video.pbs.org/widget/partnerplayer/980042464/', ['pbs'])
 
+    def test_dispatcher(self):
+        dispatcher = ExtractorDispatcher(self.ies)
+        urls = [tc['url'] for tc in gettestcases(include_onlymatching=True)]
+        urls.extend((':ytsubs', 'PLtS2H6bU1M', 'BaW_jenozKc', 'ytsearch5:youtube-dl'))
+        for url in urls:
+            expected = next(ie for ie in self.ies if ie.suitable(url))
+            self.assertEqual(
+                type(dispatcher.find(url)).__name__, type(expected).__name__,
+                'Dispatch mismatch for URL %r' % url)
+
     def test_no_duplicated_ie_names(self):
         name_accu = collections.defaultdict(list)
         for ie in self.ies:
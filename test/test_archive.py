@@ -0,0 +1,128 @@
+#!/usr/bin/env python
+# coding: utf-8
+
+from __future__ import unicode_literals
+
+import io
+import shutil
+
+# Allow direct execution
+import os
+import sys
+import unittest
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+
+from test.helper import FakeYDL
+from youtube_dl import YoutubeDL
+from youtube_dl.archive import (
+    DownloadArchive,
+    DownloadArchiveError,
+    SQLiteDownloadArchive,
+    sqlite3,
+)
+from youtube_dl.utils import DownloadError
+
+
+def _mkdir(d):
+    if not os.path.exists(d):
+        os.mkdir(d)
+
+
+class TestDownloadArchive(unittest.TestCase):
+    def setUp(self):
+        TEST_DIR = os.path.dirname(os.path.abspath(__file__))
+        TESTDATA_DIR = os.path.join(TEST_DIR, 'testdata')
+        _mkdir(TESTDATA_DIR)
+        self.test_dir = os.path.join(TESTDATA_DIR, 'archive_test')
+        self.tearDown()
+        os.mkdir(self.test_dir)
+
+    def tearDown(self):
+        if os.path.exists(self.test_dir):
+            shutil.rmtree(self.test_dir)
+
+    def test_text_archive(self):
+        fn = os.path.join(self.test_dir, 'archive.txt')
+        with io.open(fn, 'w', encoding='utf-8') as f:
+            f.write('youtube abc\nyoutube ä\n')
+        archive = DownloadArchive(fn)
+        self.assertTrue('youtube abc' in archive)
+        self.assertTrue('youtube ä' in archive)
+        self.assertFalse('youtube xyz' in archive)
+
+        # Records appended by another process are picked up
+        with io.open(fn, 'a', encoding='utf-8') as f:
+            f.write('youtube xyz\nyoutube partial')
+        self.assertTrue('youtube xyz' in archive)
+        with io.open(fn, 'a', encoding='utf-8') as f:
+            f.write('2\n')
+        self.assertTrue('youtube partial2' in archive)
+
+        # Records are buffered until flushed
+        archive.add('vimeo 1')
+        self.assertTrue('vimeo 1' in archive)
+        self.assertFalse('vimeo 1' in DownloadArchive(fn))
+        archive.close()
+        self.assertTrue('vimeo 1' in DownloadArchive(fn))
+        with io.open(fn, 'r', encoding='utf-8') as f:
+            self.assertEqual(f.read().splitlines()[-1], 'vimeo 1')
+
+    def test_text_archive_batching(self):
+        fn = os.path.join(self.test_dir, 'archive.txt')
+        archive = DownloadArchive(fn)
+        self.assertFalse('vimeo 0' in archive)
+        for i in range(DownloadArchive._FLUSH_SIZE):
+            archive.add('vimeo %d' % i)
+        other = DownloadArchive(fn)
+        self.assertTrue('vimeo 0' in other)
+        self.assertTrue('vimeo %d' % (DownloadArchive._FLUSH_SIZE - 1) in other)
+
+    @unittest.skipIf(sqlite3 is None, 'sqlite3 is not available')
+    def test_sqlite_archive(self):
+        fn = os.path.join(self.test_dir, 'archive.sqlite')
+        archive = SQLiteDownloadArchive(fn)
+        other = SQLiteDownloadArchive(fn)
+        self.assertFalse('youtube abc' in archive)
+        archive.add('youtube abc')
+        archive.add('youtube abc')
+        self.assertTrue('youtube abc' in archive)
+        # Records are visible to other processes right away
+        self.assertTrue('youtube abc' in other)
+        other.add('youtube ä')
+        other.close()
+        self.assertTrue('youtube ä' in archive)
+        archive.close()
+
+    @unittest.skipIf(sqlite3 is None, 'sqlite3 is not available')
+    def test_sqlite_archive_not_a_database(self):
+        fn = os.path.join(self.test_dir, 'archive.txt')
+        with io.open(fn, 'w', encoding='utf-8') as f:
+            f.write('youtube abc\n' * 100)
+        self.assertRaises(DownloadArchiveError, SQLiteDownloadArchive, fn)
+        errors = []
+        ydl = YoutubeDL({
+            'download_archive': fn,
+            'download_archive_format': 'sqlite',
+            'ignoreerrors': True,
+        })
+        ydl.to_stderr = errors.append
+        # The archive is not ignored even when ignoring errors
+        self.assertRaises(
+            DownloadError, ydl.in_download_archive, {'id': 'abc', 'extractor_key': 'Youtube'})
+        self.assertTrue('not a database' in errors[0])
+
+    def test_ydl_archive(self):
+        fn = os.path.join(self.test_dir, 'archive.txt')
+        ydl = FakeYDL({'download_archive': fn})
+        info = {'id': 'abc', 'extractor_key': 'Youtube'}
+        self.assertFalse(ydl.in_download_archive(info))
+        ydl.record_download_archive(info)
+        self.assertTrue(ydl.in_download_archive(info))
+        ydl.close_download_archive()
+        with io.open(fn, 'r', encoding='utf-8') as f:
+            self.assertEqual(f.read(), 'youtube abc\n')
+
+
+if __name__ == '__main__':
+    unittest.main()
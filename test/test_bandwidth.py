@@ -0,0 +1,70 @@
+#!/usr/bin/env python
+# coding: utf-8
+
+from __future__ import unicode_literals
+
+# Allow direct execution
+import os
+import sys
+import unittest
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from youtube_dl.bandwidth import BandwidthScheduler, TokenBucket
+
+
+class TestTokenBucket(unittest.TestCase):
+    def test_reserve(self):
+        bucket = TokenBucket(1000)
+        # Starts with a burst of one second
+        self.assertEqual(bucket.reserve(1000, 0), 0)
+        self.assertEqual(bucket.reserve(500, 0), 0.5)
+        # Debt is paid off over time
+        self.assertEqual(bucket.reserve(500, 1), 0)
+        # Idle time does not accumulate more than the burst
+        self.assertEqual(bucket.reserve(2000, 11), 1)
+
+
+class TestBandwidthScheduler(unittest.TestCase):
+    def test_get(self):
+        self.assertTrue(BandwidthScheduler.get() is None)
+        self.assertTrue(BandwidthScheduler.get(1000) is BandwidthScheduler.get(1000))
+        self.assertFalse(BandwidthScheduler.get(1000) is BandwidthScheduler.get(1000, 1000))
+
+    def test_fair_share(self):
+        scheduler = BandwidthScheduler(1000, 400)
+        a = scheduler.open('http://a.example.com/1')
+        self.assertEqual(a.bucket.rate, 400)
+        a2 = scheduler.open('http://a.example.com/2')
+        b = scheduler.open('http://b.example.com/')
+        self.assertEqual(a.bucket.rate, 200)
+        self.assertEqual(a2.bucket.rate, 200)
+        self.assertAlmostEqual(b.bucket.rate, 1000 / 3.0)
+        a.close()
+        a2.close()
+        self.assertEqual(b.bucket.rate, 400)
+        b.close()
+
+    def test_caps(self):
+        scheduler = BandwidthScheduler(1000)
+        with scheduler.open('http://a.example.com/') as a:
+            with scheduler.open('http://b.example.com/') as b:
+                # The global burst is shared by both streams
+                self.assertEqual(a.reserve(500, 0), 0)
+                self.assertEqual(b.reserve(500, 0), 0)
+                self.assertEqual(b.reserve(100, 0), 0.2)
+                # Short waits are deferred until they add up
+                self.assertEqual(a.reserve(450, 0.5), 0)
+                self.assertAlmostEqual(a.reserve(100, 0.5), 0.15)
+
+        scheduler = BandwidthScheduler(rate_per_host=1000)
+        with scheduler.open('http://a.example.com/') as a:
+            self.assertEqual(a.reserve(1000, 0), 0)
+        # The next stream of a host does not get a fresh burst
+        with scheduler.open('http://a.example.com/') as a:
+            self.assertEqual(a.reserve(500, 0), 0.5)
+        with scheduler.open('http://b.example.com/') as b:
+            self.assertEqual(b.reserve(500, 0), 0)
+
+
+if __name__ == '__main__':
+    unittest.main()
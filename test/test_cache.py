@@ -4,6 +4,8 @@
 from __future__ import unicode_literals
 
 import shutil
+import threading
+import time
 
 # Allow direct execution
 import os
@@ -13,7 +15,10 @@ sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 
 
 from test.helper import FakeYDL
-from youtube_dl.cache import Cache
+import youtube_dl.cache
+from youtube_dl.cache import Cache, InfoDictCache, media_url_expiry
+from youtube_dl.extractor.common import InfoExtractor
+from youtube_dl.utils import locked_file
 
 
 def _is_empty(d):
@@ -54,6 +59,184 @@ class TestCache(unittest.TestCase):
         self.assertFalse(os.path.exists(self.test_dir))
         self.assertEqual(c.load('test_cache', 'k.'), None)
 
+    def test_compressed(self):
+        ydl = FakeYDL({
+            'cachedir': self.test_dir,
+        })
+        c = Cache(ydl)
+        code = 'var a = "ä";' * 1000
+        c.store('test_cache', 'player', code, dtype='json.gz')
+        self.assertEqual(c.load('test_cache', 'player', dtype='json.gz'), code)
+        self.assertEqual(c.load('test_cache', 'player'), None)
+        fn = os.path.join(self.test_dir, 'test_cache', 'player.json.gz')
+        self.assertTrue(os.path.getsize(fn) < 1000)
+
+    def test_eviction(self):
+        ydl = FakeYDL({
+            'cachedir': self.test_dir,
+            'cache_max_size': 2500,
+        })
+        c = Cache(ydl)
+        data = 'x' * 1000
+        for i, key in enumerate(('a', 'b')):
+            c.store('test_cache', key, data)
+            fn = os.path.join(self.test_dir, 'test_cache', '%s.json' % key)
+            os.utime(fn, (1000000000 + i, 1000000000 + i))
+        # Loading an entry makes it the most recently used one
+        self.assertEqual(c.load('test_cache', 'a'), data)
+        with c.locked('test_cache', 'c'):
+            c.store('test_cache', 'c', data)
+        self.assertEqual(c.load('test_cache', 'a'), data)
+        self.assertEqual(c.load('test_cache', 'b'), None)
+        self.assertEqual(c.load('test_cache', 'c'), data)
+
+        c.evict(1)
+        self.assertEqual(c.load('test_cache', 'a'), None)
+        self.assertEqual(c.load('test_cache', 'c'), None)
+        self.assertEqual(c.stats['evictions'], 3)
+
+    def test_ttl_and_bin(self):
+        ydl = FakeYDL({
+            'cachedir': self.test_dir,
+        })
+        c = Cache(ydl)
+        blob = b'\x00\xff' * 100
+        c.store('test_cache', 'blob', blob, dtype='bin')
+        c.store('test_cache', 'fresh', {'x': 1}, dtype='json.gz', ttl=3600)
+        c.store('test_cache', 'stale', [1], ttl=-1)
+        c.store('test_cache', 'stale_blob', blob, dtype='bin', ttl=-1)
+        self.assertEqual(c.load('test_cache', 'blob', dtype='bin'), blob)
+        self.assertEqual(c.load('test_cache', 'fresh', dtype='json.gz'), {'x': 1})
+        self.assertEqual(c.load('test_cache', 'stale'), None)
+        self.assertEqual(c.stats, {
+            'hits': 2, 'misses': 1, 'expired': 1, 'stores': 4, 'evictions': 0})
+        # Expired entries are removed by the eviction pass
+        c.evict()
+        self.assertEqual(c.stats['evictions'], 1)
+        self.assertEqual(
+            sorted(f for f in os.listdir(os.path.join(self.test_dir, 'test_cache'))
+                   if not f.endswith('.lock')),
+            ['blob.bin', 'fresh.json.gz'])
+
+    def test_locked(self):
+        ydl = FakeYDL({
+            'cachedir': self.test_dir,
+        })
+        c = Cache(ydl)
+        lock_fn = os.path.join(self.test_dir, 'test_cache', 'a.lock')
+        entered = threading.Event()
+        held = []
+
+        def wait_for_lock():
+            entered.set()
+            with c.locked('test_cache', 'a'):
+                # The lock is held on the file in place, not on the one
+                # removed by the previous holder
+                held.append(os.path.exists(lock_fn))
+
+        with c.locked('test_cache', 'a'):
+            thread = threading.Thread(target=wait_for_lock)
+            thread.start()
+            entered.wait(5)
+            time.sleep(0.1)
+            self.assertEqual(held, [])
+        thread.join(5)
+        self.assertEqual(held, [True])
+        # No lock file is left behind
+        self.assertFalse(os.path.exists(lock_fn))
+
+    def test_locking_unsupported(self):
+        opened = []
+
+        class UnlockableFile(locked_file):
+            def __init__(self, *args, **kwargs):
+                super(UnlockableFile, self).__init__(*args, **kwargs)
+                opened.append(self.f)
+
+            def __enter__(self):
+                raise OSError('Locking file failed')
+
+        ydl = FakeYDL({
+            'cachedir': self.test_dir,
+        })
+        c = Cache(ydl)
+        cache_locked_file = youtube_dl.cache.locked_file
+        youtube_dl.cache.locked_file = UnlockableFile
+        try:
+            with c.locked('test_cache', 'a'):
+                c.store('test_cache', 'a', 1)
+        finally:
+            youtube_dl.cache.locked_file = cache_locked_file
+        self.assertEqual(c.load('test_cache', 'a'), 1)
+        self.assertEqual([f.closed for f in opened], [True])
+
+    def test_media_url_expiry(self):
+        self.assertEqual(media_url_expiry(
+            'https://r1.googlevideo.com/videoplayback?expire=1700000000&ei=x'), 1700000000)
+        self.assertEqual(media_url_expiry(
+            'https://a.akamaihd.net/i.m3u8?hdnea=st=1600000000~exp=1600003600~acl=/*~hmac=ab'),
+            1600003600)
+        self.assertEqual(media_url_expiry(
+            'https://s3.amazonaws.com/v.mp4?X-Amz-Date=20210101T000000Z&X-Amz-Expires=3600'),
+            1609462800)
+        self.assertEqual(media_url_expiry('https://example.com/v.mp4?exp=5&e=1700000000'), None)
+        self.assertEqual(media_url_expiry('https://example.com/v.mp4'), None)
+
+    def test_info_dict_cache(self):
+        ydl = FakeYDL({
+            'cachedir': self.test_dir,
+        })
+        c = InfoDictCache(Cache(ydl), 3600)
+        url = 'http://example.com/v/1'
+        info = {'id': '1', 'title': 'ä', 'url': 'http://example.com/1.mp4'}
+        self.assertEqual(c.load('Test', '1', url), None)
+        c.store('Test', '1', url, info)
+        self.assertEqual(c.load('Test', '1', url), info)
+        self.assertEqual(c.load('Test', '1', url + '?x'), None)
+        self.assertEqual(c.load('Test', '2', url), None)
+        self.assertEqual(c.load('Other', '1', url), None)
+
+        # Entries expire with their media URLs
+        info['url'] += '?expire=%d' % (time.time() + 60)
+        c.store('Test', '1', url, info)
+        self.assertEqual(c.load('Test', '1', url), None)
+        info['url'] = info['url'].replace('?', '?x=') + '&expires=%d' % (time.time() + 7200)
+        c.store('Test', '1', url, info)
+        self.assertEqual(c.load('Test', '1', url), info)
+
+        # Playlists are not cached
+        c.store('Test', '3', url, {'_type': 'playlist', 'entries': []})
+        self.assertEqual(c.load('Test', '3', url), None)
+
+    def test_ydl_info_cache(self):
+        class CountingIE(InfoExtractor):
+            _VALID_URL = r'https?://example\.com/v/(?P<id>\d+)'
+            calls = 0
+
+            def _real_extract(self, url):
+                CountingIE.calls += 1
+                video_id = self._match_id(url)
+                return {
+                    'id': video_id,
+                    'title': 'video %s' % video_id,
+                    'url': 'http://example.com/%s.mp4' % video_id,
+                }
+
+        def extract(url):
+            ydl = FakeYDL({
+                'cachedir': self.test_dir,
+                'info_cache_ttl': 3600,
+                'simulate': True,
+            })
+            ydl.add_info_extractor(CountingIE())
+            return ydl.extract_info(url)
+
+        self.assertEqual(extract('http://example.com/v/1')['title'], 'video 1')
+        self.assertEqual(extract('http://example.com/v/1')['title'], 'video 1')
+        self.assertEqual(CountingIE.calls, 1)
+        self.assertEqual(extract('http://example.com/v/2')['title'], 'video 2')
+        self.assertEqual(CountingIE.calls, 2)
+
 
 if __name__ == '__main__':
     unittest.main()
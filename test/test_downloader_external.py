@@ -0,0 +1,80 @@
+#!/usr/bin/env python
+# coding: utf-8
+from __future__ import unicode_literals
+
+# Allow direct execution
+import os
+import sys
+import unittest
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import shutil
+import tempfile
+import threading
+
+from youtube_dl import YoutubeDL
+from youtube_dl.downloader.external import AxelFD, CurlFD
+from youtube_dl.utils import DownloadCancelled, encodeFilename
+
+# Writes part of the file to the -o argument and then hangs
+FAKE_DOWNLOADER = r'''#!/bin/sh
+while [ "$1" != "-o" ]; do shift; done
+printf partial > "$2"
+echo started > "$2.started"
+exec sleep 60
+'''
+
+
+class FakeLogger(object):
+    def debug(self, msg):
+        pass
+
+    def warning(self, msg):
+        pass
+
+    def error(self, msg):
+        pass
+
+
+@unittest.skipIf(sys.platform == 'win32', 'needs shell scripts')
+class TestExternalFD(unittest.TestCase):
+    def setUp(self):
+        self.tmpdir = tempfile.mkdtemp()
+        self.exe = os.path.join(self.tmpdir, 'downloader')
+        with open(self.exe, 'w') as f:
+            f.write(FAKE_DOWNLOADER)
+        os.chmod(self.exe, 0o755)
+
+    def tearDown(self):
+        shutil.rmtree(self.tmpdir)
+
+    def test_cancel(self):
+        for fd_class in (AxelFD, CurlFD):
+            params = {'external_downloader': self.exe, 'logger': FakeLogger()}
+            downloader = fd_class(YoutubeDL(params), params)
+            filename = os.path.join(self.tmpdir, '%s.mp4' % fd_class.get_basename())
+            tmpfilename = downloader.temp_name(filename)
+            started = tmpfilename + '.started'
+
+            def cancel():
+                # Cancel once the downloader is running
+                while not os.path.exists(encodeFilename(started)):
+                    downloader._cancelled.wait(0.05)
+                downloader.cancel()
+            thread = threading.Thread(target=cancel)
+            thread.daemon = True
+            thread.start()
+
+            self.assertRaises(DownloadCancelled, downloader.real_download, filename, {
+                'url': 'http://127.0.0.1/video.mp4',
+                'http_headers': {},
+            })
+            thread.join()
+            # The partial file is kept to be resumed
+            self.assertFalse(os.path.exists(encodeFilename(filename)))
+            with open(encodeFilename(tmpfilename), 'rb') as f:
+                self.assertEqual(f.read(), b'partial')
+
+
+if __name__ == '__main__':
+    unittest.main()
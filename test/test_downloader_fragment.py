@@ -0,0 +1,149 @@
+#!/usr/bin/env python
+# coding: utf-8
+from __future__ import unicode_literals
+
+# Allow direct execution
+import json
+import os
+import re
+import sys
+import unittest
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from test.helper import http_server_port, try_rm
+from youtube_dl import YoutubeDL
+from youtube_dl.compat import compat_http_server
+from youtube_dl.downloader.dash import DashSegmentsFD
+from youtube_dl.utils import encodeFilename
+import threading
+
+
+FRAGMENT_COUNT = 20
+
+
+def fragment_content(index):
+    return ('fragment %d;' % index).encode('ascii') * (index + 1)
+
+
+class HTTPTestRequestHandler(compat_http_server.BaseHTTPRequestHandler):
+    def log_message(self, format, *args):
+        pass
+
+    def do_GET(self):
+        mobj = re.match(r'^/frag(\d+)$', self.path)
+        if not mobj or int(mobj.group(1)) == 13:
+            self.send_response(404)
+            self.end_headers()
+            return
+        content = fragment_content(int(mobj.group(1)))
+        self.send_response(200)
+        self.send_header('Content-Type', 'video/mp4')
+        self.send_header('Content-Length', len(content))
+        self.end_headers()
+        self.wfile.write(content)
+
+
+class FakeLogger(object):
+    def debug(self, msg):
+        pass
+
+    def warning(self, msg):
+        pass
+
+    def error(self, msg):
+        pass
+
+
+class TestFragmentFD(unittest.TestCase):
+    def setUp(self):
+        self.httpd = compat_http_server.HTTPServer(
+            ('127.0.0.1', 0), HTTPTestRequestHandler)
+        self.port = http_server_port(self.httpd)
+        self.server_thread = threading.Thread(target=self.httpd.serve_forever)
+        self.server_thread.daemon = True
+        self.server_thread.start()
+
+    def download(self, params):
+        params['logger'] = FakeLogger()
+        params.setdefault('fragment_retries', 0)
+        ydl = YoutubeDL(params)
+        downloader = DashSegmentsFD(ydl, params)
+        progress = []
+        downloader.add_progress_hook(progress.append)
+        filename = 'testfile.mp4'
+        try_rm(encodeFilename(filename))
+        try:
+            self.assertTrue(downloader.real_download(filename, {
+                'fragment_base_url': 'http://127.0.0.1:%d/' % self.port,
+                'fragments': [{'path': 'frag%d' % i} for i in range(FRAGMENT_COUNT)],
+            }))
+            with open(encodeFilename(filename), 'rb') as f:
+                content = f.read()
+            frag_files = [fn for fn in os.listdir('.') if fn.startswith(filename + '.part-Frag')]
+            self.assertEqual(
+                len(frag_files), FRAGMENT_COUNT - 1 if params.get('keep_fragments') else 0)
+        finally:
+            for fn in os.listdir('.'):
+                if fn.startswith(filename):
+                    try_rm(encodeFilename(fn))
+        self.assertFalse(os.path.exists(encodeFilename(filename + '.ytdl')))
+        self.assertEqual(progress[-1]['status'], 'finished')
+        self.assertEqual(progress[-1]['total_bytes'], len(content))
+        return content
+
+    def expected_content(self):
+        return b''.join(
+            fragment_content(i) for i in range(FRAGMENT_COUNT) if i != 13)
+
+    def test_sequential(self):
+        self.assertEqual(self.download({}), self.expected_content())
+
+    def test_concurrent(self):
+        self.assertEqual(
+            self.download({'concurrent_fragments': 4}), self.expected_content())
+
+    def test_keep_fragments(self):
+        self.assertEqual(
+            self.download({'keep_fragments': True}), self.expected_content())
+        self.assertEqual(
+            self.download({'keep_fragments': True, 'concurrent_fragments': 4}),
+            self.expected_content())
+
+    def test_resume(self):
+        # Interrupted while fragment 5 was being written into the file
+        done = b''.join(fragment_content(i) for i in range(5))
+        with open(encodeFilename('testfile.mp4.part'), 'wb') as f:
+            f.write(done + fragment_content(5)[:7])
+        with open(encodeFilename('testfile.mp4.ytdl'), 'w') as f:
+            json.dump({'downloader': {
+                'current_fragment': {'index': 5},
+                'file_size': len(done),
+            }}, f)
+        self.assertEqual(self.download({}), self.expected_content())
+
+    def test_concurrent_abort_on_unavailable_fragment(self):
+        params = {
+            'concurrent_fragments': 4,
+            'skip_unavailable_fragments': False,
+            'ignoreerrors': True,
+            'logger': FakeLogger(),
+        }
+        ydl = YoutubeDL(params)
+        downloader = DashSegmentsFD(ydl, params)
+        filename = 'testfile.mp4'
+        try:
+            self.assertFalse(downloader.real_download(filename, {
+                'fragment_base_url': 'http://127.0.0.1:%d/' % self.port,
+                'fragments': [{'path': 'frag%d' % i} for i in range(FRAGMENT_COUNT)],
+            }))
+            with open(encodeFilename(filename + '.part'), 'rb') as f:
+                self.assertEqual(
+                    f.read(), b''.join(fragment_content(i) for i in range(13)))
+        finally:
+            for fn in os.listdir('.'):
+                if fn.startswith(filename):
+                    try_rm(encodeFilename(fn))
+
+
+if __name__ == '__main__':
+    unittest.main()
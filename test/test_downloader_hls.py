@@ -0,0 +1,174 @@
+#!/usr/bin/env python
+# coding: utf-8
+from __future__ import unicode_literals
+
+# Allow direct execution
+import os
+import re
+import sys
+import unittest
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from test.helper import http_server_port, try_rm
+from youtube_dl import YoutubeDL
+from youtube_dl.compat import compat_http_server
+from youtube_dl.downloader import get_suitable_downloader
+from youtube_dl.downloader.external import FFmpegFD
+from youtube_dl.downloader.hls import HlsFD
+from youtube_dl.m3u8 import parse_m3u8
+from youtube_dl.utils import encodeFilename
+import threading
+
+
+def segment_data(i):
+    return ('segment %d\n' % i).encode('ascii') * 100
+
+
+class HTTPTestRequestHandler(compat_http_server.BaseHTTPRequestHandler):
+    def log_message(self, format, *args):
+        pass
+
+    def send_body(self, body, content_type):
+        self.send_response(200)
+        self.send_header('Content-Type', content_type)
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def do_GET(self):
+        if self.path == '/live.m3u8':
+            # A sliding window of three segments that moves by one segment
+            # on every reload, the third reload ends the stream
+            with self.server.lock:
+                reload_count = self.server.reloads
+                self.server.reloads += 1
+            lines = [
+                '#EXTM3U',
+                '#EXT-X-TARGETDURATION:1',
+                '#EXT-X-MEDIA-SEQUENCE:%d' % reload_count,
+            ]
+            for i in range(reload_count, reload_count + 3):
+                lines.extend(['#EXTINF:1.0,', 'segment%d.ts' % i])
+            if reload_count == 2:
+                lines.append('#EXT-X-ENDLIST')
+            self.send_body(
+                '\n'.join(lines).encode('ascii'), 'application/vnd.apple.mpegurl')
+            return
+        if self.path == '/broken.m3u8':
+            # The playlist cannot be reloaded
+            with self.server.lock:
+                reload_count = self.server.reloads
+                self.server.reloads += 1
+            if reload_count:
+                self.send_error(404)
+                return
+            self.send_body(b'\n'.join([
+                b'#EXTM3U',
+                b'#EXT-X-TARGETDURATION:1',
+                b'#EXTINF:1.0,',
+                b'segment0.ts',
+            ]), 'application/vnd.apple.mpegurl')
+            return
+        mobj = re.match(r'^/segment(\d+)\.ts$', self.path)
+        assert mobj
+        with self.server.lock:
+            self.server.segments.append(int(mobj.group(1)))
+        self.send_body(segment_data(int(mobj.group(1))), 'video/MP2T')
+
+
+class FakeLogger(object):
+    def debug(self, msg):
+        pass
+
+    def warning(self, msg):
+        pass
+
+    def error(self, msg):
+        pass
+
+
+class TestHlsFD(unittest.TestCase):
+    def setUp(self):
+        self.httpd = compat_http_server.HTTPServer(
+            ('127.0.0.1', 0), HTTPTestRequestHandler)
+        self.httpd.lock = threading.Lock()
+        self.httpd.reloads = 0
+        self.httpd.segments = []
+        self.port = http_server_port(self.httpd)
+        self.server_thread = threading.Thread(target=self.httpd.serve_forever)
+        self.server_thread.daemon = True
+        self.server_thread.start()
+
+    def test_live(self):
+        params = {'concurrent_fragments': 2, 'logger': FakeLogger()}
+        filename = 'testfile.ts'
+        downloader = HlsFD(YoutubeDL(params), params)
+        try_rm(encodeFilename(filename))
+        try:
+            self.assertTrue(downloader.real_download(filename, {
+                'url': 'http://127.0.0.1:%d/live.m3u8' % self.port,
+                'is_live': True,
+            }))
+            with open(encodeFilename(filename), 'rb') as f:
+                self.assertEqual(
+                    f.read(), b''.join(segment_data(i) for i in range(5)))
+        finally:
+            try_rm(encodeFilename(filename))
+        self.assertEqual(self.httpd.reloads, 3)
+        # Every segment is fetched once
+        self.assertEqual(sorted(self.httpd.segments), list(range(5)))
+
+    def test_live_reload_error(self):
+        params = {'fragment_retries': 1, 'ignoreerrors': True, 'logger': FakeLogger()}
+        filename = 'testfile.ts'
+        downloader = HlsFD(YoutubeDL(params), params)
+        try_rm(encodeFilename(filename))
+        try:
+            # A truncated recording is not a success
+            self.assertFalse(downloader.real_download(filename, {
+                'url': 'http://127.0.0.1:%d/broken.m3u8' % self.port,
+                'is_live': True,
+            }))
+            with open(encodeFilename(filename), 'rb') as f:
+                self.assertEqual(f.read(), segment_data(0))
+        finally:
+            try_rm(encodeFilename(filename))
+        self.assertEqual(self.httpd.reloads, 3)
+
+    def test_parsed_playlist(self):
+        params = {'logger': FakeLogger()}
+        filename = 'testfile.ts'
+        downloader = HlsFD(YoutubeDL(params), params)
+        url = 'http://127.0.0.1:%d/vod.m3u8' % self.port
+        playlist = parse_m3u8('\n'.join([
+            '#EXTM3U',
+            '#EXT-X-TARGETDURATION:10',
+            '#EXTINF:10.0,',
+            'segment3.ts',
+            '#EXTINF:10.0,',
+            'segment5.ts',
+            '#EXT-X-ENDLIST',
+        ]), url)
+        try_rm(encodeFilename(filename))
+        try:
+            self.assertTrue(downloader.real_download(filename, {
+                'url': url,
+                'hls_playlist': playlist,
+            }))
+            with open(encodeFilename(filename), 'rb') as f:
+                self.assertEqual(f.read(), segment_data(3) + segment_data(5))
+        finally:
+            try_rm(encodeFilename(filename))
+        # The playlist is not requested again
+        self.assertEqual(self.httpd.reloads, 0)
+        self.assertEqual(self.httpd.segments, [3, 5])
+
+    def test_get_suitable_downloader(self):
+        info_dict = {'url': 'http://127.0.0.1/live.m3u8', 'protocol': 'm3u8', 'is_live': True}
+        self.assertEqual(get_suitable_downloader(info_dict), FFmpegFD)
+        self.assertEqual(
+            get_suitable_downloader(info_dict, {'hls_prefer_native': True}), HlsFD)
+
+
+if __name__ == '__main__':
+    unittest.main()
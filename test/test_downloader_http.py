@@ -6,20 +6,27 @@ from __future__ import unicode_literals
 import os
 import re
 import sys
+import time
 import unittest
 sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 
 from test.helper import http_server_port, try_rm
 from youtube_dl import YoutubeDL
-from youtube_dl.compat import compat_http_server
-from youtube_dl.downloader.http import HttpFD
+from youtube_dl.compat import compat_http_server, compat_urllib_error
+from youtube_dl.downloader.http import AdaptiveChunkSize, HttpFD
 from youtube_dl.utils import encodeFilename
 import threading
 
+try:
+    from socketserver import ThreadingMixIn
+except ImportError:  # Python 2
+    from SocketServer import ThreadingMixIn
+
 TEST_DIR = os.path.dirname(os.path.abspath(__file__))
 
 
 TEST_SIZE = 10 * 1024
+TEST_DATA = bytes(bytearray(i % 251 for i in range(TEST_SIZE)))
 
 
 class HTTPTestRequestHandler(compat_http_server.BaseHTTPRequestHandler):
@@ -43,7 +50,7 @@ class HTTPTestRequestHandler(compat_http_server.BaseHTTPRequestHandler):
         return (end - start + 1) if valid_range else total
 
     def serve(self, range=True, content_length=True):
-        self.send_response(200)
+        self.send_response(206 if range and self.headers.get('Range') else 200)
         self.send_header('Content-Type', 'video/mp4')
         size = TEST_SIZE
         if range:
@@ -62,10 +69,53 @@ class HTTPTestRequestHandler(compat_http_server.BaseHTTPRequestHandler):
             self.serve(range=False)
         elif self.path == '/no-range-no-content-length':
             self.serve(range=False, content_length=False)
+        elif self.path == '/throttled' and not self.server.throttled:
+            self.server.throttled = True
+            self.send_response(429)
+            self.send_header('Retry-After', '0')
+            self.send_header('Content-Length', '0')
+            self.end_headers()
+        elif self.path in ('/data', '/data-no-range', '/throttled'):
+            start, end = 0, TEST_SIZE - 1
+            mobj = self.path != '/data-no-range' and re.search(
+                r'^bytes=(\d+)-(\d+)?', self.headers.get('Range') or '')
+            self.send_response(206 if mobj else 200)
+            if mobj:
+                start = int(mobj.group(1))
+                end = min(int(mobj.group(2) or end), end)
+                self.send_header('Content-Range', 'bytes %d-%d/%d' % (start, end, TEST_SIZE))
+            self.server.requested.append((start, end))
+            self.send_header('Content-Length', end - start + 1)
+            self.end_headers()
+            self.wfile.write(TEST_DATA[start:end + 1])
+        elif self.path == '/slow':
+            start = 0
+            mobj = re.search(r'^bytes=(\d+)-', self.headers.get('Range') or '')
+            self.send_response(206 if mobj else 200)
+            if mobj:
+                start = int(mobj.group(1))
+                self.send_header('Content-Range', 'bytes %d-%d/%d' % (start, TEST_SIZE - 1, TEST_SIZE))
+            self.send_header('Content-Length', TEST_SIZE - start)
+            self.end_headers()
+            for pos in range(start, TEST_SIZE, 100):
+                if self.server.slow:
+                    time.sleep(0.05)
+                self.wfile.write(TEST_DATA[pos:pos + 100])
+        elif self.path == '/missing':
+            self.server.missing_go.wait(5)
+            self.send_error(404)
         else:
             assert False
 
 
+class ThreadingHTTPServer(ThreadingMixIn, compat_http_server.HTTPServer):
+    daemon_threads = True
+
+    def handle_error(self, request, client_address):
+        # Cancelled downloads disconnect in the middle of responses
+        pass
+
+
 class FakeLogger(object):
     def debug(self, msg):
         pass
@@ -79,8 +129,12 @@ class FakeLogger(object):
 
 class TestHttpFD(unittest.TestCase):
     def setUp(self):
-        self.httpd = compat_http_server.HTTPServer(
+        self.httpd = ThreadingHTTPServer(
             ('127.0.0.1', 0), HTTPTestRequestHandler)
+        self.httpd.requested = []
+        self.httpd.slow = True
+        self.httpd.throttled = False
+        self.httpd.missing_go = threading.Event()
         self.port = http_server_port(self.httpd)
         self.server_thread = threading.Thread(target=self.httpd.serve_forever)
         self.server_thread.daemon = True
@@ -110,6 +164,241 @@ class TestHttpFD(unittest.TestCase):
             'http_chunk_size': 1000,
         })
 
+    def test_chunked_data(self):
+        params = {'http_chunk_size': 1000, 'logger': FakeLogger()}
+        filename = 'testfile.mp4'
+        downloader = HttpFD(YoutubeDL(params), params)
+        try_rm(encodeFilename(filename))
+        try:
+            self.assertTrue(downloader.real_download(filename, {
+                'url': 'http://127.0.0.1:%d/data' % self.port}))
+            with open(encodeFilename(filename), 'rb') as f:
+                self.assertEqual(f.read(), TEST_DATA)
+            # Prefetched ranges follow on from each other
+            requested = sorted(self.httpd.requested)
+            self.assertEqual(requested[0][0], 0)
+            self.assertEqual(requested[-1][1], TEST_SIZE - 1)
+            for (_, end), (start, _) in zip(requested, requested[1:]):
+                self.assertEqual(start, end + 1)
+        finally:
+            try_rm(encodeFilename(filename))
+
+    def test_too_many_requests(self):
+        params = {'http_chunk_size': 1000, 'retries': 1, 'logger': FakeLogger()}
+        filename = 'testfile.mp4'
+        downloader = HttpFD(YoutubeDL(params), params)
+        downloader.to_screen = lambda *args, **kwargs: None
+        try_rm(encodeFilename(filename))
+        try:
+            self.assertTrue(downloader.real_download(filename, {
+                'url': 'http://127.0.0.1:%d/throttled' % self.port}))
+            with open(encodeFilename(filename), 'rb') as f:
+                self.assertEqual(f.read(), TEST_DATA)
+            # The ranges are not shrunk, which would mean more requests
+            start, end = sorted(self.httpd.requested)[0]
+            self.assertEqual(start, 0)
+            self.assertTrue(end >= 900)
+        finally:
+            try_rm(encodeFilename(filename))
+
+    def test_progress_throttling(self):
+        params = {
+            'buffersize': 16,
+            'noresizebuffer': True,
+            'logger': FakeLogger(),
+        }
+        filename = 'testfile.mp4'
+        downloader = HttpFD(YoutubeDL(params), params)
+        progress = []
+        downloader.add_progress_hook(progress.append)
+        try_rm(encodeFilename(filename))
+        try:
+            self.assertTrue(downloader.real_download(filename, {
+                'url': 'http://127.0.0.1:%d/data' % self.port}))
+            with open(encodeFilename(filename), 'rb') as f:
+                self.assertEqual(f.read(), TEST_DATA)
+        finally:
+            try_rm(encodeFilename(filename))
+        # Far fewer calls than the 640 blocks, "finished" is always delivered
+        self.assertTrue(len(progress) < 100)
+        self.assertEqual(progress[-1]['status'], 'finished')
+        self.assertEqual(progress[-1]['downloaded_bytes'], TEST_SIZE)
+
+    def test_stream_to(self):
+        class Stream(object):
+            def __init__(self):
+                self.data = []
+                self.closed = False
+
+            def write(self, data):
+                self.data.append(bytes(data))
+
+            def close(self):
+                self.closed = True
+
+        params = {'buffersize': 1000, 'logger': FakeLogger()}
+        downloader = HttpFD(YoutubeDL(params), params)
+        stream = Stream()
+        downloader.stream_to(lambda: stream)
+        self.assertTrue(downloader.download('-', {
+            'url': 'http://127.0.0.1:%d/data' % self.port}))
+        self.assertEqual(b''.join(stream.data), TEST_DATA)
+        self.assertTrue(stream.closed)
+
+    def test_adaptive_chunk_size(self):
+        chunk_size = AdaptiveChunkSize(1000)
+        # High latency compared to the transfer time
+        chunk_size.update(0.5, 1, 1000)
+        self.assertEqual(chunk_size.size, 2000)
+        for _ in range(5):
+            chunk_size.update(0.5, 1, 1000)
+        self.assertEqual(chunk_size.size, 8000)
+        # Speed fell below half of the best speed
+        chunk_size.update(0.01, 1, 400)
+        self.assertEqual(chunk_size.size, 4000)
+        chunk_size.update(0.01, 1, 1000)
+        self.assertEqual(chunk_size.size, 4000)
+        for _ in range(5):
+            chunk_size.throttled()
+        self.assertEqual(chunk_size.size, 125)
+
+    def test_http_chunks(self):
+        self.download_all({
+            'http_chunks': 3,
+        })
+        self.download_all({
+            'http_chunks': 3,
+            'http_chunk_size': 1000,
+        })
+        self.download_all({
+            'http_chunks': 3,
+            'ratelimit': 1024 * 1024,
+        })
+
+    def test_http_chunks_data(self):
+        params = {'http_chunks': 4, 'logger': FakeLogger()}
+        filename = 'testfile.mp4'
+        downloader = HttpFD(YoutubeDL(params), params)
+        url = 'http://127.0.0.1:%d/data' % self.port
+        try_rm(encodeFilename(filename))
+        try:
+            self.assertTrue(downloader.real_download(filename, {'url': url}))
+            with open(encodeFilename(filename), 'rb') as f:
+                self.assertEqual(f.read(), TEST_DATA)
+            self.assertEqual(sorted(self.httpd.requested), [
+                (0, 0), (0, 2559), (2560, 5119), (5120, 7679), (7680, 10239)])
+
+            # Resume from the chunk map, only the missing ranges are requested
+            del self.httpd.requested[:]
+            with open(encodeFilename(filename + '.part'), 'wb') as f:
+                f.write(TEST_DATA[:100] + b'\0' * 5020 + TEST_DATA[5120:])
+            downloader._write_chunk_map(filename, TEST_SIZE, [
+                [0, 5119, 100], [5120, 10239, 5120]])
+            self.assertTrue(downloader.real_download(filename, {'url': url}))
+            with open(encodeFilename(filename), 'rb') as f:
+                self.assertEqual(f.read(), TEST_DATA)
+            self.assertEqual(sorted(self.httpd.requested), [(0, 0), (100, 5119)])
+            self.assertFalse(os.path.exists(encodeFilename(filename + '.ytdl')))
+        finally:
+            try_rm(encodeFilename(filename))
+
+    def test_http_chunks_interrupted(self):
+        class Interrupted(Exception):
+            pass
+
+        def interrupt(status):
+            if status['status'] == 'downloading':
+                raise Interrupted()
+
+        filename = 'testfile.mp4'
+        url = 'http://127.0.0.1:%d/data' % self.port
+
+        def download(http_chunks, hook=None):
+            params = {'http_chunks': http_chunks, 'ratelimit': 4096, 'logger': FakeLogger()}
+            downloader = HttpFD(YoutubeDL(params), params)
+            if hook:
+                downloader.add_progress_hook(hook)
+            return downloader, downloader.real_download(filename, {'url': url})
+
+        try_rm(encodeFilename(filename))
+        try:
+            self.assertRaises(Interrupted, download, 4, interrupt)
+            # The chunk map only counts what has been written
+            downloader = HttpFD(YoutubeDL({}), {})
+            chunks = downloader._read_chunk_map(filename, TEST_SIZE)
+            self.assertTrue(0 < sum(chunk[2] for chunk in chunks) < TEST_SIZE)
+            with open(encodeFilename(filename + '.part'), 'rb') as f:
+                data = f.read()
+            for start, _, downloaded in chunks:
+                self.assertEqual(
+                    data[start:start + downloaded], TEST_DATA[start:start + downloaded])
+
+            # Without its chunk map the preallocated .part file is not resumed
+            os.remove(encodeFilename(filename + '.ytdl'))
+            self.assertTrue(download(4)[1])
+            with open(encodeFilename(filename), 'rb') as f:
+                self.assertEqual(f.read(), TEST_DATA)
+            os.remove(encodeFilename(filename))
+
+            # Nor over a single connection
+            self.assertRaises(Interrupted, download, 4, interrupt)
+            self.assertTrue(download(1)[1])
+            with open(encodeFilename(filename), 'rb') as f:
+                self.assertEqual(f.read(), TEST_DATA)
+            self.assertFalse(os.path.exists(encodeFilename(filename + '.ytdl')))
+        finally:
+            try_rm(encodeFilename(filename))
+            try_rm(encodeFilename(filename + '.part'))
+            try_rm(encodeFilename(filename + '.ytdl'))
+
+    def test_probe_size(self):
+        params = {'logger': FakeLogger()}
+        downloader = HttpFD(YoutubeDL(params), params)
+        url = 'http://127.0.0.1:%d/%%s' % self.port
+        probe, size = downloader._probe_size(url % 'data', {})
+        self.assertEqual(probe.getcode(), 206)
+        self.assertEqual(size, TEST_SIZE)
+        # The whole file sent instead of the first byte is not read
+        self.assertEqual(downloader._probe_size(url % 'data-no-range', {}), (None, None))
+        self.assertEqual(self.httpd.requested, [(0, 0), (0, TEST_SIZE - 1)])
+
+    def test_download_concurrently(self):
+        def progress_hook(status):
+            # Fail the other download once this one has started
+            if status['status'] == 'downloading' and status.get('downloaded_bytes'):
+                self.httpd.missing_go.set()
+
+        ydl = YoutubeDL({'logger': FakeLogger(), 'progress_hooks': [progress_hook]})
+        url = 'http://127.0.0.1:%d/%%s' % self.port
+        filenames = ['testfile.f1.mp4', 'testfile.f2.mp4']
+        for filename in filenames:
+            try_rm(encodeFilename(filename))
+            try_rm(encodeFilename(filename + '.part'))
+        try:
+            self.assertRaises(
+                compat_urllib_error.HTTPError, ydl._download_concurrently, [
+                    (filenames[0], {'url': url % 'slow'}),
+                    (filenames[1], {'url': url % 'missing'})])
+            # The slow download is cancelled before its end and can be
+            # resumed
+            self.assertFalse(os.path.exists(encodeFilename(filenames[0])))
+            with open(encodeFilename(filenames[0] + '.part'), 'rb') as f:
+                partial = f.read()
+            self.assertTrue(0 < len(partial) < TEST_SIZE)
+            self.assertEqual(partial, TEST_DATA[:len(partial)])
+
+            self.httpd.slow = False
+            self.assertTrue(ydl._download_concurrently([
+                (filenames[0], {'url': url % 'slow'}),
+                (filenames[1], {'url': url % 'data'})]))
+            for filename in filenames:
+                with open(encodeFilename(filename), 'rb') as f:
+                    self.assertEqual(f.read(), TEST_DATA)
+        finally:
+            for filename in filenames:
+                try_rm(encodeFilename(filename))
+                try_rm(encodeFilename(filename + '.part'))
+
 
 if __name__ == '__main__':
     unittest.main()
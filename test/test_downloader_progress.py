@@ -0,0 +1,114 @@
+#!/usr/bin/env python
+# coding: utf-8
+from __future__ import unicode_literals
+
+# Allow direct execution
+import os
+import sys
+import unittest
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import json
+
+from youtube_dl.downloader.progress import (
+    CombinedProgress,
+    NDJSONProgressWriter,
+    ProgressDispatcher,
+)
+
+
+class TestProgressDispatcher(unittest.TestCase):
+    def test_coalesce(self):
+        progress = []
+        dispatcher = ProgressDispatcher([progress.append], 0.01)
+        for i in range(5):
+            dispatcher.dispatch({'status': 'downloading', 'downloaded_bytes': i})
+        self.assertEqual([p['downloaded_bytes'] for p in progress], [0])
+        self.assertFalse(dispatcher.due())
+        dispatcher.dispatch({'status': 'finished'})
+        dispatcher.dispatch({'status': 'error'})
+        self.assertEqual(
+            [p['status'] for p in progress], ['downloading', 'finished', 'error'])
+        # The next download is reported right away
+        self.assertTrue(dispatcher.due())
+        dispatcher.dispatch({'status': 'downloading', 'downloaded_bytes': 0})
+        self.assertEqual(len(progress), 4)
+
+    def test_every_update(self):
+        progress = []
+        dispatcher = ProgressDispatcher([progress.append], 0)
+        for i in range(5):
+            dispatcher.dispatch({'status': 'downloading', 'downloaded_bytes': i})
+        self.assertEqual(len(progress), 5)
+
+
+class TestCombinedProgress(unittest.TestCase):
+    def test_combine(self):
+        progress = []
+        combined = CombinedProgress(2, progress.append, 0)
+        video, audio = combined.hook(0), combined.hook(1)
+        video({
+            'status': 'downloading', 'downloaded_bytes': 100,
+            'total_bytes': 1000, 'speed': 50.0, 'elapsed': 2,
+        })
+        self.assertEqual(progress[-1], {
+            'status': 'downloading', 'downloaded_bytes': 100,
+            'speed': 50.0, 'elapsed': 2,
+        })
+        audio({
+            'status': 'downloading', 'downloaded_bytes': 50,
+            'total_bytes_estimate': 200, 'speed': 25.0, 'elapsed': 1,
+        })
+        self.assertEqual(progress[-1], {
+            'status': 'downloading', 'downloaded_bytes': 150,
+            'total_bytes_estimate': 1200, 'speed': 75.0, 'elapsed': 2,
+            'eta': 14,
+        })
+        audio({'status': 'finished', 'total_bytes': 200, 'elapsed': 3})
+        self.assertEqual(progress[-1], {
+            'status': 'downloading', 'downloaded_bytes': 300,
+            'total_bytes': 1200, 'speed': 50.0, 'elapsed': 3, 'eta': 18,
+        })
+        video({'status': 'finished', 'downloaded_bytes': 1000, 'total_bytes': 1000})
+        self.assertEqual(progress[-1], {
+            'status': 'finished', 'downloaded_bytes': 1200,
+            'total_bytes': 1200, 'speed': None, 'elapsed': 3,
+        })
+
+
+class TestNDJSONProgressWriter(unittest.TestCase):
+    def test_write(self):
+        read_fd, write_fd = os.pipe()
+        try:
+            writer = NDJSONProgressWriter(write_fd)
+            writer({
+                'status': 'downloading',
+                'filename': 'f\xe9.mp4',
+                'downloaded_bytes': 10,
+                'eta': None,
+                '_eta_str': '00:00',
+                'info': object(),
+            })
+            writer({'status': 'finished', 'elapsed': 1.5})
+            os.close(write_fd)
+            write_fd = None
+            with os.fdopen(read_fd, 'rb') as f:
+                read_fd = None
+                lines = f.read().decode('utf-8').splitlines()
+        finally:
+            for fd in (read_fd, write_fd):
+                if fd is not None:
+                    os.close(fd)
+        self.assertEqual([json.loads(line) for line in lines], [{
+            'status': 'downloading',
+            'filename': 'f\xe9.mp4',
+            'downloaded_bytes': 10,
+            'eta': None,
+        }, {
+            'status': 'finished',
+            'elapsed': 1.5,
+        }])
+
+
+if __name__ == '__main__':
+    unittest.main()
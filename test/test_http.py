@@ -10,7 +10,14 @@ sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 
 from test.helper import http_server_port
 from youtube_dl import YoutubeDL
-from youtube_dl.compat import compat_http_server, compat_urllib_request
+from youtube_dl.compat import (
+    compat_http_client,
+    compat_http_server,
+    compat_urllib_request,
+)
+from youtube_dl.utils import HTTPConnectionPool
+import errno
+import socket
 import ssl
 import threading
 
@@ -78,7 +85,7 @@ class TestHTTP(unittest.TestCase):
             return
 
         ydl = YoutubeDL({'logger': FakeLogger()})
-        r = ydl.extract_info('http://127.0.0.1:%d/302' % self.port)
+        r = ydl.extract_info('http://127.0.0.1:%d/302' % self.port, download=False)
         self.assertEqual(r['entries'][0]['url'], 'http://127.0.0.1:%d/vid.mp4' % self.port)
 
 
@@ -99,13 +106,85 @@ class TestHTTPS(unittest.TestCase):
             ydl = YoutubeDL({'logger': FakeLogger()})
             self.assertRaises(
                 Exception,
-                ydl.extract_info, 'https://127.0.0.1:%d/video.html' % self.port)
+                ydl.extract_info, 'https://127.0.0.1:%d/video.html' % self.port,
+                download=False)
 
         ydl = YoutubeDL({'logger': FakeLogger(), 'nocheckcertificate': True})
-        r = ydl.extract_info('https://127.0.0.1:%d/video.html' % self.port)
+        r = ydl.extract_info('https://127.0.0.1:%d/video.html' % self.port, download=False)
         self.assertEqual(r['entries'][0]['url'], 'https://127.0.0.1:%d/vid.mp4' % self.port)
 
 
+class KeepAliveRequestHandler(compat_http_server.BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'
+
+    def log_message(self, format, *args):
+        pass
+
+    def setup(self):
+        compat_http_server.BaseHTTPRequestHandler.setup(self)
+        self.server.connections += 1
+
+    def do_GET(self):
+        content = self.path.encode('utf-8') * 1000
+        self.send_response(200)
+        self.send_header('Content-Type', 'text/plain')
+        self.send_header('Content-Length', str(len(content)))
+        self.end_headers()
+        self.wfile.write(content)
+        if self.path == '/drop':
+            # Close the connection without announcing it
+            self.close_connection = True
+
+
+class TestKeepAlive(unittest.TestCase):
+    def setUp(self):
+        self.httpd = compat_http_server.HTTPServer(
+            ('127.0.0.1', 0), KeepAliveRequestHandler)
+        self.httpd.connections = 0
+        self.port = http_server_port(self.httpd)
+        self.server_thread = threading.Thread(target=self.httpd.serve_forever)
+        self.server_thread.daemon = True
+        self.server_thread.start()
+
+    def fetch(self, ydl, path):
+        return ydl.urlopen('http://127.0.0.1:%d%s' % (self.port, path)).read()
+
+    def test_keep_alive(self):
+        ydl = YoutubeDL({'logger': FakeLogger()})
+        if not ydl._connection_pool.enabled:
+            return
+        for i in range(5):
+            self.assertEqual(self.fetch(ydl, '/%d' % i), ('/%d' % i).encode('utf-8') * 1000)
+        self.assertEqual(self.httpd.connections, 1)
+
+        # A response closed before being read completely spoils its connection
+        ydl.urlopen('http://127.0.0.1:%d/partial' % self.port).close()
+        self.assertEqual(self.fetch(ydl, '/a'), b'/a' * 1000)
+        self.assertEqual(self.httpd.connections, 2)
+
+        # Connections closed by the server are replaced
+        self.assertEqual(self.fetch(ydl, '/drop'), b'/drop' * 1000)
+        self.assertEqual(self.fetch(ydl, '/b'), b'/b' * 1000)
+        self.assertEqual(self.httpd.connections, 3)
+
+    def test_dropped_errors(self):
+        is_dropped = HTTPConnectionPool._is_dropped
+        self.assertTrue(is_dropped(compat_http_client.BadStatusLine("''"), True))
+        self.assertTrue(is_dropped(compat_http_client.CannotSendRequest(), False))
+        self.assertTrue(is_dropped(socket.error(errno.EPIPE, 'Broken pipe'), False))
+        self.assertTrue(is_dropped(socket.error(errno.ECONNRESET, 'Connection reset'), False))
+        # The request may have been processed
+        self.assertFalse(is_dropped(socket.error(errno.ECONNRESET, 'Connection reset'), True))
+        self.assertFalse(is_dropped(socket.timeout('timed out'), True))
+        self.assertFalse(is_dropped(socket.timeout('timed out'), False))
+
+    def test_no_keep_alive(self):
+        ydl = YoutubeDL({'logger': FakeLogger(), 'http_keep_alive': False})
+        for i in range(3):
+            self.assertEqual(self.fetch(ydl, '/%d' % i), ('/%d' % i).encode('utf-8') * 1000)
+        self.assertEqual(self.httpd.connections, 3)
+
+
 def _build_proxy_handler(name):
     class HTTPTestRequestHandler(compat_http_server.BaseHTTPRequestHandler):
         proxy_name = name
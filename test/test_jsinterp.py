@@ -73,8 +73,6 @@ class TestJSInterpreter(unittest.TestCase):
         self.assertEqual(jsi.call_function('f'), -11)
 
     def test_comments(self):
-        'Skipping: Not yet fully implemented'
-        return
         jsi = JSInterpreter('''
         function x() {
             var x = /* 1 + */ 2;
@@ -112,6 +110,28 @@ class TestJSInterpreter(unittest.TestCase):
         ''')
         self.assertEqual(jsi.call_function('z'), 5)
 
+    def test_associativity(self):
+        jsi = JSInterpreter('function f(){return 10 - 3 - 2;}')
+        self.assertEqual(jsi.call_function('f'), 5)
+
+        jsi = JSInterpreter('function f(a){return a[0] - a[1] * 2 + 1 << 2 | 1;}')
+        self.assertEqual(jsi.call_function('f', [9, 3]), 17)
+
+    def test_signature_like(self):
+        jsi = JSInterpreter('''
+        var Xy={ab:function(a,b){a.splice(0,b)},
+        "cd":function(a){a.reverse()},
+        ef:function(a,b){var c=a[0];a[0]=a[b%a.length];a[b%a.length]=c}};
+        sig=function(a){a=a.split("");Xy.cd(a,63);Xy["ef"](a,12);Xy.ab(a,3);return a.join("")};
+        ''')
+        sig = jsi.extract_function('sig')
+        s = list('abcdefghijklmnopqrstuvwxyz')
+        s.reverse()
+        s[0], s[12 % len(s)] = s[12 % len(s)], s[0]
+        self.assertEqual(sig(['abcdefghijklmnopqrstuvwxyz']), ''.join(s[3:]))
+        # Compiled functions are reused
+        self.assertTrue(jsi.extract_function('sig') is sig)
+
 
 if __name__ == '__main__':
     unittest.main()
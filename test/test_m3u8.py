@@ -0,0 +1,140 @@
+#!/usr/bin/env python
+# coding: utf-8
+from __future__ import unicode_literals
+
+# Allow direct execution
+import os
+import sys
+import unittest
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from youtube_dl.compat import compat_urlparse
+from youtube_dl.m3u8 import M3U8Parser, parse_m3u8
+
+
+MEDIA_PLAYLIST = '''#EXTM3U
+#EXT-X-VERSION:3
+#EXT-X-TARGETDURATION:10
+#EXT-X-MEDIA-SEQUENCE:7
+#EXT-X-PLAYLIST-TYPE:VOD
+#EXTINF:9.5,first
+seg0.ts
+#EXT-X-KEY:METHOD=AES-128,URI="key.bin",IV=0x10
+#EXTINF:10.0,
+http://cdn.example.com/seg1.ts
+#EXT-X-DISCONTINUITY
+#UPLYNK-SEGMENT:abc,00000000,ad
+#EXTINF:10.0,
+seg2.ts
+#UPLYNK-SEGMENT:abc,00000001,segment
+#EXT-X-KEY:METHOD=NONE
+#EXT-X-BYTERANGE:100@50
+#EXTINF:5.0,
+all.ts
+#EXT-X-BYTERANGE:30
+#EXTINF:5.0,
+all.ts
+#EXT-X-ENDLIST
+'''
+
+MASTER_PLAYLIST = '''#EXTM3U
+#EXT-X-STREAM-INF:BANDWIDTH=1280000,RESOLUTION=640x360,AUDIO="aac"
+low/index.m3u8
+#EXT-X-MEDIA:TYPE=AUDIO,GROUP-ID="aac",NAME="English",URI="audio/en.m3u8"
+#EXT-X-STREAM-INF:BANDWIDTH=2560000,CODECS="avc1.4d401f,mp4a.40.2"
+http://other.example.com/high.m3u8
+'''
+
+
+class TestM3U8Parser(unittest.TestCase):
+    def test_media_playlist(self):
+        playlist = parse_m3u8(MEDIA_PLAYLIST, 'http://example.com/hls/index.m3u8')
+        self.assertEqual(playlist['target_duration'], 10)
+        self.assertEqual(playlist['media_sequence'], 7)
+        self.assertEqual(playlist['playlist_type'], 'VOD')
+        self.assertTrue(playlist['endlist'])
+        self.assertEqual(playlist['variants'], [])
+        key = {
+            'METHOD': 'AES-128',
+            'URI': 'http://example.com/hls/key.bin',
+            'IV': '0x10',
+        }
+        self.assertEqual(playlist['segments'], [{
+            'url': 'http://example.com/hls/seg0.ts',
+            'media_sequence': 7,
+            'duration': 9.5,
+            'title': 'first',
+        }, {
+            'url': 'http://cdn.example.com/seg1.ts',
+            'media_sequence': 8,
+            'duration': 10.0,
+            'key': key,
+        }, {
+            'url': 'http://example.com/hls/seg2.ts',
+            'media_sequence': 9,
+            'duration': 10.0,
+            'key': key,
+            'discontinuity': True,
+            'ad': True,
+        }, {
+            'url': 'http://example.com/hls/all.ts',
+            'media_sequence': 10,
+            'duration': 5.0,
+            'byte_range': {'start': 50, 'end': 150},
+        }, {
+            'url': 'http://example.com/hls/all.ts',
+            'media_sequence': 11,
+            'duration': 5.0,
+            'byte_range': {'start': 150, 'end': 180},
+        }])
+
+    def test_master_playlist(self):
+        playlist = parse_m3u8(MASTER_PLAYLIST, 'http://example.com/master.m3u8')
+        self.assertEqual(playlist['target_duration'], None)
+        self.assertEqual(playlist['segments'], [])
+        self.assertEqual(playlist['media'], [{
+            'TYPE': 'AUDIO',
+            'GROUP-ID': 'aac',
+            'NAME': 'English',
+            'URI': 'audio/en.m3u8',
+        }])
+        self.assertEqual(playlist['variants'], [{
+            'url': 'http://example.com/low/index.m3u8',
+            'stream_inf': {
+                'BANDWIDTH': '1280000',
+                'RESOLUTION': '640x360',
+                'AUDIO': 'aac',
+            },
+        }, {
+            'url': 'http://other.example.com/high.m3u8',
+            'stream_inf': {
+                'BANDWIDTH': '2560000',
+                'CODECS': 'avc1.4d401f,mp4a.40.2',
+            },
+        }])
+
+    def test_urls(self):
+        for base_url in (
+                'http://example.com/a/b/index.m3u8?token=x/y',
+                'http://example.com',
+                'http://example.com/a/'):
+            parser = M3U8Parser(base_url)
+            for url in (
+                    'seg.ts', 'seg.ts?token=../x', 'a/b.ts', './seg.ts',
+                    '../seg.ts', 'a/../b.ts', '/seg.ts', '//cdn.example.com/seg.ts',
+                    '?seg=1', 'seg:1.ts', 'a//b.ts', 'https://cdn.example.com/seg.ts'):
+                self.assertEqual(
+                    parser._url(url), compat_urlparse.urljoin(base_url, url))
+
+    def test_incremental(self):
+        expected = parse_m3u8(MEDIA_PLAYLIST, 'http://example.com/')
+        for size in (1, 7, 64):
+            parser = M3U8Parser('http://example.com/')
+            doc = MEDIA_PLAYLIST.replace('\n', '\r\n')
+            for i in range(0, len(doc), size):
+                parser.feed(doc[i:i + size])
+            self.assertEqual(parser.close(), expected)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -8,10 +8,245 @@ import sys
 import unittest
 sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 
-from youtube_dl.postprocessor import MetadataFromTitlePP
+import shutil
+import tempfile
+import threading
+
+from test.helper import FakeYDL
+from youtube_dl.postprocessor import (
+    FFmpegEmbedSubtitlePP,
+    FFmpegFixupStretchedPP,
+    FFmpegMetadataPP,
+    FFmpegPostProcessor,
+    FFmpegStreamer,
+    MetadataFromTitlePP,
+)
+from youtube_dl.postprocessor.common import PostProcessor
+from youtube_dl.postprocessor.ffmpeg import FFmpegPostProcessorError
+import youtube_dl.postprocessor.ffmpeg
 
 
 class TestMetadataFromTitle(unittest.TestCase):
     def test_format_to_regex(self):
         pp = MetadataFromTitlePP(None, '%(title)s - %(artist)s')
         self.assertEqual(pp._titleregex, r'(?P<title>.+)\ \-\ (?P<artist>.+)')
+
+
+@unittest.skipIf(sys.platform == 'win32', 'needs shell scripts')
+class TestFFmpegExecutables(unittest.TestCase):
+    def setUp(self):
+        self.tmpdir = tempfile.mkdtemp()
+        self.bindir = os.path.join(self.tmpdir, 'bin')
+        os.mkdir(self.bindir)
+        for program in ('ffmpeg', 'ffprobe'):
+            self.write_program(program, '4.4')
+        self.probed = []
+
+        def get_exe_version(exe, *args, **kwargs):
+            self.probed.append(os.path.basename(exe))
+            return self.get_exe_version(exe, *args, **kwargs)
+        self.get_exe_version = youtube_dl.postprocessor.ffmpeg.get_exe_version
+        youtube_dl.postprocessor.ffmpeg.get_exe_version = get_exe_version
+        FFmpegPostProcessor._executables.clear()
+
+    def tearDown(self):
+        youtube_dl.postprocessor.ffmpeg.get_exe_version = self.get_exe_version
+        FFmpegPostProcessor._executables.clear()
+        shutil.rmtree(self.tmpdir)
+
+    def write_program(self, program, version):
+        fn = os.path.join(self.bindir, program)
+        with open(fn, 'w') as f:
+            f.write('#!/bin/sh\necho "%s version %s"\n' % (program, version))
+        os.chmod(fn, 0o755)
+
+    def test_executables(self):
+        ydl = FakeYDL({
+            'ffmpeg_location': self.bindir,
+            'cachedir': os.path.join(self.tmpdir, 'cache'),
+        })
+        pp = FFmpegPostProcessor(ydl)
+        self.assertEqual(pp.basename, 'ffmpeg')
+        self.assertEqual(pp.probe_basename, 'ffprobe')
+        self.assertEqual(pp.executable, os.path.join(self.bindir, 'ffmpeg'))
+        self.assertEqual(pp._versions['ffmpeg'], '4.4')
+        self.assertEqual(sorted(self.probed), ['avconv', 'avprobe', 'ffmpeg', 'ffprobe'])
+
+        # Probed once per process
+        del self.probed[:]
+        FFmpegPostProcessor(ydl)
+        self.assertEqual(self.probed, [])
+
+        # and, with the cache, once per change of the executables
+        FFmpegPostProcessor._executables.clear()
+        self.assertEqual(FFmpegPostProcessor.get_versions(ydl)['ffprobe'], '4.4')
+        self.assertEqual(self.probed, [])
+
+        FFmpegPostProcessor._executables.clear()
+        self.write_program('ffmpeg', '5.0')
+        fn = os.path.join(self.bindir, 'ffmpeg')
+        os.utime(fn, (0, os.path.getmtime(fn) + 10))
+        self.assertEqual(FFmpegPostProcessor.get_versions(ydl)['ffmpeg'], '5.0')
+        self.assertEqual(self.probed, ['ffmpeg'])
+
+
+# Stands in for ffmpeg: copies its inputs one after the other to its output
+# after a line with its options, fails if an option is "fail"
+FAKE_FFMPEG = r'''#!%s
+import sys
+args = sys.argv[1:]
+if args == ['-version']:
+    print('ffmpeg version 4.4')
+    sys.exit()
+inputs = [args[i + 1] for i, arg in enumerate(args) if arg == '-i']
+opts = [
+    arg for i, arg in enumerate(args[:-1])
+    if arg != '-i' and (i == 0 or args[i - 1] != '-i')]
+if 'fail' in opts:
+    sys.stderr.write('Invalid argument\n')
+    sys.exit(1)
+with open(args[-1][len('file:'):], 'wb') as out:
+    out.write((' '.join(opts) + '\n').encode('utf-8'))
+    for path in inputs:
+        if path == 'pipe:0':
+            f = getattr(sys.stdin, 'buffer', sys.stdin)
+        else:
+            f = open(path[len('file:'):], 'rb')
+        out.write(f.read())
+'''
+
+
+@unittest.skipIf(sys.platform == 'win32', 'needs an executable script')
+class TestFFmpegStreamer(unittest.TestCase):
+    def setUp(self):
+        self.tmpdir = tempfile.mkdtemp()
+        fn = os.path.join(self.tmpdir, 'ffmpeg')
+        with open(fn, 'w') as f:
+            f.write(FAKE_FFMPEG % sys.executable)
+        os.chmod(fn, 0o755)
+        self.ydl = FakeYDL({'ffmpeg_location': fn, 'cachedir': False})
+        self.out_path = os.path.join(self.tmpdir, 'out.mp4')
+        FFmpegPostProcessor._executables.clear()
+
+    def tearDown(self):
+        FFmpegPostProcessor._executables.clear()
+        shutil.rmtree(self.tmpdir)
+
+    def stream(self, inputs, opts):
+        streamer = FFmpegStreamer(self.ydl, self.out_path, opts, len(inputs))
+        self.assertTrue(streamer.supported)
+        streamer.start()
+
+        def write(index):
+            stream = streamer.open_input(index)
+            for i in range(0, len(inputs[index]), 1000):
+                stream.write(inputs[index][i:i + 1000])
+            stream.close()
+        threads = [threading.Thread(target=write, args=(index, )) for index in range(len(inputs))]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        streamer.finish(True)
+        with open(self.out_path, 'rb') as f:
+            return f.read()
+
+    def test_single(self):
+        data = b'video' * 100000
+        self.assertEqual(
+            self.stream([data], ['-c', 'copy', '-f', 'mp4']),
+            b'-y -loglevel repeat+info -c copy -f mp4\n' + data)
+
+    @unittest.skipUnless(hasattr(os, 'mkfifo'), 'needs FIFOs')
+    def test_merge(self):
+        video, audio = b'video' * 100000, b'audio' * 100000
+        self.assertEqual(
+            self.stream([video, audio], ['-c', 'copy']),
+            b'-y -loglevel repeat+info -c copy\n' + video + audio)
+
+    def test_error(self):
+        self.assertRaises(FFmpegPostProcessorError, self.stream, [b'video'], ['fail'])
+        self.assertFalse(os.path.exists(self.out_path))
+
+
+@unittest.skipIf(sys.platform == 'win32', 'needs an executable script')
+class TestFFmpegSteps(unittest.TestCase):
+    def setUp(self):
+        self.tmpdir = tempfile.mkdtemp()
+        fn = os.path.join(self.tmpdir, 'ffmpeg')
+        with open(fn, 'w') as f:
+            f.write(FAKE_FFMPEG % sys.executable)
+        os.chmod(fn, 0o755)
+        self.ydl = FakeYDL({'ffmpeg_location': fn, 'cachedir': False})
+        self.filename = os.path.join(self.tmpdir, 'video.mp4')
+        with open(self.filename, 'wb') as f:
+            f.write(b'video')
+        self.sub_filename = os.path.join(self.tmpdir, 'video.en.vtt')
+        with open(self.sub_filename, 'wb') as f:
+            f.write(b'subtitles')
+        FFmpegPostProcessor._executables.clear()
+
+    def tearDown(self):
+        FFmpegPostProcessor._executables.clear()
+        shutil.rmtree(self.tmpdir)
+
+    def post_process(self, pps):
+        for pp in pps:
+            self.ydl.add_post_processor(pp(self.ydl))
+        self.ydl.post_process(self.filename, {
+            'ext': 'mp4',
+            'title': 'Title',
+            'stretched_ratio': 2,
+            'requested_subtitles': {'en': {'ext': 'vtt'}},
+        })
+        with open(self.filename, 'rb') as f:
+            return f.read()
+
+    def test_single_invocation(self):
+        self.assertEqual(self.post_process([
+            FFmpegFixupStretchedPP,
+            FFmpegMetadataPP,
+            FFmpegEmbedSubtitlePP,
+        ]), b' '.join([
+            b'-y -loglevel repeat+info',
+            b'-map 0 -map -0:s -map -0:d -map 1:0',
+            b'-c copy -aspect 2.000000 -metadata title=Title',
+            b'-c:s mov_text -metadata:s:s:0 language=eng\n',
+        ]) + b'video' + b'subtitles')
+        self.assertFalse(os.path.exists(self.sub_filename))
+
+    def test_barrier(self):
+        contents = []
+
+        class RecordPP(PostProcessor):
+            def run(self, info):
+                with open(info['filepath'], 'rb') as f:
+                    contents.append(f.read())
+                return [], info
+
+        self.assertEqual(self.post_process([
+            FFmpegFixupStretchedPP,
+            RecordPP,
+            FFmpegMetadataPP,
+        ]), (
+            b'-y -loglevel repeat+info -c copy -metadata title=Title\n'
+            + b'-y -loglevel repeat+info -c copy -aspect 2.000000\n'
+            + b'video'))
+        self.assertEqual(contents, [b'-y -loglevel repeat+info -c copy -aspect 2.000000\nvideo'])
+
+    def test_overridden_run(self):
+        calls = []
+
+        class CustomMetadataPP(FFmpegMetadataPP):
+            def run(self, info):
+                calls.append(info['filepath'])
+                return super(CustomMetadataPP, self).run(info)
+
+        self.assertEqual(self.post_process([
+            FFmpegFixupStretchedPP,
+            CustomMetadataPP,
+        ]), (
+            b'-y -loglevel repeat+info -c copy -metadata title=Title\n'
+            + b'-y -loglevel repeat+info -c copy -aspect 2.000000\n'
+            + b'video'))
+        self.assertEqual(calls, [self.filename])
@@ -0,0 +1,173 @@
+#!/usr/bin/env python
+# coding: utf-8
+
+from __future__ import unicode_literals
+
+# Allow direct execution
+import os
+import sys
+import unittest
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import threading
+import time
+
+from youtube_dl.scheduler import JobScheduler, WorkerPool, job_host
+
+
+class TestJobScheduler(unittest.TestCase):
+    def setUp(self):
+        self.lock = threading.Lock()
+        self.running = {}
+        self.max_running = {}
+
+    def job(self, host, value):
+        with self.lock:
+            self.running[host] = self.running.get(host, 0) + 1
+            self.running[None] = self.running.get(None, 0) + 1
+            for key in (host, None):
+                self.max_running[key] = max(
+                    self.max_running.get(key, 0), self.running[key])
+        time.sleep(0.02)
+        with self.lock:
+            self.running[host] -= 1
+            self.running[None] -= 1
+        return value
+
+    def test_results_and_caps(self):
+        scheduler = JobScheduler(4, 2)
+        jobs = [
+            ('a' if i % 2 else 'b', self.job, ('a' if i % 2 else 'b', i))
+            for i in range(20)]
+        self.assertEqual(scheduler.run(jobs), list(range(20)))
+        self.assertEqual(self.max_running[None], 4)
+        self.assertEqual(self.max_running['a'], 2)
+        self.assertEqual(self.max_running['b'], 2)
+
+        self.max_running = {}
+        jobs = [('a', self.job, ('a', i)) for i in range(6)]
+        self.assertEqual(scheduler.run(jobs), list(range(6)))
+        self.assertEqual(self.max_running['a'], 2)
+
+    def test_nested(self):
+        scheduler = JobScheduler(2)
+
+        def parent(i):
+            return scheduler.run([
+                ('', self.job, ('', i * 10 + j)) for j in range(3)])
+
+        self.assertEqual(
+            scheduler.run([('', parent, (i, )) for i in range(4)]),
+            [[i * 10 + j for j in range(3)] for i in range(4)])
+        self.assertTrue(self.max_running[None] <= 2)
+
+    def test_nested_caps(self):
+        scheduler = JobScheduler(2, 1)
+        counts = []
+
+        def parent(i):
+            scheduler.run([('', self.job, ('', i)) for _ in range(2)])
+            # Parents get their slot back within the caps
+            with scheduler._cond:
+                counts.append((scheduler._running, scheduler._host_running['a']))
+            time.sleep(0.05)
+
+        scheduler.run([('a', parent, (i, )) for i in range(4)])
+        self.assertEqual(len(counts), 4)
+        for running, host_running in counts:
+            self.assertTrue(running <= 2)
+            self.assertEqual(host_running, 1)
+
+    def test_error(self):
+        scheduler = JobScheduler(2)
+        started = []
+
+        def job(i):
+            started.append(i)
+            if i == 1:
+                raise ValueError('job %d' % i)
+            time.sleep(0.05)
+
+        self.assertRaises(
+            ValueError, scheduler.run, [('', job, (i, )) for i in range(10)])
+        # Pending jobs are dropped after a failure
+        self.assertTrue(len(started) < 10)
+        # The scheduler is still usable
+        self.assertEqual(scheduler.run([('', lambda: 1, ())]), [1])
+
+    def test_job_host(self):
+        self.assertEqual(job_host('https://WWW.Example.com:8080/x'), 'www.example.com')
+        self.assertEqual(job_host(None), '')
+        self.assertEqual(job_host('ytsearch:foo'), '')
+
+
+class TestWorkerPool(unittest.TestCase):
+    def test_order_and_workers(self):
+        pool = WorkerPool(3)
+        lock = threading.Lock()
+        running = [0, 0]
+        finished = []
+
+        def task(i):
+            with lock:
+                running[0] += 1
+                running[1] = max(running[1], running[0])
+            time.sleep(0.01 * (i % 4))
+            with lock:
+                running[0] -= 1
+            return i
+
+        for i in range(12):
+            pool.submit(task, (i, ), finished.append)
+        pool.join()
+        self.assertEqual(finished, list(range(12)))
+        self.assertEqual(running[1], 3)
+
+    def test_error(self):
+        pool = WorkerPool(1)
+        finished = []
+
+        def task(i):
+            if i == 1:
+                raise ValueError('task %d' % i)
+            time.sleep(0.02)
+            return i
+
+        def submit_all():
+            for i in range(10):
+                pool.submit(task, (i, ), finished.append)
+            pool.join()
+
+        self.assertRaises(ValueError, submit_all)
+        self.assertEqual(finished, [0])
+        # The pool is still usable
+        pool.submit(task, (2, ), finished.append)
+        pool.join()
+        self.assertEqual(finished, [0, 2])
+
+    def test_error_after_slower_task(self):
+        pool = WorkerPool(3)
+        finished = []
+
+        def task(i):
+            if i == 1:
+                raise ValueError('task %d' % i)
+            time.sleep(0.1 if i == 0 else 0.05)
+            return i
+
+        def submit_all():
+            for i in range(3):
+                pool.submit(task, (i, ), finished.append)
+            pool.join()
+
+        # The task submitted before the failing one is finished although it
+        # is done after the failure, the one submitted after it is not
+        self.assertRaises(ValueError, submit_all)
+        self.assertEqual(finished, [0])
+        pool.submit(task, (3, ), finished.append)
+        pool.join()
+        self.assertEqual(finished, [0, 3])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -13,6 +13,8 @@ sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 # Various small unit tests
 import io
 import json
+import threading
+import time
 import xml.etree.ElementTree
 
 from youtube_dl.utils import (
@@ -52,6 +54,7 @@ from youtube_dl.utils import (
     multipart_encode,
     ohdave_rsa_encrypt,
     OnDemandPagedList,
+    PrefetchingOnDemandPagedList,
     orderedSet,
     parse_age_limit,
     parse_duration,
@@ -639,6 +642,19 @@ class TestUtil(unittest.TestCase):
             got = iapl.getslice(*sliceargs)
             self.assertEqual(got, expected)
 
+            got = list(pl.iterslice(*sliceargs))
+            self.assertEqual(got, expected)
+            got = list(iapl.iterslice(*sliceargs))
+            self.assertEqual(got, expected)
+
+            ppl = PrefetchingOnDemandPagedList(get_page, pagesize, cache_size=1)
+            got = ppl.getslice(*sliceargs)
+            self.assertEqual(got, expected)
+
+            iapl = InAdvancePagedList(get_page, size // pagesize + 1, pagesize, workers=1)
+            got = iapl.getslice(*sliceargs)
+            self.assertEqual(got, expected)
+
         testPL(5, 2, (), [0, 1, 2, 3, 4])
         testPL(5, 2, (1,), [1, 2, 3, 4])
         testPL(5, 2, (2,), [2, 3, 4])
@@ -648,6 +664,39 @@ class TestUtil(unittest.TestCase):
         testPL(5, 2, (2, 99), [2, 3, 4])
         testPL(5, 2, (20, 99), [])
 
+    def test_paged_list_prefetch(self):
+        fetched = []
+        lock = threading.Lock()
+
+        def get_page(pagenum):
+            with lock:
+                fetched.append(pagenum)
+            if pagenum == 7:
+                raise ValueError('page %d' % pagenum)
+            return range(pagenum * 10, pagenum * 10 + (10 if pagenum < 9 else 5))
+
+        pl = PrefetchingOnDemandPagedList(get_page, 10, prefetch=2, cache_size=2)
+        it = pl.iterslice()
+        self.assertEqual(next(it), 0)
+        # The next pages are fetched while the first one is processed
+        time.sleep(0.1)
+        self.assertEqual(sorted(fetched), [0, 1, 2])
+        self.assertEqual([next(it) for _ in range(20)], list(range(1, 21)))
+        self.assertRaises(ValueError, list, it)
+
+        # Only the most recently used pages are cached
+        del fetched[:]
+        pl = OnDemandPagedList(get_page, 10, cache_size=2)
+        self.assertEqual(pl.getslice(0, 30), list(range(30)))
+        self.assertEqual(pl.getslice(10, 30), list(range(10, 30)))
+        self.assertEqual(pl.getslice(0, 10), list(range(10)))
+        self.assertEqual(fetched, [0, 1, 2, 0])
+
+        del fetched[:]
+        iapl = InAdvancePagedList(get_page, 5, 10, workers=3)
+        self.assertEqual(iapl.getslice(15, 35), list(range(15, 35)))
+        self.assertEqual(sorted(fetched), [1, 2, 3])
+
     def test_read_batch_urls(self):
         f = io.StringIO('''\xef\xbb\xbf foo
             bar\r
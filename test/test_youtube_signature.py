@@ -10,6 +10,7 @@ sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 
 import io
 import re
+import shutil
 import string
 
 from test.helper import FakeYDL
@@ -87,6 +88,34 @@ class TestPlayerInfo(unittest.TestCase):
             self.assertEqual(player_id, expected_player_id)
 
 
+class TestPlayerCache(unittest.TestCase):
+    def setUp(self):
+        TEST_DIR = os.path.dirname(os.path.abspath(__file__))
+        self.cache_dir = os.path.join(TEST_DIR, 'testdata', 'player_cache_test')
+        self.tearDown()
+
+    def tearDown(self):
+        if os.path.exists(self.cache_dir):
+            shutil.rmtree(self.cache_dir)
+
+    def test_load_player(self):
+        downloads = []
+
+        class CountingYoutubeIE(YoutubeIE):
+            def _download_webpage(self, url, *args, **kwargs):
+                downloads.append(url)
+                return 'var player;'
+
+        player_url = 'https://www.youtube.com/s/player/64dddad9/player_ias.vflset/en_US/base.js'
+        for _ in range(2):
+            ie = CountingYoutubeIE(FakeYDL({'cachedir': self.cache_dir}))
+            for _ in range(2):
+                self.assertEqual(
+                    ie._load_player('x', player_url, '64dddad9'), 'var player;')
+        # Later processes read the player from the cache
+        self.assertEqual(downloads, [player_url])
+
+
 class TestSignature(unittest.TestCase):
     def setUp(self):
         TEST_DIR = os.path.dirname(os.path.abspath(__file__))
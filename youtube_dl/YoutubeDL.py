@@ -9,6 +9,7 @@ import copy
 import datetime
 import errno
 import fileinput
+import functools
 import io
 import itertools
 import json
@@ -22,6 +23,7 @@ import subprocess
 import socket
 import sys
 import time
+import threading
 import tokenize
 import traceback
 import random
@@ -51,6 +53,7 @@ from .utils import (
     DEFAULT_OUTTMPL,
     determine_ext,
     determine_protocol,
+    DownloadCancelled,
     DownloadError,
     encode_compat_str,
     encodeFilename,
@@ -60,9 +63,9 @@ from .utils import (
     format_bytes,
     formatSeconds,
     GeoRestrictedError,
+    HTTPConnectionPool,
     int_or_none,
     ISO3166Utils,
-    locked_file,
     make_HTTPS_handler,
     MaxDownloadsReached,
     orderedSet,
@@ -94,19 +97,28 @@ from .utils import (
     YoutubeDLHandler,
     YoutubeDLRedirectHandler,
 )
-from .cache import Cache
+from .archive import ARCHIVE_FORMATS, DownloadArchiveError
+from .cache import Cache, InfoDictCache
 from .extractor import get_info_extractor, gen_extractor_classes, _LAZY_LOADER
+from .extractor.dispatch import ExtractorDispatcher
 from .extractor.openload import PhantomJSwrapper
-from .downloader import get_suitable_downloader
+from .downloader import FileDownloader, get_suitable_downloader
+from .downloader.fragment import FragmentFD
+from .downloader.http import HttpFD
+from .downloader.progress import CombinedProgress, NDJSONProgressWriter
 from .downloader.rtmp import rtmpdump_version
+from .scheduler import JobScheduler, WorkerPool, job_host
 from .postprocessor import (
+    ExecAfterDownloadPP,
     FFmpegFixupM3u8PP,
     FFmpegFixupM4aPP,
     FFmpegFixupStretchedPP,
     FFmpegMergerPP,
     FFmpegPostProcessor,
+    FFmpegStreamer,
     get_postprocessor,
 )
+from .postprocessor.ffmpeg import plan_ffmpeg_steps
 from .version import __version__
 
 if compat_os_name == 'nt':
@@ -173,6 +185,10 @@ class YoutubeDL(object):
     playlist_items:    Specific indices of playlist to download.
     playlistreverse:   Download playlist items in reverse order.
     playlistrandom:    Download playlist items in random order.
+    lazy_playlist:     Process playlist entries as they are collected instead
+                       of collecting the whole playlist first. n_entries is
+                       not known then and processed entries are not returned
+                       when downloading (unless dump_single_json is set).
     matchtitle:        Download only matching titles.
     rejecttitle:       Reject downloads for matching titles.
     logger:            Log messages to a logging.Logger instance.
@@ -194,6 +210,13 @@ class YoutubeDL(object):
     skip_download:     Skip the actual download of the video file
     cachedir:          Location of the cache files in the filesystem.
                        False to disable filesystem cache.
+    info_cache_ttl:    Reuse extraction results of videos stored in the
+                       cache less than this many seconds ago (None to
+                       disable). Entries expire earlier if the media URLs
+                       carry an expiry time.
+    cache_max_size:    Maximum size of the cache directory in bytes, the
+                       least recently used files are removed once it is
+                       exceeded (default 256MiB, 0 for no limit).
     noplaylist:        Download single video instead of a playlist if in doubt.
     age_limit:         An integer representing the user's age in years.
                        Unsuitable videos for the given age are skipped.
@@ -209,6 +232,13 @@ class YoutubeDL(object):
     download_archive:  File name of a file where all downloads are recorded.
                        Videos already present in the file are not downloaded
                        again.
+    download_archive_format: Format of the download archive, either "text"
+                       (default, one video per line) or "sqlite" (a SQLite
+                       database that can be shared by concurrent processes).
+    jobs:              Number of URLs and playlist entries to extract and
+                       download concurrently (default is 1).
+    jobs_per_host:     Maximum number of concurrent jobs for URLs of the
+                       same host (default is no limit).
     cookiefile:        File name where cookies should be read from and dumped to.
     nocheckcertificate:Do not verify SSL certificates
     prefer_insecure:   Use HTTP instead of HTTPS to retrieve information.
@@ -217,6 +247,12 @@ class YoutubeDL(object):
     geo_verification_proxy:  URL of the proxy to use for IP address verification
                        on geo-restricted sites.
     socket_timeout:    Time to wait for unresponsive hosts, in seconds
+    http_keep_alive:   Reuse HTTP connections for later requests to the same
+                       host (default is True).
+    keep_alive_timeout: Time after which idle connections are closed, in
+                       seconds (default is 15).
+    max_connections_per_host: Maximum number of concurrent connections to the
+                       same host (default is 8).
     bidi_workaround:   Work around buggy terminals without bidirectional text
                        support, using fridibi
     debug_printtraffic:Print out sent and received HTTP traffic
@@ -232,6 +268,12 @@ class YoutubeDL(object):
                                youtube_dl/postprocessor/__init__.py for a list.
                        as well as any further keyword arguments for the
                        postprocessor.
+    postprocessor_workers: Number of threads to run the postprocessors in
+                       while the next videos are downloaded. None or 0 to
+                       post-process each video before downloading the next
+                       one. The postprocessors from ExecAfterDownload on and
+                       the download archive are still run in the order the
+                       videos were downloaded.
     progress_hooks:    A list of functions that get called on download
                        progress, with a dictionary with the entries
                        * status: One of "downloading", "error", or "finished".
@@ -256,6 +298,10 @@ class YoutubeDL(object):
 
                        Progress hooks are guaranteed to be called at least once
                        (with status "finished") if the download is successful.
+                       "downloading" updates are coalesced, see progress_rate.
+    progress_fd:       File descriptor to write progress updates to as JSON
+                       objects, one per line (the progress_hooks dictionaries
+                       without entries that cannot be serialized).
     merge_output_format: Extension to use when merging formats.
     fixup:             Automatically correct known faults of the file.
                        One of:
@@ -263,6 +309,10 @@ class YoutubeDL(object):
                        - "warn": only emit a warning
                        - "detect_or_warn": check whether we can do anything
                                            about it, warn otherwise (default)
+    stream_postprocess: Merge and fix up formats with ffmpeg while they are
+                       downloaded, piping them into it instead of writing
+                       them to disk first, when they can be read without
+                       seeking. Such downloads cannot be resumed.
     source_address:    Client-side IP address to bind to.
     call_home:         Boolean, true iff we are allowed to contact the
                        youtube-dl servers for debugging.
@@ -298,15 +348,16 @@ class YoutubeDL(object):
     external_downloader: Executable of the external downloader to call.
                        None or unset for standard (built-in) downloader.
     hls_prefer_native: Use the native HLS downloader instead of ffmpeg/avconv
-                       if True, otherwise use ffmpeg/avconv if False, otherwise
-                       use downloader suggested by extractor if None.
+                       if True (also for live streams), otherwise use
+                       ffmpeg/avconv if False, otherwise use downloader
+                       suggested by extractor if None.
 
     The following parameters are not used by YoutubeDL itself, they are used by
     the downloader (see youtube_dl/downloader/common.py):
-    nopart, updatetime, buffersize, ratelimit, min_filesize, max_filesize, test,
-    noresizebuffer, retries, continuedl, noprogress, consoletitle,
-    xattr_set_filesize, external_downloader_args, hls_use_mpegts,
-    http_chunk_size.
+    nopart, updatetime, buffersize, ratelimit, ratelimit_per_host, min_filesize,
+    max_filesize, test, noresizebuffer, retries, continuedl, noprogress,
+    consoletitle, xattr_set_filesize, external_downloader_args, hls_use_mpegts,
+    http_chunk_size, http_chunks, concurrent_fragments, progress_rate.
 
     The following options are used by the post processors:
     prefer_ffmpeg:     If False, use avconv instead of ffmpeg if both are available,
@@ -339,9 +390,8 @@ class YoutubeDL(object):
     _pps = []
     _download_retcode = None
     _num_downloads = None
-    _playlist_level = 0
-    _playlist_urls = set()
     _screen_file = None
+    _connection_pool = None
 
     def __init__(self, params=None, auto_init=True):
         """Create a FileDownloader object with the given options."""
@@ -349,10 +399,18 @@ class YoutubeDL(object):
             params = {}
         self._ies = []
         self._ies_instances = {}
+        self._ies_dispatcher = None
         self._pps = []
         self._progress_hooks = []
         self._download_retcode = 0
         self._num_downloads = 0
+        self._lock = threading.RLock()
+        self._output_lock = threading.RLock()
+        # Whether the last line written to the screen was not terminated
+        self._screen_line_open = False
+        self._scheduler = None
+        self._pp_pool = None
+        self._thread_state = threading.local()
         self._screen_file = [sys.stdout, sys.stderr][params.get('logtostderr', False)]
         self._err_file = sys.stderr
         self.params = {
@@ -361,6 +419,9 @@ class YoutubeDL(object):
         }
         self.params.update(params)
         self.cache = Cache(self)
+        info_cache_ttl = self.params.get('info_cache_ttl')
+        self._info_cache = InfoDictCache(self.cache, info_cache_ttl) if info_cache_ttl else None
+        self._archive = None
 
         def check_deprecated(param, option, suggestion):
             if self.params.get(param) is not None:
@@ -434,6 +495,8 @@ class YoutubeDL(object):
 
         for ph in self.params.get('progress_hooks', []):
             self.add_progress_hook(ph)
+        if self.params.get('progress_fd') is not None:
+            self.add_progress_hook(NDJSONProgressWriter(self.params['progress_fd']))
 
         register_socks_protocols()
 
@@ -456,6 +519,8 @@ class YoutubeDL(object):
     def add_info_extractor(self, ie):
         """Add an InfoExtractor object to the end of the list."""
         self._ies.append(ie)
+        if self._ies_dispatcher is not None:
+            self._ies_dispatcher.add(ie)
         if not isinstance(ie, type):
             self._ies_instances[ie.ie_key()] = ie
             ie.set_downloader(self)
@@ -472,6 +537,15 @@ class YoutubeDL(object):
             self.add_info_extractor(ie)
         return ie
 
+    def _suitable_ie_candidates(self, url):
+        """
+        Return the extractors that may be suitable for url, in the order
+        they were added
+        """
+        if self._ies_dispatcher is None:
+            self._ies_dispatcher = ExtractorDispatcher(self._ies)
+        return self._ies_dispatcher.candidates(url)
+
     def add_default_info_extractors(self):
         """
         Add the InfoExtractors returned by gen_extractors to the end of the list
@@ -513,11 +587,16 @@ class YoutubeDL(object):
         if self.params.get('logger'):
             self.params['logger'].debug(message)
         elif not check_quiet or not self.params.get('quiet', False):
-            message = self._bidi_workaround(message)
-            terminator = ['\n', ''][skip_eol]
-            output = message + terminator
+            with self._output_lock:
+                message = self._bidi_workaround(message)
+                terminator = ['\n', ''][skip_eol]
+                output = message + terminator
+                if self._concurrent_output() and not message.startswith('\r'):
+                    # Do not append to a progress line of another job
+                    output = self._close_screen_line() + output
+                self._screen_line_open = skip_eol
 
-            self._write_string(output, self._screen_file)
+                self._write_string(output, self._screen_file)
 
     def to_stderr(self, message):
         """Print message to stderr."""
@@ -525,9 +604,22 @@ class YoutubeDL(object):
         if self.params.get('logger'):
             self.params['logger'].error(message)
         else:
-            message = self._bidi_workaround(message)
-            output = message + '\n'
-            self._write_string(output, self._err_file)
+            with self._output_lock:
+                message = self._bidi_workaround(message)
+                output = message + '\n'
+                if self._concurrent_output() and self._screen_line_open:
+                    self._write_string(self._close_screen_line(), self._screen_file)
+                self._write_string(output, self._err_file)
+
+    def _concurrent_output(self):
+        return (self._scheduler is not None and self._scheduler.max_jobs > 1
+                or self._pp_pool is not None)
+
+    def _close_screen_line(self):
+        if not self._screen_line_open:
+            return ''
+        self._screen_line_open = False
+        return '\n'
 
     def to_console_title(self, message):
         if not self.params.get('consoletitle', False):
@@ -564,9 +656,18 @@ class YoutubeDL(object):
 
     def __exit__(self, *args):
         self.restore_console_title()
-
-        if self.params.get('cookiefile') is not None:
-            self.cookiejar.save(ignore_discard=True, ignore_expires=True)
+        try:
+            # The postprocessor workers are killed when the process exits
+            self._wait_for_postprocessors()
+        finally:
+            self.close_download_archive()
+            if self._connection_pool is not None:
+                self._connection_pool.close()
+            if self.params.get('verbose') and any(self.cache.stats.values()):
+                self._write_string('[debug] Cache: %s\n' % self.cache.format_stats())
+
+            if self.params.get('cookiefile') is not None:
+                self.cookiejar.save(ignore_discard=True, ignore_expires=True)
 
     def trouble(self, message=None, tb=None):
         """Determine action to take when a download problem appears.
@@ -794,7 +895,7 @@ class YoutubeDL(object):
         if ie_key:
             ies = [self.get_info_extractor(ie_key)]
         else:
-            ies = self._ies
+            ies = self._suitable_ie_candidates(url)
 
         for ie in ies:
             if not ie.suitable(url):
@@ -833,7 +934,17 @@ class YoutubeDL(object):
 
     @__handle_extraction_exceptions
     def __extract_info(self, url, ie, download, extra_info, process):
-        ie_result = ie.extract(url)
+        ie_result = None
+        video_id = self._info_cache and ie.get_temp_id(url)
+        if video_id:
+            ie_result = self._info_cache.load(ie.ie_key(), video_id, url)
+            if ie_result is not None:
+                self.to_screen('[%s] %s: Using cached extraction result' % (ie.IE_NAME, video_id))
+        if ie_result is None:
+            ie_result = ie.extract(url)
+            if video_id and isinstance(ie_result, dict):
+                self._info_cache.store(
+                    ie.ie_key(), video_id, url, self._strip_in_process_fields(ie_result))
         if ie_result is None:  # Finished already (backwards compatibility; listformats and friends should be moved here)
             return
         if isinstance(ie_result, list):
@@ -999,48 +1110,71 @@ class YoutubeDL(object):
                 '[%s] playlist %s: Downloading %d videos' %
                 (ie_result['extractor'], playlist, num_entries))
 
-        if isinstance(ie_entries, list):
-            n_all_entries = len(ie_entries)
-            if playlistitems:
-                entries = make_playlistitems_entries(ie_entries)
-            else:
-                entries = ie_entries[playliststart:playlistend]
-            n_entries = len(entries)
+        lazy = self.params.get('lazy_playlist') and not isinstance(ie_entries, list)
+        if lazy and (self.params.get('playlistreverse') or self.params.get('playlistrandom')):
+            self.report_warning(
+                'Reversing or shuffling a playlist needs all of its entries, '
+                'processing the playlist %s as a whole' % playlist)
+            lazy = False
+
+        if lazy:
+            indexed_entries = self.__iter_playlist_entries(
+                ie_entries, playliststart, playlistend, playlistitems)
+            n_entries = None
             self.to_screen(
-                '[%s] playlist %s: Collected %d video ids (downloading %d of them)' %
-                (ie_result['extractor'], playlist, n_all_entries, n_entries))
-        elif isinstance(ie_entries, PagedList):
-            if playlistitems:
-                entries = []
-                for item in playlistitems:
-                    entries.extend(ie_entries.getslice(
-                        item - 1, item
-                    ))
-            else:
-                entries = ie_entries.getslice(
-                    playliststart, playlistend)
-            n_entries = len(entries)
-            report_download(n_entries)
-        else:  # iterable
-            if playlistitems:
-                entries = make_playlistitems_entries(list(itertools.islice(
-                    ie_entries, 0, max(playlistitems))))
-            else:
-                entries = list(itertools.islice(
-                    ie_entries, playliststart, playlistend))
-            n_entries = len(entries)
-            report_download(n_entries)
+                '[%s] playlist %s: Downloading videos as they are collected' %
+                (ie_result['extractor'], playlist))
+        else:
+            if isinstance(ie_entries, list):
+                n_all_entries = len(ie_entries)
+                if playlistitems:
+                    entries = make_playlistitems_entries(ie_entries)
+                else:
+                    entries = ie_entries[playliststart:playlistend]
+                n_entries = len(entries)
+                self.to_screen(
+                    '[%s] playlist %s: Collected %d video ids (downloading %d of them)' %
+                    (ie_result['extractor'], playlist, n_all_entries, n_entries))
+            elif isinstance(ie_entries, PagedList):
+                if playlistitems:
+                    entries = []
+                    for item in playlistitems:
+                        entries.extend(ie_entries.getslice(
+                            item - 1, item
+                        ))
+                else:
+                    entries = ie_entries.getslice(
+                        playliststart, playlistend)
+                n_entries = len(entries)
+                report_download(n_entries)
+            else:  # iterable
+                if playlistitems:
+                    entries = make_playlistitems_entries(list(itertools.islice(
+                        ie_entries, 0, max(playlistitems))))
+                else:
+                    entries = list(itertools.islice(
+                        ie_entries, playliststart, playlistend))
+                n_entries = len(entries)
+                report_download(n_entries)
 
-        if self.params.get('playlistreverse', False):
-            entries = entries[::-1]
+            if self.params.get('playlistreverse', False):
+                entries = entries[::-1]
 
-        if self.params.get('playlistrandom', False):
-            random.shuffle(entries)
+            if self.params.get('playlistrandom', False):
+                random.shuffle(entries)
+
+            indexed_entries = [
+                (playlistitems[i - 1] if playlistitems else i + playliststart, entry)
+                for i, entry in enumerate(entries, 1)]
 
         x_forwarded_for = ie_result.get('__x_forwarded_for_ip')
+        skipped = object()
 
-        for i, entry in enumerate(entries, 1):
-            self.to_screen('[download] Downloading video %s of %s' % (i, n_entries))
+        def process_entry(i, playlist_index, entry):
+            if n_entries is None:
+                self.to_screen('[download] Downloading video %s' % i)
+            else:
+                self.to_screen('[download] Downloading video %s of %s' % (i, n_entries))
             # This __x_forwarded_for_ip thing is a bit ugly but requires
             # minimal changes
             if x_forwarded_for:
@@ -1052,7 +1186,7 @@ class YoutubeDL(object):
                 'playlist_title': ie_result.get('title'),
                 'playlist_uploader': ie_result.get('uploader'),
                 'playlist_uploader_id': ie_result.get('uploader_id'),
-                'playlist_index': playlistitems[i - 1] if playlistitems else i + playliststart,
+                'playlist_index': playlist_index,
                 'extractor': ie_result['extractor'],
                 'webpage_url': ie_result['webpage_url'],
                 'webpage_url_basename': url_basename(ie_result['webpage_url']),
@@ -1062,15 +1196,65 @@ class YoutubeDL(object):
             reason = self._match_entry(entry, incomplete=True)
             if reason is not None:
                 self.to_screen('[download] ' + reason)
-                continue
-
-            entry_result = self.__process_iterable_entry(entry, download, extra)
-            # TODO: skip failed (empty) entries?
-            playlist_results.append(entry_result)
+                return skipped
+
+            return self.__process_iterable_entry(entry, download, extra)
+
+        # Processed entries of lazily processed playlists are only kept when
+        # they are needed, so that memory use is bounded by the page size
+        keep_results = not lazy or not download or self.params.get('dump_single_json')
+        # Entries are handed to the jobs in batches, a lazily processed
+        # playlist is collected one batch ahead of the downloads at most
+        batch_size = None
+        if lazy:
+            max_jobs = self.params.get('jobs') or 1
+            batch_size = max_jobs * 2 if max_jobs > 1 else 1
+        jobs = (
+            (entry.get('url') or entry.get('webpage_url'), process_entry, (i, playlist_index, entry))
+            for i, (playlist_index, entry) in enumerate(indexed_entries, 1))
+        while True:
+            batch = list(itertools.islice(jobs, batch_size))
+            if not batch:
+                break
+            for entry_result in self._run_jobs(batch):
+                # TODO: skip failed (empty) entries?
+                if entry_result is not skipped and keep_results:
+                    playlist_results.append(entry_result)
         ie_result['entries'] = playlist_results
         self.to_screen('[download] Finished downloading playlist: %s' % playlist)
         return ie_result
 
+    @staticmethod
+    def __iter_playlist_entries(ie_entries, playliststart, playlistend, playlistitems):
+        """Yield (playlist_index, entry) tuples of a PagedList or iterable
+        playlist, fetching entries only as they are needed"""
+        if isinstance(ie_entries, PagedList):
+            if playlistitems:
+                for item in playlistitems:
+                    for entry in ie_entries.iterslice(item - 1, item):
+                        yield item, entry
+            else:
+                for i, entry in enumerate(
+                        ie_entries.iterslice(playliststart, playlistend), playliststart + 1):
+                    yield i, entry
+        elif playlistitems:
+            entries = itertools.islice(ie_entries, 0, max(playlistitems))
+            if list(playlistitems) == sorted(playlistitems):
+                wanted = set(playlistitems)
+                for i, entry in enumerate(entries, 1):
+                    if i in wanted:
+                        yield i, entry
+            else:
+                # Items out of order need the entries up to the last one
+                entries = list(entries)
+                for item in playlistitems:
+                    if item <= len(entries):
+                        yield item, entries[item - 1]
+        else:
+            for i, entry in enumerate(
+                    itertools.islice(ie_entries, playliststart, playlistend), playliststart + 1):
+                yield i, entry
+
     @__handle_extraction_exceptions
     def __process_iterable_entry(self, entry, download, extra_info):
         return self.process_ie_result(
@@ -1771,7 +1955,160 @@ class YoutubeDL(object):
             self.to_stdout(formatSeconds(info_dict['duration']))
         print_mandatory('format')
         if self.params.get('forcejson', False):
-            self.to_stdout(json.dumps(info_dict))
+            self.to_stdout(json.dumps(self._strip_in_process_fields(info_dict)))
+
+    def _make_downloader(self, info):
+        fd = get_suitable_downloader(info, self.params)(self, self.params)
+        for ph in self._progress_hooks:
+            fd.add_progress_hook(ph)
+        if self.params.get('verbose'):
+            self.to_screen('[debug] Invoking downloader on %r' % info.get('url'))
+        return fd
+
+    def _download_concurrently(self, downloads, streams=None):
+        """
+        Download the (filename, info_dict) pairs of downloads at once, each
+        with its own downloader, showing the progress of their total.
+        streams, if given, are the stream_to() functions of the downloaders.
+
+        When one of them fails the others are cancelled, leaving their
+        partial files to be resumed. Returns True if all of them succeed,
+        exceptions raised by the downloaders are raised again.
+        """
+        reporter = FileDownloader(self, self.params)
+        progress = CombinedProgress(
+            len(downloads), reporter.report_progress,
+            self.params.get('progress_rate', 10))
+        fds = []
+        for index, (name, info) in enumerate(downloads):
+            fd = self._make_downloader(info)
+            fd.remove_progress_hook(fd.report_progress)
+            fd.add_progress_hook(progress.hook(index))
+            if streams is not None:
+                fd.stream_to(streams[index])
+            fds.append(fd)
+
+        cond = threading.Condition()
+        results = {}
+
+        def run(index, fd, name, info):
+            try:
+                result = fd.download(name, info)
+            except DownloadCancelled:
+                result = False
+            except Exception as err:
+                result = err
+            with cond:
+                results[index] = result
+                if result is not True:
+                    for other in fds:
+                        other.cancel()
+                cond.notify_all()
+
+        threads = []
+        for index, (fd, (name, info)) in enumerate(zip(fds, downloads)):
+            thread = threading.Thread(target=run, args=(index, fd, name, info))
+            thread.daemon = True
+            thread.start()
+            threads.append(thread)
+        try:
+            with cond:
+                while len(results) < len(threads):
+                    # Wait with a timeout so that KeyboardInterrupt is
+                    # delivered to the main thread on python 2
+                    cond.wait(1)
+        except BaseException:
+            for fd in fds:
+                fd.cancel()
+            for thread in threads:
+                thread.join()
+            raise
+
+        for index in range(len(threads)):
+            if isinstance(results[index], Exception):
+                raise results[index]
+        return all(results[index] is True for index in range(len(threads)))
+
+    def _can_stream(self, info):
+        """Whether info can be downloaded into a pipe that ffmpeg reads
+        without seeking"""
+        if info.get('is_live'):
+            return False
+        fd = get_suitable_downloader(info, self.params)
+        if issubclass(fd, FragmentFD):
+            return True
+        # Progressive MP4 files may have their index at the end
+        return fd is HttpFD and (
+            (info.get('container') or '').endswith('_dash')
+            or info.get('ext') in ('flv', 'mka', 'mkv', 'ts', 'webm'))
+
+    def _stream_postprocess(self, filename, info_dict, infos):
+        """
+        Download the formats infos of info_dict into ffmpeg, which merges
+        them and applies the fixups that do not need to look at the files
+        into filename in the same pass (see the stream_postprocess param).
+
+        Returns None if that is not possible, the formats have to be
+        downloaded and then postprocessed, and whether it succeeded
+        otherwise.
+        """
+        if not self.params.get('stream_postprocess') or self.params.get('keepvideo'):
+            return None
+        if self.params.get('fixup') not in (None, 'detect_or_warn'):
+            return None
+        if os.path.exists(encodeFilename(filename)):
+            return None
+        if not all(self._can_stream(info) for info in infos):
+            return None
+
+        opts = ['-c', 'copy']
+        if len(infos) > 1:
+            opts += ['-map', '0:v:0', '-map', '1:a:0']
+        elif (info_dict.get('protocol') == 'm3u8_native'
+                or info_dict.get('protocol') == 'm3u8'
+                and self.params.get('hls_prefer_native')):
+            acodec = info_dict.get('acodec')
+            if not acodec:
+                # FFmpegFixupM3u8PP probes the file for it
+                return None
+            opts += ['-f', 'mp4']
+            if acodec == 'aac' or acodec.startswith('mp4a'):
+                opts += ['-bsf:a', 'aac_adtstoasc']
+        elif info_dict.get('container') == 'm4a_dash':
+            opts += ['-f', 'mp4']
+        stretched_ratio = info_dict.get('stretched_ratio')
+        if stretched_ratio is not None and stretched_ratio != 1:
+            opts += ['-aspect', '%f' % stretched_ratio]
+        if len(opts) == 2:
+            # Nothing to merge or fix up
+            return None
+
+        temp_filename = prepend_extension(filename, 'temp')
+        streamer = FFmpegStreamer(self, temp_filename, opts, len(infos))
+        if not streamer.supported:
+            return None
+        self.to_screen('[ffmpeg] Streaming %s into "%s"' % (
+            'formats to merge' if len(infos) > 1 else 'download', filename))
+        streamer.start()
+        success = False
+        try:
+            if len(infos) > 1:
+                success = self._download_concurrently(
+                    [('-', info) for info in infos],
+                    [functools.partial(streamer.open_input, index) for index in range(len(infos))])
+            else:
+                fd = self._make_downloader(infos[0])
+                fd.stream_to(functools.partial(streamer.open_input, 0))
+                success = fd.download('-', infos[0])
+        finally:
+            try:
+                streamer.finish(success)
+            except PostProcessingError as err:
+                self.report_error('postprocessing: %s' % error_to_compat_str(err))
+                success = False
+        if success:
+            os.rename(encodeFilename(temp_filename), encodeFilename(filename))
+        return success
 
     def process_info(self, info_dict):
         """Process a single resolved IE result."""
@@ -1794,9 +2131,12 @@ class YoutubeDL(object):
             self.to_screen('[download] ' + reason)
             return
 
-        self._num_downloads += 1
-
-        info_dict['_filename'] = filename = self.prepare_filename(info_dict)
+        with self._lock:
+            # Check again, other jobs may have downloaded in the meantime
+            if max_downloads is not None and self._num_downloads >= int(max_downloads):
+                raise MaxDownloadsReached()
+            self._num_downloads += 1
+            info_dict['_filename'] = filename = self.prepare_filename(info_dict)
 
         # Forced printings
         self.__forced_printings(info_dict, filename, incomplete=False)
@@ -1905,14 +2245,10 @@ class YoutubeDL(object):
         self._write_thumbnails(info_dict, filename)
 
         if not self.params.get('skip_download', False):
+            streamed = None
             try:
                 def dl(name, info):
-                    fd = get_suitable_downloader(info, self.params)(self, self.params)
-                    for ph in self._progress_hooks:
-                        fd.add_progress_hook(ph)
-                    if self.params.get('verbose'):
-                        self.to_screen('[debug] Invoking downloader on %r' % info.get('url'))
-                    return fd.download(name, info)
+                    return self._make_downloader(info).download(name, info)
 
                 if info_dict.get('requested_formats') is not None:
                     downloaded = []
@@ -1958,6 +2294,7 @@ class YoutubeDL(object):
                             '[download] %s has already been downloaded and '
                             'merged' % filename)
                     else:
+                        downloads = []
                         for f in requested_formats:
                             new_info = dict(info_dict)
                             new_info.update(f)
@@ -1967,13 +2304,20 @@ class YoutubeDL(object):
                             if not ensure_dir_exists(fname):
                                 return
                             downloaded.append(fname)
-                            partial_success = dl(fname, new_info)
-                            success = success and partial_success
-                        info_dict['__postprocessors'] = postprocessors
-                        info_dict['__files_to_merge'] = downloaded
+                            downloads.append((fname, new_info))
+                        success = streamed = self._stream_postprocess(
+                            filename, info_dict, [info for _, info in downloads])
+                        if streamed is None:
+                            success = self._download_concurrently(downloads)
+                            info_dict['__postprocessors'] = postprocessors
+                            info_dict['__files_to_merge'] = downloaded
                 else:
                     # Just a single file
-                    success = dl(filename, info_dict)
+                    success = streamed = (
+                        self._stream_postprocess(filename, info_dict, [info_dict])
+                        if filename != '-' else None)
+                    if streamed is None:
+                        success = dl(filename, info_dict)
             except (compat_urllib_error.URLError, compat_http_client.HTTPException, socket.error) as err:
                 self.report_error('unable to download video data: %s' % error_to_compat_str(err))
                 return
@@ -1988,6 +2332,9 @@ class YoutubeDL(object):
                 fixup_policy = self.params.get('fixup')
                 if fixup_policy is None:
                     fixup_policy = 'detect_or_warn'
+                if streamed:
+                    # The fixups have been applied while downloading
+                    fixup_policy = 'ignore'
 
                 INSTALL_FFMPEG_MESSAGE = 'Install ffmpeg or avconv to fix this automatically.'
 
@@ -2046,6 +2393,9 @@ class YoutubeDL(object):
                     else:
                         assert fixup_policy in ('ignore', 'never')
 
+                if self.params.get('postprocessor_workers'):
+                    self._post_process_in_background(filename, info_dict)
+                    return
                 try:
                     self.post_process(filename, info_dict)
                 except (PostProcessingError) as err:
@@ -2053,6 +2403,73 @@ class YoutubeDL(object):
                     return
                 self.record_download_archive(info_dict)
 
+    def _post_process_in_background(self, filename, info_dict):
+        """Run the postprocessors on filename in the background (see the
+        postprocessor_workers param) and record info_dict in the download
+        archive once done"""
+        with self._lock:
+            if self._pp_pool is None:
+                self._pp_pool = WorkerPool(self.params['postprocessor_workers'])
+        info = dict(info_dict)
+        info['filepath'] = filename
+        pps_chain = self._postprocessors_chain(info_dict)
+        ordered = next((
+            i for i, pp in enumerate(pps_chain)
+            if isinstance(pp, ExecAfterDownloadPP)), len(pps_chain))
+
+        def finish(info):
+            self._run_postprocessors(pps_chain[ordered:], info)
+            self.record_download_archive(info_dict)
+
+        self._pp_pool.submit(
+            self._run_postprocessors, (pps_chain[:ordered], info), finish)
+
+    def _wait_for_postprocessors(self):
+        """Wait for the files being post-processed in the background"""
+        if self._pp_pool is not None:
+            self._pp_pool.join()
+
+    def _run_jobs(self, jobs):
+        """Run jobs, a list of (url, func, args) tuples, concurrently if
+        requested and return a list of their results"""
+        max_jobs = self.params.get('jobs') or 1
+        if max_jobs <= 1 or len(jobs) <= 1:
+            return [func(*args) for _, func, args in jobs]
+        with self._lock:
+            if self._scheduler is None:
+                self._scheduler = JobScheduler(max_jobs, self.params.get('jobs_per_host'))
+        # Jobs inherit the playlists being processed to detect recursion
+        playlist_level = self._playlist_level
+        playlist_urls = set(self._playlist_urls)
+
+        def run_job(func, *args):
+            self._playlist_level = playlist_level
+            self._playlist_urls = set(playlist_urls)
+            return func(*args)
+
+        return self._scheduler.run([
+            (job_host(url), run_job, (func, ) + tuple(args))
+            for url, func, args in jobs])
+
+    @property
+    def _playlist_level(self):
+        return getattr(self._thread_state, 'playlist_level', 0)
+
+    @_playlist_level.setter
+    def _playlist_level(self, value):
+        self._thread_state.playlist_level = value
+
+    @property
+    def _playlist_urls(self):
+        state = self._thread_state
+        if not hasattr(state, 'playlist_urls'):
+            state.playlist_urls = set()
+        return state.playlist_urls
+
+    @_playlist_urls.setter
+    def _playlist_urls(self, value):
+        self._thread_state.playlist_urls = value
+
     def download(self, url_list):
         """Download a given list of URLs."""
         outtmpl = self.params.get('outtmpl', DEFAULT_OUTTMPL)
@@ -2062,19 +2479,27 @@ class YoutubeDL(object):
                 and self.params.get('max_downloads') != 1):
             raise SameFileError(outtmpl)
 
-        for url in url_list:
+        def download_url(url):
             try:
                 # It also downloads the videos
                 res = self.extract_info(
                     url, force_generic_extractor=self.params.get('force_generic_extractor', False))
             except UnavailableVideoError:
                 self.report_error('unable to download video')
-            except MaxDownloadsReached:
-                self.to_screen('[info] Maximum number of downloaded files reached.')
-                raise
             else:
                 if self.params.get('dump_single_json', False):
-                    self.to_stdout(json.dumps(res))
+                    self.to_stdout(json.dumps(self._strip_in_process_fields(res)))
+
+        try:
+            try:
+                self._run_jobs([(url, download_url, (url, )) for url in url_list])
+            finally:
+                self._wait_for_postprocessors()
+        except MaxDownloadsReached:
+            self.to_screen('[info] Maximum number of downloaded files reached.')
+            raise
+        finally:
+            self.close_download_archive()
 
         return self._download_retcode
 
@@ -2085,7 +2510,10 @@ class YoutubeDL(object):
             # FileInput doesn't have a read method, we can't call json.load
             info = self.filter_requested_info(json.loads('\n'.join(f)))
         try:
-            self.process_ie_result(info, download=True)
+            try:
+                self.process_ie_result(info, download=True)
+            finally:
+                self._wait_for_postprocessors()
         except DownloadError:
             webpage_url = info.get('webpage_url')
             if webpage_url is not None:
@@ -2093,28 +2521,63 @@ class YoutubeDL(object):
                 return self.download([webpage_url])
             else:
                 raise
+        finally:
+            self.close_download_archive()
         return self._download_retcode
 
     @staticmethod
     def filter_requested_info(info_dict):
-        return dict(
+        return YoutubeDL._strip_in_process_fields(dict(
             (k, v) for k, v in info_dict.items()
-            if k not in ['requested_formats', 'requested_subtitles'])
+            if k not in ['requested_formats', 'requested_subtitles']))
+
+    # Fields of formats only meant for this process: the parsed playlists
+    # are large and go stale, the downloader fetches them again when missing
+    _IN_PROCESS_FIELDS = ('hls_playlist', )
+
+    @staticmethod
+    def _strip_in_process_fields(obj):
+        """Copy of the info dict obj without _IN_PROCESS_FIELDS, for
+        serializing it"""
+        if isinstance(obj, dict):
+            return dict(
+                (k, YoutubeDL._strip_in_process_fields(v)) for k, v in obj.items()
+                if k not in YoutubeDL._IN_PROCESS_FIELDS)
+        if isinstance(obj, list):
+            return [YoutubeDL._strip_in_process_fields(v) for v in obj]
+        return obj
 
     def post_process(self, filename, ie_info):
-        """Run all the postprocessors on the given file."""
+        """Run all the postprocessors on the given file.
+
+        Consecutive ffmpeg postprocessors that only copy streams are run by
+        a single ffmpeg invocation (see plan_ffmpeg_steps())."""
         info = dict(ie_info)
         info['filepath'] = filename
+        self._run_postprocessors(self._postprocessors_chain(ie_info), info)
+
+    def _postprocessors_chain(self, ie_info):
         pps_chain = []
         if ie_info.get('__postprocessors') is not None:
             pps_chain.extend(ie_info['__postprocessors'])
         pps_chain.extend(self._pps)
-        for pp in pps_chain:
+        return pps_chain
+
+    def _run_postprocessors(self, pps_chain, info):
+        pos = 0
+        while pos < len(pps_chain):
+            pp = pps_chain[pos]
             files_to_delete = []
+            steps = []
             try:
-                files_to_delete, info = pp.run(info)
+                steps = plan_ffmpeg_steps(pps_chain[pos:], info)
+                if steps:
+                    files_to_delete, info = pp.run_steps(info, steps)
+                else:
+                    files_to_delete, info = pp.run(info)
             except PostProcessingError as e:
                 self.report_error(e.msg)
+            pos += len(steps) or 1
             if files_to_delete and not self.params.get('keepvideo', False):
                 for old_filename in files_to_delete:
                     self.to_screen('Deleting original file %s (pass -k to keep)' % old_filename)
@@ -2122,6 +2585,7 @@ class YoutubeDL(object):
                         os.remove(encodeFilename(old_filename))
                     except (IOError, OSError):
                         self.report_warning('Unable to remove downloaded original file')
+        return info
 
     def _make_archive_id(self, info_dict):
         video_id = info_dict.get('id')
@@ -2135,7 +2599,7 @@ class YoutubeDL(object):
             if not url:
                 return
             # Try to find matching extractor for the URL and take its ie_key
-            for ie in self._ies:
+            for ie in self._suitable_ie_candidates(url):
                 if ie.suitable(url):
                     extractor = ie.ie_key()
                     break
@@ -2143,33 +2607,48 @@ class YoutubeDL(object):
                 return
         return extractor.lower() + ' ' + video_id
 
-    def in_download_archive(self, info_dict):
+    def _get_download_archive(self):
         fn = self.params.get('download_archive')
         if fn is None:
+            return None
+        with self._lock:
+            if self._archive is None or self._archive.filename != fn:
+                self.close_download_archive()
+                archive_format = self.params.get('download_archive_format') or 'text'
+                try:
+                    self._archive = ARCHIVE_FORMATS[archive_format](fn)
+                except DownloadArchiveError as err:
+                    # Never download without the archive, even when ignoring
+                    # errors
+                    self.report_error(error_to_compat_str(err))
+                    raise DownloadError(error_to_compat_str(err))
+            return self._archive
+
+    def in_download_archive(self, info_dict):
+        archive = self._get_download_archive()
+        if archive is None:
             return False
 
         vid_id = self._make_archive_id(info_dict)
         if not vid_id:
             return False  # Incomplete video information
 
-        try:
-            with locked_file(fn, 'r', encoding='utf-8') as archive_file:
-                for line in archive_file:
-                    if line.strip() == vid_id:
-                        return True
-        except IOError as ioe:
-            if ioe.errno != errno.ENOENT:
-                raise
-        return False
+        return vid_id in archive
 
     def record_download_archive(self, info_dict):
-        fn = self.params.get('download_archive')
-        if fn is None:
+        archive = self._get_download_archive()
+        if archive is None:
             return
         vid_id = self._make_archive_id(info_dict)
         assert vid_id
-        with locked_file(fn, 'a', encoding='utf-8') as archive_file:
-            archive_file.write(vid_id + '\n')
+        archive.add(vid_id)
+
+    def close_download_archive(self):
+        """Write out pending download archive records"""
+        with self._lock:
+            if self._archive is not None:
+                self._archive.close()
+                self._archive = None
 
     @staticmethod
     def format_resolution(format, default='unknown'):
@@ -2392,8 +2871,16 @@ class YoutubeDL(object):
         proxy_handler = PerRequestProxyHandler(proxies)
 
         debuglevel = 1 if self.params.get('debug_printtraffic') else 0
-        https_handler = make_HTTPS_handler(self.params, debuglevel=debuglevel)
-        ydlh = YoutubeDLHandler(self.params, debuglevel=debuglevel)
+        if self.params.get('http_keep_alive', True):
+            self._connection_pool = HTTPConnectionPool(
+                max_per_host=self.params.get('max_connections_per_host') or 8,
+                idle_timeout=self.params.get('keep_alive_timeout') or 15)
+        else:
+            self._connection_pool = None
+        https_handler = make_HTTPS_handler(
+            self.params, debuglevel=debuglevel, connection_pool=self._connection_pool)
+        ydlh = YoutubeDLHandler(
+            self.params, debuglevel=debuglevel, connection_pool=self._connection_pool)
         redirect_handler = YoutubeDLRedirectHandler()
         data_handler = compat_urllib_request_DataHandler()
 
@@ -150,6 +150,11 @@ def _real_main(argv=None):
         if numeric_limit is None:
             parser.error('invalid rate limit specified')
         opts.ratelimit = numeric_limit
+    if opts.ratelimit_per_host is not None:
+        numeric_limit = FileDownloader.parse_bytes(opts.ratelimit_per_host)
+        if numeric_limit is None:
+            parser.error('invalid rate limit per host specified')
+        opts.ratelimit_per_host = numeric_limit
     if opts.min_filesize is not None:
         numeric_limit = FileDownloader.parse_bytes(opts.min_filesize)
         if numeric_limit is None:
@@ -160,6 +165,11 @@ def _real_main(argv=None):
         if numeric_limit is None:
             parser.error('invalid max_filesize specified')
         opts.max_filesize = numeric_limit
+    if opts.cache_max_size is not None:
+        numeric_limit = FileDownloader.parse_bytes(opts.cache_max_size)
+        if numeric_limit is None:
+            parser.error('invalid cache max size specified')
+        opts.cache_max_size = numeric_limit
     if opts.sleep_interval is not None:
         if opts.sleep_interval < 0:
             parser.error('sleep interval must be positive or 0')
@@ -188,6 +198,20 @@ def _real_main(argv=None):
         opts.retries = parse_retries(opts.retries)
     if opts.fragment_retries is not None:
         opts.fragment_retries = parse_retries(opts.fragment_retries)
+    if opts.concurrent_fragments is not None and opts.concurrent_fragments <= 0:
+        parser.error('concurrent fragments must be positive')
+    if opts.max_connections_per_host is not None and opts.max_connections_per_host <= 0:
+        parser.error('maximum number of connections per host must be positive')
+    if opts.http_chunks is not None and opts.http_chunks <= 0:
+        parser.error('number of HTTP chunks must be positive')
+    if opts.jobs is not None and opts.jobs <= 0:
+        parser.error('number of jobs must be positive')
+    if opts.jobs_per_host is not None and opts.jobs_per_host <= 0:
+        parser.error('number of jobs per host must be positive')
+    if opts.postprocessor_workers is not None and opts.postprocessor_workers <= 0:
+        parser.error('number of postprocessor workers must be positive')
+    if opts.progress_rate < 0:
+        parser.error('progress rate must be positive or 0')
     if opts.buffersize is not None:
         numeric_buffersize = FileDownloader.parse_bytes(opts.buffersize)
         if numeric_buffersize is None:
@@ -347,21 +371,29 @@ def _real_main(argv=None):
         'ignoreerrors': opts.ignoreerrors,
         'force_generic_extractor': opts.force_generic_extractor,
         'ratelimit': opts.ratelimit,
+        'ratelimit_per_host': opts.ratelimit_per_host,
         'nooverwrites': opts.nooverwrites,
         'retries': opts.retries,
         'fragment_retries': opts.fragment_retries,
         'skip_unavailable_fragments': opts.skip_unavailable_fragments,
         'keep_fragments': opts.keep_fragments,
+        'concurrent_fragments': opts.concurrent_fragments,
+        'jobs': opts.jobs,
+        'jobs_per_host': opts.jobs_per_host,
         'buffersize': opts.buffersize,
         'noresizebuffer': opts.noresizebuffer,
         'http_chunk_size': opts.http_chunk_size,
+        'http_chunks': opts.http_chunks,
         'continuedl': opts.continue_dl,
         'noprogress': opts.noprogress,
         'progress_with_newline': opts.progress_with_newline,
+        'progress_rate': opts.progress_rate,
+        'progress_fd': opts.progress_fd,
         'playliststart': opts.playliststart,
         'playlistend': opts.playlistend,
         'playlistreverse': opts.playlist_reverse,
         'playlistrandom': opts.playlist_random,
+        'lazy_playlist': opts.lazy_playlist,
         'noplaylist': opts.noplaylist,
         'logtostderr': opts.outtmpl == '-',
         'consoletitle': opts.consoletitle,
@@ -393,14 +425,20 @@ def _real_main(argv=None):
         'max_views': opts.max_views,
         'daterange': date,
         'cachedir': opts.cachedir,
+        'info_cache_ttl': opts.info_cache_ttl,
+        'cache_max_size': opts.cache_max_size,
         'youtube_print_sig_code': opts.youtube_print_sig_code,
         'age_limit': opts.age_limit,
         'download_archive': download_archive_fn,
+        'download_archive_format': opts.download_archive_format,
         'cookiefile': opts.cookiefile,
         'nocheckcertificate': opts.no_check_certificate,
         'prefer_insecure': opts.prefer_insecure,
         'proxy': opts.proxy,
         'socket_timeout': opts.socket_timeout,
+        'http_keep_alive': opts.http_keep_alive,
+        'keep_alive_timeout': opts.keep_alive_timeout,
+        'max_connections_per_host': opts.max_connections_per_host,
         'bidi_workaround': opts.bidi_workaround,
         'debug_printtraffic': opts.debug_printtraffic,
         'prefer_ffmpeg': opts.prefer_ffmpeg,
@@ -413,6 +451,8 @@ def _real_main(argv=None):
         'merge_output_format': opts.merge_output_format,
         'postprocessors': postprocessors,
         'fixup': opts.fixup,
+        'stream_postprocess': opts.stream_postprocess,
+        'postprocessor_workers': opts.postprocessor_workers,
         'source_address': opts.source_address,
         'call_home': opts.call_home,
         'sleep_interval': opts.sleep_interval,
@@ -1,10 +1,31 @@
 from __future__ import unicode_literals
 
+import struct
 from math import ceil
 
 from .compat import compat_b64decode
 from .utils import bytes_to_intlist, intlist_to_bytes
 
+try:
+    from Cryptodome.Cipher import AES as _pycryptodome_aes
+except ImportError:
+    try:
+        # pycryptodome may also be installed as a drop-in replacement of
+        # pycrypto
+        from Crypto.Cipher import AES as _pycryptodome_aes
+    except ImportError:
+        _pycryptodome_aes = None
+
+try:
+    from cryptography.hazmat.backends import default_backend as _cryptography_backend
+    from cryptography.hazmat.primitives.ciphers import (
+        Cipher as _cryptography_cipher,
+        algorithms as _cryptography_algorithms,
+        modes as _cryptography_modes,
+    )
+except ImportError:
+    _cryptography_backend = None
+
 BLOCK_SIZE_BYTES = 16
 
 
@@ -18,20 +39,14 @@ def aes_ctr_decrypt(data, key, counter):
                                returns the next counter block
     @returns {int[]}           decrypted data
     """
-    expanded_key = key_expansion(key)
     block_count = int(ceil(float(len(data)) / BLOCK_SIZE_BYTES))
+    counter_blocks = []
+    for _ in range(block_count):
+        counter_blocks += counter.next_value()
+    key_stream = AES_BACKEND.ecb_encrypt(
+        intlist_to_bytes(key), intlist_to_bytes(counter_blocks))
 
-    decrypted_data = []
-    for i in range(block_count):
-        counter_block = counter.next_value()
-        block = data[i * BLOCK_SIZE_BYTES: (i + 1) * BLOCK_SIZE_BYTES]
-        block += [0] * (BLOCK_SIZE_BYTES - len(block))
-
-        cipher_counter_block = aes_encrypt(counter_block, expanded_key)
-        decrypted_data += xor(block, cipher_counter_block)
-    decrypted_data = decrypted_data[:len(data)]
-
-    return decrypted_data
+    return xor(data, bytes_to_intlist(key_stream))
 
 
 def aes_cbc_decrypt(data, key, iv):
@@ -43,21 +58,20 @@ def aes_cbc_decrypt(data, key, iv):
     @param {int[]} iv          16-Byte IV
     @returns {int[]}           decrypted data
     """
-    expanded_key = key_expansion(key)
-    block_count = int(ceil(float(len(data)) / BLOCK_SIZE_BYTES))
+    return bytes_to_intlist(aes_cbc_decrypt_bytes(
+        intlist_to_bytes(data), intlist_to_bytes(key), intlist_to_bytes(iv)))
 
-    decrypted_data = []
-    previous_cipher_block = iv
-    for i in range(block_count):
-        block = data[i * BLOCK_SIZE_BYTES: (i + 1) * BLOCK_SIZE_BYTES]
-        block += [0] * (BLOCK_SIZE_BYTES - len(block))
 
-        decrypted_block = aes_decrypt(block, expanded_key)
-        decrypted_data += xor(decrypted_block, previous_cipher_block)
-        previous_cipher_block = block
-    decrypted_data = decrypted_data[:len(data)]
+def aes_cbc_decrypt_bytes(data, key, iv):
+    """
+    Decrypt with aes in CBC mode using the fastest available backend
 
-    return decrypted_data
+    @param {bytes} data        cipher
+    @param {bytes} key         16/24/32-Byte cipher key
+    @param {bytes} iv          16-Byte IV
+    @returns {bytes}           decrypted data
+    """
+    return AES_BACKEND.cbc_decrypt(key, iv, data)
 
 
 def aes_cbc_encrypt(data, key, iv):
@@ -358,4 +372,166 @@ def inc(data):
     return data
 
 
-__all__ = ['aes_encrypt', 'key_expansion', 'aes_ctr_decrypt', 'aes_cbc_decrypt', 'aes_decrypt_text']
+def _pad_blocks(data):
+    # Incomplete blocks are zero-padded like by the int list functions
+    return data + b'\0' * (-len(data) % BLOCK_SIZE_BYTES)
+
+
+def _build_tables():
+    def word(b0, b1, b2, b3):
+        return (b0 << 24) | (b1 << 16) | (b2 << 8) | b3
+
+    def rotations(table):
+        tables = [table]
+        for _ in range(3):
+            tables.append(tuple(((w >> 8) | (w << 24)) & 0xFFFFFFFF for w in tables[-1]))
+        return tables
+
+    te = []
+    td = []
+    for x in range(256):
+        s = SBOX[x]
+        te.append(word(rijndael_mul(s, 2), s, s, rijndael_mul(s, 3)))
+        s = SBOX_INV[x]
+        td.append(word(
+            rijndael_mul(s, 0xE), rijndael_mul(s, 0x9),
+            rijndael_mul(s, 0xD), rijndael_mul(s, 0xB)))
+    return rotations(tuple(te)), rotations(tuple(td))
+
+
+# Lookup tables combining SubBytes, ShiftRows and MixColumns (T-boxes)
+(_TE0, _TE1, _TE2, _TE3), (_TD0, _TD1, _TD2, _TD3) = _build_tables()
+
+
+class _PythonAESBackend(object):
+    """
+    Pure Python AES working on 32-bit words with T-box lookup tables
+
+    Several times faster than the int list functions above, which are
+    kept as the reference implementation.
+    """
+
+    name = 'python'
+
+    def __init__(self):
+        self._round_keys = {}
+
+    def _get_round_keys(self, key):
+        round_keys = self._round_keys.get(key)
+        if round_keys is None:
+            expanded_key = intlist_to_bytes(key_expansion(bytes_to_intlist(key)))
+            enc = struct.unpack('>%dI' % (len(expanded_key) // 4), expanded_key)
+            rounds = len(enc) // 4 - 1
+            # Round keys of the equivalent inverse cipher
+            dec = list(enc[4 * rounds:])
+            for i in range(rounds - 1, 0, -1):
+                for w in enc[4 * i:4 * i + 4]:
+                    dec.append(
+                        _TD0[SBOX[w >> 24]] ^ _TD1[SBOX[(w >> 16) & 255]]
+                        ^ _TD2[SBOX[(w >> 8) & 255]] ^ _TD3[SBOX[w & 255]])
+            dec.extend(enc[:4])
+            if len(self._round_keys) >= 16:
+                self._round_keys.clear()
+            round_keys = self._round_keys[key] = (rounds, enc, tuple(dec))
+        return round_keys
+
+    def ecb_encrypt(self, key, data):
+        rounds, rk, _ = self._get_round_keys(key)
+        data = _pad_blocks(data)
+        words = struct.unpack('>%dI' % (len(data) // 4), data)
+        te0, te1, te2, te3, sbox = _TE0, _TE1, _TE2, _TE3, SBOX
+        out = []
+        for i in range(0, len(words), 4):
+            s0 = words[i] ^ rk[0]
+            s1 = words[i + 1] ^ rk[1]
+            s2 = words[i + 2] ^ rk[2]
+            s3 = words[i + 3] ^ rk[3]
+            for r in range(4, 4 * rounds, 4):
+                s0, s1, s2, s3 = (
+                    te0[s0 >> 24] ^ te1[(s1 >> 16) & 255] ^ te2[(s2 >> 8) & 255] ^ te3[s3 & 255] ^ rk[r],
+                    te0[s1 >> 24] ^ te1[(s2 >> 16) & 255] ^ te2[(s3 >> 8) & 255] ^ te3[s0 & 255] ^ rk[r + 1],
+                    te0[s2 >> 24] ^ te1[(s3 >> 16) & 255] ^ te2[(s0 >> 8) & 255] ^ te3[s1 & 255] ^ rk[r + 2],
+                    te0[s3 >> 24] ^ te1[(s0 >> 16) & 255] ^ te2[(s1 >> 8) & 255] ^ te3[s2 & 255] ^ rk[r + 3])
+            r = 4 * rounds
+            out.extend((
+                ((sbox[s0 >> 24] << 24) | (sbox[(s1 >> 16) & 255] << 16)
+                 | (sbox[(s2 >> 8) & 255] << 8) | sbox[s3 & 255]) ^ rk[r],
+                ((sbox[s1 >> 24] << 24) | (sbox[(s2 >> 16) & 255] << 16)
+                 | (sbox[(s3 >> 8) & 255] << 8) | sbox[s0 & 255]) ^ rk[r + 1],
+                ((sbox[s2 >> 24] << 24) | (sbox[(s3 >> 16) & 255] << 16)
+                 | (sbox[(s0 >> 8) & 255] << 8) | sbox[s1 & 255]) ^ rk[r + 2],
+                ((sbox[s3 >> 24] << 24) | (sbox[(s0 >> 16) & 255] << 16)
+                 | (sbox[(s1 >> 8) & 255] << 8) | sbox[s2 & 255]) ^ rk[r + 3]))
+        return struct.pack('>%dI' % len(out), *out)
+
+    def cbc_decrypt(self, key, iv, data):
+        rounds, _, rk = self._get_round_keys(key)
+        size = len(data)
+        data = _pad_blocks(data)
+        words = struct.unpack('>%dI' % (len(data) // 4), data)
+        td0, td1, td2, td3, sbox_inv = _TD0, _TD1, _TD2, _TD3, SBOX_INV
+        p0, p1, p2, p3 = struct.unpack('>4I', iv)
+        out = []
+        for i in range(0, len(words), 4):
+            c0, c1, c2, c3 = words[i:i + 4]
+            s0 = c0 ^ rk[0]
+            s1 = c1 ^ rk[1]
+            s2 = c2 ^ rk[2]
+            s3 = c3 ^ rk[3]
+            for r in range(4, 4 * rounds, 4):
+                s0, s1, s2, s3 = (
+                    td0[s0 >> 24] ^ td1[(s3 >> 16) & 255] ^ td2[(s2 >> 8) & 255] ^ td3[s1 & 255] ^ rk[r],
+                    td0[s1 >> 24] ^ td1[(s0 >> 16) & 255] ^ td2[(s3 >> 8) & 255] ^ td3[s2 & 255] ^ rk[r + 1],
+                    td0[s2 >> 24] ^ td1[(s1 >> 16) & 255] ^ td2[(s0 >> 8) & 255] ^ td3[s3 & 255] ^ rk[r + 2],
+                    td0[s3 >> 24] ^ td1[(s2 >> 16) & 255] ^ td2[(s1 >> 8) & 255] ^ td3[s0 & 255] ^ rk[r + 3])
+            r = 4 * rounds
+            out.extend((
+                ((sbox_inv[s0 >> 24] << 24) | (sbox_inv[(s3 >> 16) & 255] << 16)
+                 | (sbox_inv[(s2 >> 8) & 255] << 8) | sbox_inv[s1 & 255]) ^ rk[r] ^ p0,
+                ((sbox_inv[s1 >> 24] << 24) | (sbox_inv[(s0 >> 16) & 255] << 16)
+                 | (sbox_inv[(s3 >> 8) & 255] << 8) | sbox_inv[s2 & 255]) ^ rk[r + 1] ^ p1,
+                ((sbox_inv[s2 >> 24] << 24) | (sbox_inv[(s1 >> 16) & 255] << 16)
+                 | (sbox_inv[(s0 >> 8) & 255] << 8) | sbox_inv[s3 & 255]) ^ rk[r + 2] ^ p2,
+                ((sbox_inv[s3 >> 24] << 24) | (sbox_inv[(s2 >> 16) & 255] << 16)
+                 | (sbox_inv[(s1 >> 8) & 255] << 8) | sbox_inv[s0 & 255]) ^ rk[r + 3] ^ p3))
+            p0, p1, p2, p3 = c0, c1, c2, c3
+        return struct.pack('>%dI' % len(out), *out)[:size]
+
+
+class _PycryptodomeAESBackend(object):
+    name = 'pycryptodome'
+
+    def ecb_encrypt(self, key, data):
+        return _pycryptodome_aes.new(key, _pycryptodome_aes.MODE_ECB).encrypt(_pad_blocks(data))
+
+    def cbc_decrypt(self, key, iv, data):
+        return _pycryptodome_aes.new(key, _pycryptodome_aes.MODE_CBC, iv).decrypt(
+            _pad_blocks(data))[:len(data)]
+
+
+class _CryptographyAESBackend(object):
+    name = 'cryptography'
+
+    def _crypt(self, key, mode, data, encrypt):
+        cipher = _cryptography_cipher(
+            _cryptography_algorithms.AES(key), mode, backend=_cryptography_backend())
+        context = cipher.encryptor() if encrypt else cipher.decryptor()
+        return context.update(_pad_blocks(data)) + context.finalize()
+
+    def ecb_encrypt(self, key, data):
+        return self._crypt(key, _cryptography_modes.ECB(), data, True)
+
+    def cbc_decrypt(self, key, iv, data):
+        return self._crypt(key, _cryptography_modes.CBC(iv), data, False)[:len(data)]
+
+
+# Available backends, fastest first
+AES_BACKENDS = [_PythonAESBackend()]
+if _cryptography_backend is not None:
+    AES_BACKENDS.insert(0, _CryptographyAESBackend())
+if _pycryptodome_aes is not None:
+    AES_BACKENDS.insert(0, _PycryptodomeAESBackend())
+AES_BACKEND = AES_BACKENDS[0]
+
+
+__all__ = ['aes_encrypt', 'key_expansion', 'aes_ctr_decrypt', 'aes_cbc_decrypt', 'aes_cbc_decrypt_bytes', 'aes_decrypt_text']
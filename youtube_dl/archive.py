@@ -0,0 +1,174 @@
+from __future__ import unicode_literals
+
+import errno
+import os
+import threading
+import time
+
+from .utils import (
+    YoutubeDLError,
+    encodeFilename,
+    locked_file,
+)
+
+try:
+    import sqlite3
+except ImportError:  # Python built without sqlite support
+    sqlite3 = None
+
+
+class DownloadArchiveError(YoutubeDLError):
+    """Raised when a download archive cannot be opened"""
+    pass
+
+
+class DownloadArchive(object):
+    """Download archive stored in a text file with one video id per line
+
+    The archive is read once into a set, membership tests are O(1). Lines
+    appended by other processes are picked up incrementally when a video id
+    is not found. New records are buffered and written out in batches, call
+    flush() or close() to write them to disk.
+    """
+
+    # Maximum number of buffered records and maximum time (in seconds) a
+    # record may stay buffered before the buffer is written out
+    _FLUSH_SIZE = 16
+    _FLUSH_INTERVAL = 10
+
+    def __init__(self, filename):
+        self.filename = filename
+        self._ids = set()
+        self._pending = []
+        self._pending_since = None
+        # Number of bytes of the file already loaded and the identity of the
+        # loaded file, used to detect appends and replacements
+        self._offset = 0
+        self._file_id = None
+        self._lock = threading.RLock()
+        self._load()
+
+    def _load(self):
+        try:
+            st = os.stat(encodeFilename(self.filename))
+        except OSError as ose:
+            if ose.errno != errno.ENOENT:
+                raise
+            return
+        file_id = (st.st_dev, st.st_ino)
+        if file_id != self._file_id or st.st_size < self._offset:
+            # The archive has been replaced or truncated, start over
+            self._ids = set(self._pending)
+            self._offset = 0
+            self._file_id = file_id
+        elif st.st_size == self._offset:
+            return
+        try:
+            with locked_file(self.filename, 'rb') as archive_file:
+                archive_file.seek(self._offset)
+                data = archive_file.read()
+        except IOError as ioe:
+            if ioe.errno != errno.ENOENT:
+                raise
+            return
+        # Do not consume an incomplete last line, it will be read again once
+        # it is complete
+        complete_len = data.rfind(b'\n') + 1
+        self._offset += complete_len
+        for line in data.decode('utf-8', 'replace').splitlines():
+            line = line.strip()
+            if line:
+                self._ids.add(line)
+
+    def __contains__(self, vid_id):
+        with self._lock:
+            if vid_id in self._ids:
+                return True
+            self._load()
+            return vid_id in self._ids
+
+    def add(self, vid_id):
+        with self._lock:
+            self._ids.add(vid_id)
+            self._pending.append(vid_id)
+            if self._pending_since is None:
+                self._pending_since = time.time()
+            if (len(self._pending) >= self._FLUSH_SIZE
+                    or time.time() - self._pending_since >= self._FLUSH_INTERVAL):
+                self.flush()
+
+    def flush(self):
+        with self._lock:
+            if not self._pending:
+                return
+            data = ''.join(vid_id + '\n' for vid_id in self._pending).encode('utf-8')
+            with locked_file(self.filename, 'ab') as archive_file:
+                archive_file.seek(0, os.SEEK_END)
+                end = archive_file.tell()
+                archive_file.write(data)
+                # Nobody else has appended since the last load, our own
+                # records need not be read back
+                if end == self._offset:
+                    self._offset = archive_file.tell()
+                    if self._file_id is None:
+                        st = os.fstat(archive_file.f.fileno())
+                        self._file_id = (st.st_dev, st.st_ino)
+            self._pending = []
+            self._pending_since = None
+
+    def close(self):
+        self.flush()
+
+
+class SQLiteDownloadArchive(object):
+    """Download archive stored in a SQLite database
+
+    SQLite takes care of locking, so several youtube-dl processes may share
+    the same archive. Lookups use the primary key index. Records are
+    inserted right away, so that the other processes see them at once.
+    """
+
+    def __init__(self, filename):
+        if sqlite3 is None:
+            raise DownloadArchiveError('SQLite download archive requires the sqlite3 module')
+        self.filename = filename
+        self._ids = set()
+        self._lock = threading.RLock()
+        try:
+            self._conn = sqlite3.connect(
+                filename, timeout=60, check_same_thread=False,
+                isolation_level=None)
+            self._conn.execute(
+                'CREATE TABLE IF NOT EXISTS archive (id TEXT PRIMARY KEY NOT NULL)')
+        except sqlite3.DatabaseError as err:
+            raise DownloadArchiveError(
+                'Unable to open %s as a SQLite download archive: %s' % (filename, err))
+
+    def __contains__(self, vid_id):
+        with self._lock:
+            if vid_id in self._ids:
+                return True
+            found = self._conn.execute(
+                'SELECT 1 FROM archive WHERE id = ?', (vid_id, )).fetchone() is not None
+            if found:
+                self._ids.add(vid_id)
+            return found
+
+    def add(self, vid_id):
+        with self._lock:
+            self._conn.execute(
+                'INSERT OR IGNORE INTO archive (id) VALUES (?)', (vid_id, ))
+            self._ids.add(vid_id)
+
+    def flush(self):
+        pass
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
+
+
+ARCHIVE_FORMATS = {
+    'text': DownloadArchive,
+    'sqlite': SQLiteDownloadArchive,
+}
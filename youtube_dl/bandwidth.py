@@ -0,0 +1,156 @@
+from __future__ import unicode_literals
+
+import threading
+import time
+
+from .scheduler import job_host
+
+
+# Tokens a bucket may accumulate while idle, in seconds of its rate
+_BURST = 1.0
+
+# Waits shorter than this are deferred: the bytes stay accounted for and
+# are slept off together with the following ones
+_MIN_SLEEP = 0.1
+
+
+class TokenBucket(object):
+    """Token bucket of rate bytes per second
+
+    Tokens are taken before they are available, the bucket then goes into
+    debt and reserve() returns how long the debt takes to be paid off.
+    """
+
+    def __init__(self, rate):
+        self.rate = float(rate)
+        self._tokens = self.rate * _BURST
+        self._last = None
+
+    def reserve(self, nbytes, now):
+        """Take nbytes tokens and return the seconds to wait for them"""
+        if self._last is not None:
+            self._tokens = min(
+                self._tokens + (now - self._last) * self.rate,
+                self.rate * _BURST)
+        self._last = now
+        self._tokens -= nbytes
+        return -self._tokens / self.rate if self._tokens < 0 else 0
+
+
+class BandwidthStream(object):
+    """Bytes downloaded by one connection, see BandwidthScheduler.open()"""
+
+    def __init__(self, scheduler, host):
+        self._scheduler = scheduler
+        self.host = host
+        # Fair share of the caps, set by the scheduler
+        self.bucket = None
+
+    def reserve(self, nbytes, now):
+        """Account for nbytes downloaded and return the seconds to sleep"""
+        wait = self._scheduler._reserve(self, nbytes, now)
+        # The debt of a deferred wait stays in the buckets
+        return wait if wait >= _MIN_SLEEP else 0
+
+    def consume(self, nbytes):
+        """Account for nbytes downloaded, sleeping if over the caps"""
+        wait = self.reserve(nbytes, time.time())
+        if wait:
+            time.sleep(wait)
+
+    def close(self):
+        self._scheduler._close(self)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.close()
+
+
+class BandwidthScheduler(object):
+    """Process-wide bandwidth caps shared by concurrent downloads
+
+    Every connection downloads through a stream returned by open(). The
+    bytes of all streams are taken from a global token bucket of rate bytes
+    per second and from one bucket of rate_per_host bytes per second for
+    each host. Each stream is also capped to its fair share, i.e. the caps
+    divided by the number of streams open against them, so that a
+    connection reading large blocks does not starve the others.
+
+    Use BandwidthScheduler.get() to share a scheduler across the whole
+    process.
+    """
+
+    _instances = {}
+    _instances_lock = threading.Lock()
+
+    def __init__(self, rate=None, rate_per_host=None):
+        self.rate = rate
+        self.rate_per_host = rate_per_host
+        self._lock = threading.Lock()
+        self._bucket = TokenBucket(rate) if rate else None
+        self._host_buckets = {}
+        self._streams = []
+
+    @classmethod
+    def get(cls, rate=None, rate_per_host=None):
+        """Return the scheduler of the process for these caps, None if
+        there are none"""
+        if not rate and not rate_per_host:
+            return None
+        key = (rate, rate_per_host)
+        with cls._instances_lock:
+            scheduler = cls._instances.get(key)
+            if scheduler is None:
+                scheduler = cls._instances[key] = cls(rate, rate_per_host)
+            return scheduler
+
+    def open(self, url):
+        """Return a new stream for downloading from url"""
+        stream = BandwidthStream(self, job_host(url))
+        with self._lock:
+            self._streams.append(stream)
+            if self.rate_per_host and stream.host not in self._host_buckets:
+                self._host_buckets[stream.host] = TokenBucket(self.rate_per_host)
+            self._share()
+        return stream
+
+    def _close(self, stream):
+        with self._lock:
+            if stream not in self._streams:
+                return
+            # Host buckets are kept so that the next stream of a host, e.g.
+            # for its next fragment, does not start with a fresh burst
+            self._streams.remove(stream)
+            self._share()
+
+    def _share(self):
+        # Called with self._lock held
+        host_counts = {}
+        for stream in self._streams:
+            host_counts[stream.host] = host_counts.get(stream.host, 0) + 1
+        for stream in self._streams:
+            shares = []
+            if self.rate:
+                shares.append(float(self.rate) / len(self._streams))
+            if self.rate_per_host:
+                shares.append(float(self.rate_per_host) / host_counts[stream.host])
+            if stream.bucket is None:
+                stream.bucket = TokenBucket(min(shares))
+            else:
+                stream.bucket.rate = min(shares)
+
+    def _reserve(self, stream, nbytes, now):
+        with self._lock:
+            buckets = [stream.bucket, self._bucket, self._host_buckets.get(stream.host)]
+            return max(
+                bucket.reserve(nbytes, now)
+                for bucket in buckets if bucket is not None)
+
+
+__all__ = [
+    'BandwidthScheduler',
+    'BandwidthStream',
+    'TokenBucket',
+]
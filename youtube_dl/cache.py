@@ -1,23 +1,66 @@
 from __future__ import unicode_literals
 
+import contextlib
 import errno
+import gzip
+import hashlib
 import io
 import json
 import os
 import re
 import shutil
+import struct
+import sys
+import tempfile
+import threading
+import time
 import traceback
 
-from .compat import compat_getenv
+from .compat import (
+    compat_getenv,
+    compat_parse_qs,
+    compat_str,
+    compat_urllib_parse_urlparse,
+)
 from .utils import (
     expand_path,
-    write_json_file,
+    int_or_none,
+    locked_file,
+    unified_timestamp,
 )
 
 
 class Cache(object):
+    """Filesystem cache
+
+    Entries are stored as plain JSON (dtype 'json'), as gzip-compressed
+    JSON (dtype 'json.gz') or as raw bytes (dtype 'bin'). Entries may be
+    given a time to live after which they are treated as missing.
+
+    Entries are replaced atomically so that they can be read without
+    locking. Once the cache directory grows larger than the cache_max_size
+    param, expired entries and then the least recently used files are
+    removed; only one process at a time runs such an eviction pass.
+
+    Hits, misses, stores and evictions are counted in stats.
+    """
+
+    _DTYPES = ('json', 'json.gz', 'bin')
+    _DEFAULT_MAX_SIZE = 256 * 1024 * 1024
+    # Header of bin entries, followed by the expiry time as a double
+    _BIN_MAGIC = b'ytdl-bin'
+    _BIN_HEADER = struct.Struct('>8sd')
+    # JSON entries with a time to live are wrapped as
+    # {"_cache_expires": <expiry time>, "data": <data>}
+    _JSON_EXPIRES_RE = re.compile(br'^{"_cache_expires": ([0-9.eE+-]+), "data": ')
+    _STATS = ('hits', 'misses', 'expired', 'stores', 'evictions')
+
     def __init__(self, ydl):
         self._ydl = ydl
+        # Approximate size of the cache directory, None until computed
+        self._size = None
+        self._stats = dict((name, 0) for name in self._STATS)
+        self._stats_lock = threading.Lock()
 
     def _get_root_dir(self):
         res = self._ydl.params.get('cachedir')
@@ -37,27 +80,110 @@ class Cache(object):
     def enabled(self):
         return self._ydl.params.get('cachedir') is not False
 
-    def store(self, section, key, data, dtype='json'):
-        assert dtype in ('json',)
+    @property
+    def max_size(self):
+        max_size = self._ydl.params.get('cache_max_size')
+        return self._DEFAULT_MAX_SIZE if max_size is None else max_size
+
+    @property
+    def stats(self):
+        """Counts of cache hits, misses (including expired entries),
+        expired entries, stores and evicted files"""
+        with self._stats_lock:
+            return dict(self._stats)
+
+    def format_stats(self):
+        stats = self.stats
+        return ', '.join('%d %s' % (stats[name], name) for name in self._STATS)
+
+    def _count(self, name, n=1):
+        with self._stats_lock:
+            self._stats[name] += n
+
+    @staticmethod
+    def _makedirs(fn):
+        try:
+            os.makedirs(os.path.dirname(fn))
+        except OSError as ose:
+            if ose.errno != errno.EEXIST:
+                raise
+
+    def _encode(self, data, dtype, expires):
+        if dtype == 'bin':
+            assert isinstance(data, bytes)
+            return self._BIN_HEADER.pack(self._BIN_MAGIC, expires or 0) + data
+        data = json.dumps(data)
+        if expires is not None:
+            data = '{"_cache_expires": %s, "data": %s}' % (json.dumps(expires), data)
+        data = data.encode('utf-8')
+        if dtype == 'json.gz':
+            buf = io.BytesIO()
+            with contextlib.closing(gzip.GzipFile(fileobj=buf, mode='wb')) as gz:
+                gz.write(data)
+            data = buf.getvalue()
+        return data
+
+    def _decode(self, raw, dtype):
+        """Return the data and the expiry time (None for no expiry) of an
+        entry"""
+        if dtype == 'bin':
+            magic, expires = self._BIN_HEADER.unpack(raw[:self._BIN_HEADER.size])
+            if magic != self._BIN_MAGIC:
+                raise ValueError('Invalid bin cache entry')
+            return raw[self._BIN_HEADER.size:], expires or None
+        if dtype == 'json.gz':
+            with contextlib.closing(gzip.GzipFile(fileobj=io.BytesIO(raw), mode='rb')) as gz:
+                raw = gz.read()
+        data = json.loads(raw.decode('utf-8'))
+        if self._JSON_EXPIRES_RE.match(raw):
+            return data['data'], data['_cache_expires']
+        return data, None
+
+    def store(self, section, key, data, dtype='json', ttl=None):
+        """Store data, which has to be bytes for dtype 'bin' and JSON
+        serializable otherwise, for ttl seconds (None for no limit)"""
+        assert dtype in self._DTYPES
 
         if not self.enabled:
             return
 
         fn = self._get_cache_fn(section, key, dtype)
         try:
-            try:
-                os.makedirs(os.path.dirname(fn))
-            except OSError as ose:
-                if ose.errno != errno.EEXIST:
-                    raise
-            write_json_file(data, fn)
+            self._makedirs(fn)
+            self._write_file(
+                self._encode(data, dtype, None if ttl is None else time.time() + ttl), fn)
+            self._count('stores')
+            self._account(fn)
         except Exception:
             tb = traceback.format_exc()
             self._ydl.report_warning(
                 'Writing cache to %r failed: %s' % (fn, tb))
 
+    @staticmethod
+    def _write_file(data, fn):
+        # Write to a temporary file first so that concurrent readers never
+        # see a partially written entry
+        tf = tempfile.NamedTemporaryFile(
+            prefix=os.path.basename(fn) + '.', suffix='.tmp',
+            dir=os.path.dirname(fn), delete=False)
+        try:
+            with tf:
+                tf.write(data)
+            if sys.platform == 'win32':
+                try:
+                    os.unlink(fn)
+                except OSError:
+                    pass
+            os.rename(tf.name, fn)
+        except Exception:
+            try:
+                os.remove(tf.name)
+            except OSError:
+                pass
+            raise
+
     def load(self, section, key, dtype='json', default=None):
-        assert dtype in ('json',)
+        assert dtype in self._DTYPES
 
         if not self.enabled:
             return default
@@ -65,9 +191,16 @@ class Cache(object):
         cache_fn = self._get_cache_fn(section, key, dtype)
         try:
             try:
-                with io.open(cache_fn, 'r', encoding='utf-8') as cachef:
-                    return json.load(cachef)
-            except ValueError:
+                with open(cache_fn, 'rb') as cachef:
+                    data, expires = self._decode(cachef.read(), dtype)
+                if expires is not None and expires <= time.time():
+                    self._count('expired')
+                    self._remove_file(cache_fn)
+                else:
+                    self._count('hits')
+                    self._touch(cache_fn)
+                    return data
+            except (ValueError, EOFError, KeyError, struct.error):
                 try:
                     file_size = os.path.getsize(cache_fn)
                 except (OSError, IOError) as oe:
@@ -77,8 +210,156 @@ class Cache(object):
         except IOError:
             pass  # No cache available
 
+        self._count('misses')
         return default
 
+    @staticmethod
+    def _touch(fn):
+        # The modification time is what eviction goes by
+        try:
+            os.utime(fn, None)
+        except OSError:
+            pass
+
+    @staticmethod
+    def _remove_file(fn):
+        try:
+            os.remove(fn)
+            return True
+        except OSError:
+            return False
+
+    @staticmethod
+    def _is_file(f, fn):
+        # Whether the open file f is still the one at fn
+        try:
+            st, fst = os.stat(fn), os.fstat(f.fileno())
+        except OSError:
+            return False
+        return (st.st_dev, st.st_ino) == (fst.st_dev, fst.st_ino)
+
+    @contextlib.contextmanager
+    def _locked_file(self, fn, remove=False):
+        # With remove, fn is removed before the lock is released. Whoever
+        # was waiting for the lock then holds it on the removed file, and
+        # tries again with the one now at fn
+        lock = None
+        try:
+            self._makedirs(fn)
+            while True:
+                lock = locked_file(fn, 'a')
+                lock.__enter__()
+                if not remove or self._is_file(lock.f, fn):
+                    break
+                lock.__exit__(None, None, None)
+                lock = None
+        except (IOError, OSError):
+            # Locking is not supported, go ahead unlocked
+            if lock is not None:
+                lock.f.close()
+            lock = None
+        try:
+            yield
+        finally:
+            if lock is not None:
+                if remove:
+                    self._remove_file(fn)
+                lock.__exit__(None, None, None)
+
+    @contextlib.contextmanager
+    def locked(self, section, key):
+        """Hold an exclusive lock on the entry while in the context
+
+        Other processes using the same cache directory block in locked()
+        for the same entry until the lock is released. Used to let one
+        process produce an entry while the others wait for it.
+        """
+        if not self.enabled:
+            yield
+            return
+        with self._locked_file(self._get_cache_fn(section, key, 'lock'), remove=True):
+            yield
+
+    def _walk(self):
+        for dirpath, _, filenames in os.walk(self._get_root_dir()):
+            for filename in filenames:
+                # Lock files may be held and temporary files written by
+                # other processes
+                if filename.endswith(('.lock', '.tmp')):
+                    continue
+                fn = os.path.join(dirpath, filename)
+                try:
+                    st = os.stat(fn)
+                except OSError:
+                    continue
+                yield fn, st
+
+    def _account(self, fn):
+        max_size = self.max_size
+        if not max_size:
+            return
+        if self._size is None:
+            self._size = sum(st.st_size for _, st in self._walk())
+        else:
+            try:
+                self._size += os.path.getsize(fn)
+            except OSError:
+                pass
+        if self._size > max_size:
+            self.evict(max_size, keep=(fn, ))
+
+    def _read_expiry(self, fn):
+        """Return the expiry time of the entry in fn, None if unknown"""
+        try:
+            if fn.endswith('.bin'):
+                with open(fn, 'rb') as f:
+                    magic, expires = self._BIN_HEADER.unpack(f.read(self._BIN_HEADER.size))
+                return (expires or None) if magic == self._BIN_MAGIC else None
+            if fn.endswith('.json.gz'):
+                with contextlib.closing(gzip.open(fn, 'rb')) as f:
+                    head = f.read(64)
+            elif fn.endswith('.json'):
+                with open(fn, 'rb') as f:
+                    head = f.read(64)
+            else:
+                return None
+        except (IOError, OSError, EOFError, struct.error):
+            return None
+        mobj = self._JSON_EXPIRES_RE.match(head)
+        return float(mobj.group(1)) if mobj else None
+
+    def evict(self, max_size=None, keep=()):
+        """Remove expired entries, then the least recently used files until
+        the cache directory is no larger than max_size bytes (the
+        cache_max_size param by default, 0 for no limit)"""
+        if not self.enabled:
+            return
+        if max_size is None:
+            max_size = self.max_size
+        # A single process at a time takes the eviction pass
+        with self._locked_file(os.path.join(self._get_root_dir(), 'evict.lock')):
+            now = time.time()
+            files = []
+            size = 0
+            evicted = 0
+            for fn, st in self._walk():
+                expires = self._read_expiry(fn)
+                if expires is not None and expires <= now and fn not in keep:
+                    if self._remove_file(fn):
+                        evicted += 1
+                        continue
+                files.append((fn, st))
+                size += st.st_size
+            files.sort(key=lambda f: f[1].st_mtime)
+            for fn, st in files:
+                if not max_size or size <= max_size:
+                    break
+                if fn not in keep and self._remove_file(fn):
+                    evicted += 1
+                    size -= st.st_size
+            self._size = size
+            self._count('evictions', evicted)
+
     def remove(self):
         if not self.enabled:
             self._ydl.to_screen('Cache is disabled (Did you combine --no-cache-dir and --rm-cache-dir?)')
@@ -94,3 +375,106 @@ class Cache(object):
             self._ydl.to_screen('.', skip_eol=True)
             shutil.rmtree(cachedir)
         self._ydl.to_screen('.')
+
+
+# Query parameters of media URLs holding the (absolute) expiry time
+_EXPIRY_PARAMS = ('expire', 'expires', 'expiry', 'expiration', 'exp', 'validto', 'valid_to')
+# Akamai style tokens such as hdnea=st=...~exp=...~acl=...
+_TOKEN_EXPIRY_RE = re.compile(r'(?:^|[~&])exp=(\d{9,11})(?:$|[~&])')
+
+
+def media_url_expiry(url):
+    """Return the time a signed media URL expires at, None if unknown"""
+    try:
+        query = compat_parse_qs(compat_urllib_parse_urlparse(url).query)
+    except ValueError:
+        return None
+    expiries = []
+    for key, values in query.items():
+        lkey = key.lower()
+        for value in values:
+            if lkey in _EXPIRY_PARAMS:
+                expiries.append(int_or_none(value))
+            mobj = _TOKEN_EXPIRY_RE.search(value)
+            if mobj:
+                expiries.append(int(mobj.group(1)))
+    amz_date = query.get('X-Amz-Date')
+    amz_expires = int_or_none((query.get('X-Amz-Expires') or [None])[0])
+    if amz_date and amz_expires is not None:
+        signed = unified_timestamp(re.sub(
+            r'^(\d{4})(\d\d)(\d\d)T(\d\d)(\d\d)(\d\d)Z$', r'\1-\2-\3T\4:\5:\6Z', amz_date[0]))
+        if signed is not None:
+            expiries.append(signed + amz_expires)
+    # Anything that is not a plausible unix timestamp is something else
+    expiries = [e for e in expiries if e is not None and 10 ** 9 <= e < 10 ** 11]
+    return min(expiries) if expiries else None
+
+
+class InfoDictCache(object):
+    """Cache of extraction results (video info dicts) on top of Cache
+
+    Entries are keyed by extractor key and video id and are valid for ttl
+    seconds after they have been stored, or until shortly before the
+    earliest expiry time found in the media URLs of the info dict.
+    """
+
+    _SECTION = 'info'
+    # Expire entries this many seconds before their media URLs do
+    _EXPIRY_MARGIN = 300
+
+    def __init__(self, cache, ttl):
+        self._cache = cache
+        self.ttl = ttl
+
+    @staticmethod
+    def _key(ie_key, video_id):
+        return '%s-%s' % (
+            re.sub(r'[^a-zA-Z0-9_.-]', '_', ie_key),
+            hashlib.sha1(video_id.encode('utf-8')).hexdigest())
+
+    def _expires(self, info_dict, now):
+        expires = now + self.ttl
+
+        def walk(obj):
+            if isinstance(obj, dict):
+                obj = obj.values()
+            elif not isinstance(obj, list):
+                if isinstance(obj, compat_str) and obj.startswith('http') and '?' in obj:
+                    url_expires = media_url_expiry(obj)
+                    if url_expires is not None:
+                        return [url_expires - self._EXPIRY_MARGIN]
+                return []
+            return [e for v in obj for e in walk(v)]
+
+        return min([expires] + walk(info_dict))
+
+    def load(self, ie_key, video_id, url):
+        """Return the cached info dict extracted from url, None if there is
+        no valid entry"""
+        entry = self._cache.load(self._SECTION, self._key(ie_key, video_id))
+        if (not isinstance(entry, dict) or entry.get('url') != url
+                or not isinstance(entry.get('info'), dict)
+                or (entry.get('expires') or 0) <= time.time()):
+            return None
+        return entry['info']
+
+    def store(self, ie_key, video_id, url, info_dict):
+        if info_dict.get('_type', 'video') != 'video':
+            return
+        now = time.time()
+        entry = {
+            'url': url,
+            'stored': now,
+            'expires': self._expires(info_dict, now),
+            'info': info_dict,
+        }
+        try:
+            json.dumps(info_dict)
+        except (TypeError, ValueError):
+            # Not serializable, only invalidate a previous entry
+            entry = {'url': url, 'expires': 0}
+        # Entries that have expired already are still stored to replace
+        # previous ones
+        self._cache.store(
+            self._SECTION, self._key(ie_key, video_id), entry,
+            ttl=max(entry['expires'] - now, 0))
@@ -3,15 +3,20 @@ from __future__ import division, unicode_literals
 import os
 import re
 import sys
+import threading
 import time
 import random
 
+from ..bandwidth import BandwidthScheduler
 from ..compat import compat_os_name
+from .progress import ProgressDispatcher
 from ..utils import (
     decodeArgument,
+    DownloadCancelled,
     encodeFilename,
     error_to_compat_str,
     format_bytes,
+    sanitize_open,
     shell_quote,
     timeconvert,
 )
@@ -31,7 +36,9 @@ class FileDownloader(object):
 
     verbose:            Print additional info to stdout.
     quiet:              Do not print messages to stdout.
-    ratelimit:          Download speed limit, in bytes/sec.
+    ratelimit:          Download speed limit, in bytes/sec, shared by all the
+                        downloads of the process.
+    ratelimit_per_host: Download speed limit for each host, in bytes/sec.
     retries:            Number of times to retry for HTTP error 5xx
     buffersize:         Size of download buffer in bytes.
     noresizebuffer:     Do not automatically resize the download buffer.
@@ -39,6 +46,9 @@ class FileDownloader(object):
     noprogress:         Do not print the progress bar.
     logtostderr:        Log messages to stderr instead of stdout.
     consoletitle:       Display progress in console window's titlebar.
+    progress_rate:      Maximum number of "downloading" progress updates per
+                        second passed to the progress hooks and shown on the
+                        console (default 10, 0 for every update).
     nopart:             Do not use temporary .part files.
     updatetime:         Use the Last-modified header to set output file timestamps.
     test:               Download only first bytes to test the downloader.
@@ -51,6 +61,8 @@ class FileDownloader(object):
     http_chunk_size:    Size of a chunk for chunk-based HTTP downloading. May be
                         useful for bypassing bandwidth throttling imposed by
                         a webserver (experimental)
+    http_chunks:        Number of connections to download a file over at once,
+                        each fetching byte ranges of it.
 
     Subclasses of this one must re-define the real_download method.
     """
@@ -63,6 +75,11 @@ class FileDownloader(object):
         self.ydl = ydl
         self._progress_hooks = []
         self.params = params
+        self._progress = ProgressDispatcher(
+            self._progress_hooks, params.get('progress_rate', 10))
+        self._cancelled = threading.Event()
+        self._open_stream = None
+        self._streams = []
         self.add_progress_hook(self.report_progress)
 
     @staticmethod
@@ -180,6 +197,31 @@ class FileDownloader(object):
             if sleep_time > 0:
                 time.sleep(sleep_time)
 
+    def bandwidth_stream(self, url):
+        """Return the BandwidthStream to account the bytes downloaded from
+        url to, None if there is no rate limit."""
+        scheduler = BandwidthScheduler.get(
+            self.params.get('ratelimit'), self.params.get('ratelimit_per_host'))
+        return scheduler.open(url) if scheduler is not None else None
+
+    def stream_to(self, open_stream):
+        """Write downloads to '-' to the binary file object returned by
+        open_stream() instead of to stdout.
+
+        open_stream() is called when the download starts writing and the
+        stream is closed once the download is over, so that its reader sees
+        the end of the data.
+        """
+        self._open_stream = open_stream
+
+    def open_output(self, filename, open_mode):
+        """sanitize_open() honoring stream_to()"""
+        if filename == '-' and self._open_stream is not None:
+            stream = self._open_stream()
+            self._streams.append(stream)
+            return stream, filename
+        return sanitize_open(filename, open_mode)
+
     def temp_name(self, filename):
         """Returns a temporary filename for the given filename."""
         if self.params.get('nopart', False) or filename == '-' or \
@@ -226,6 +268,9 @@ class FileDownloader(object):
 
     def report_destination(self, filename):
         """Report destination filename."""
+        if filename == '-' and self._open_stream is not None:
+            # Whoever reads the stream reports where it goes
+            return
         self.to_screen('[download] Destination: ' + filename)
 
     def _report_progress_status(self, msg, is_last_line=False):
@@ -363,21 +408,42 @@ class FileDownloader(object):
                     else '%.2f' % sleep_interval))
             time.sleep(sleep_interval)
 
-        return self.real_download(filename, info_dict)
+        try:
+            return self.real_download(filename, info_dict)
+        finally:
+            for stream in self._streams:
+                try:
+                    stream.close()
+                except (IOError, OSError):
+                    # The reader reports its errors
+                    pass
+            self._streams = []
 
     def real_download(self, filename, info_dict):
         """Real download process. Redefine in subclasses."""
         raise NotImplementedError('This method must be implemented by subclasses')
 
+    def cancel(self):
+        """Stop the download running in another thread.
+
+        The download raises DownloadCancelled on its next progress update
+        and leaves its partial file to be resumed.
+        """
+        self._cancelled.set()
+
     def _hook_progress(self, status):
-        for ph in self._progress_hooks:
-            ph(status)
+        if status['status'] == 'downloading' and self._cancelled.is_set():
+            raise DownloadCancelled('Download cancelled')
+        self._progress.dispatch(status)
 
     def add_progress_hook(self, ph):
         # See YoutubeDl.py (search for progress_hooks) for a description of
         # this interface
         self._progress_hooks.append(ph)
 
+    def remove_progress_hook(self, ph):
+        self._progress_hooks.remove(ph)
+
     def _debug_cmd(self, args, exe=None):
         if not self.params.get('verbose', False):
             return
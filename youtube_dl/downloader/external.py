@@ -4,6 +4,7 @@ import os.path
 import re
 import subprocess
 import sys
+import threading
 import time
 
 from .common import FileDownloader
@@ -17,6 +18,7 @@ from ..utils import (
     cli_valueless_option,
     cli_bool_option,
     cli_configuration_args,
+    DownloadCancelled,
     encodeFilename,
     encodeArgument,
     handle_youtubedl_headers,
@@ -104,11 +106,27 @@ class ExternalFD(FileDownloader):
 
         p = subprocess.Popen(
             cmd, stderr=subprocess.PIPE)
-        _, stderr = p.communicate()
+        _, stderr = self._communicate(p)
         if p.returncode != 0:
             self.to_stderr(stderr.decode('utf-8', 'replace'))
         return p.returncode
 
+    def _communicate(self, p):
+        """p.communicate() that terminates p and raises DownloadCancelled
+        when the download is cancelled"""
+        result = []
+        thread = threading.Thread(target=lambda: result.append(p.communicate()))
+        thread.daemon = True
+        thread.start()
+        # Poll rather than wait so that the download can be cancelled
+        while thread.is_alive():
+            if self._cancelled.is_set() and p.poll() is None:
+                p.terminate()
+                thread.join()
+                raise DownloadCancelled('Download cancelled')
+            thread.join(0.2)
+        return result[0]
+
 
 class CurlFD(ExternalFD):
     AVAILABLE_OPT = '-V'
@@ -141,7 +159,7 @@ class CurlFD(ExternalFD):
 
         # curl writes the progress to stderr so don't capture it.
         p = subprocess.Popen(cmd)
-        p.communicate()
+        self._communicate(p)
         return p.returncode
 
 
@@ -335,7 +353,13 @@ class FFmpegFD(ExternalFD):
 
         proc = subprocess.Popen(args, stdin=subprocess.PIPE, env=env)
         try:
-            retval = proc.wait()
+            # Poll rather than wait so that the download can be cancelled
+            while proc.poll() is None:
+                self._cancelled.wait(0.2)
+                if self._cancelled.is_set():
+                    proc.communicate(b'q')
+                    raise DownloadCancelled('Download cancelled')
+            retval = proc.returncode
         except KeyboardInterrupt:
             # subprocces.run would send the SIGKILL signal to ffmpeg and the
             # mp4 file couldn't be played, but if we ask ffmpeg to quit it
@@ -1,16 +1,25 @@
 from __future__ import division, unicode_literals
 
+import errno
+import io
 import os
+import socket
+import threading
 import time
 import json
 
 from .common import FileDownloader
 from .http import HttpFD
+from ..compat import compat_urllib_error
 from ..utils import (
+    ContentTooShortError,
+    DownloadError,
     error_to_compat_str,
     encodeFilename,
+    int_or_none,
     sanitize_open,
     sanitized_Request,
+    timeconvert,
 )
 
 
@@ -30,7 +39,12 @@ class FragmentFD(FileDownloader):
     skip_unavailable_fragments:
                         Skip unavailable fragments (DASH and hlsnative only)
     keep_fragments:     Keep downloaded fragments on disk after downloading is
-                        finished
+                        finished. Otherwise fragments are not written to
+                        temporary files at all but read into memory or
+                        straight into the destination file.
+    concurrent_fragments:
+                        Number of fragments to download concurrently (DASH,
+                        hlsnative and ISM only, default is 1)
 
     For each incomplete fragment download youtube-dl keeps on disk a special
     bookkeeping file with download state and metadata (in future such files will
@@ -49,6 +63,9 @@ class FragmentFD(FileDownloader):
                 index:  0-based index of current fragment among all fragments
             fragment_count:
                 Total count of fragments
+            file_size:
+                Size of the destination file once all the fragments up to
+                the current one are appended
 
     This feature is experimental and file format may change in future.
     """
@@ -77,7 +94,10 @@ class FragmentFD(FileDownloader):
         assert 'ytdl_corrupt' not in ctx
         stream, _ = sanitize_open(self.ytdl_filename(ctx['filename']), 'r')
         try:
-            ctx['fragment_index'] = json.loads(stream.read())['downloader']['current_fragment']['index']
+            downloader = json.loads(stream.read())['downloader']
+            ctx['fragment_index'] = downloader['current_fragment']['index']
+            if downloader.get('file_size') is not None:
+                ctx['ytdl_file_size'] = int(downloader['file_size'])
         except Exception:
             ctx['ytdl_corrupt'] = True
         finally:
@@ -92,10 +112,21 @@ class FragmentFD(FileDownloader):
         }
         if ctx.get('fragment_count') is not None:
             downloader['fragment_count'] = ctx['fragment_count']
+        if ctx.get('dest_stream') is not None:
+            downloader['file_size'] = ctx['dest_stream'].tell()
         frag_index_stream.write(json.dumps({'downloader': downloader}))
         frag_index_stream.close()
 
-    def _download_fragment(self, ctx, frag_url, info_dict, headers=None):
+    def _download_fragment(self, ctx, frag_url, info_dict, headers=None, stream=None):
+        """
+        Download a fragment and return a (success, frag_content) tuple.
+
+        If stream is given the fragment is written to it directly and
+        frag_content is None. With keep_fragments the fragment goes through a
+        -Frag%d file that is kept on disk.
+        """
+        if not self.params.get('keep_fragments', False):
+            return self._read_fragment(ctx, frag_url, info_dict, headers, stream)
         fragment_filename = '%s-Frag%d' % (ctx['tmpfilename'], ctx['fragment_index'])
         fragment_info_dict = {
             'url': frag_url,
@@ -110,18 +141,320 @@ class FragmentFD(FileDownloader):
         ctx['fragment_filename_sanitized'] = frag_sanitized
         frag_content = down.read()
         down.close()
+        if stream is not None:
+            stream.write(frag_content)
+            return True, None
         return True, frag_content
 
+    def _read_fragment(self, ctx, frag_url, info_dict, headers=None, stream=None):
+        # Like HttpFD but without a temporary file: the response is read into
+        # stream or ctx['fragment_buffer']. A fragment that fails halfway is
+        # truncated off the stream again.
+        dl = ctx['dl']
+        request_headers = {'Youtubedl-no-compression': 'True'}
+        request_headers.update(headers or info_dict.get('http_headers') or {})
+        is_test = self.params.get('test', False)
+        if is_test and not any(h.lower() == 'range' for h in request_headers):
+            request_headers['Range'] = 'bytes=0-%d' % (self._TEST_FILE_SIZE - 1)
+        request = sanitized_Request(frag_url, None, request_headers)
+        # Name the fragment would have on disk, identifies the fragment in
+        # progress reports
+        progress_filename = '%s-Frag%d' % (ctx['tmpfilename'], ctx['fragment_index'])
+
+        buffered = stream is None
+        if buffered:
+            # Each fragment downloader reuses a single buffer
+            stream = ctx.get('fragment_buffer') or io.BytesIO()
+            stream.seek(0)
+            stream.truncate()
+        start_pos = stream.tell()
+
+        def discard():
+            # Drop what has been written of this fragment so far
+            stream.seek(start_pos)
+            stream.truncate()
+
+        try:
+            success, byte_counter, last_modified, elapsed = self._read_fragment_data(
+                ctx, request, stream, progress_filename, discard)
+        except BaseException:
+            discard()
+            raise
+        if not success:
+            discard()
+            return False, None
+
+        if self.params.get('updatetime', True) and last_modified:
+            ctx['fragment_filetime'] = timeconvert(last_modified)
+        dl._hook_progress({
+            'status': 'finished',
+            'downloaded_bytes': byte_counter,
+            'total_bytes': byte_counter,
+            'filename': progress_filename,
+            'elapsed': elapsed,
+        })
+        if buffered:
+            return True, stream.getvalue()
+        return True, None
+
+    def _read_fragment_data(self, ctx, request, stream, progress_filename, discard):
+        dl = ctx['dl']
+        is_test = self.params.get('test', False)
+        retries = self.params.get('retries', 0)
+        count = 0
+        bandwidth = dl.bandwidth_stream(request.get_full_url())
+        try:
+            while True:
+                data = self.ydl.urlopen(request)
+                try:
+                    data_len = int_or_none(data.info().get('Content-Length'))
+                    if is_test and (data_len is None or data_len > self._TEST_FILE_SIZE):
+                        data_len = self._TEST_FILE_SIZE
+                    byte_counter = 0
+                    block_size = self.params.get('buffersize', 1024)
+                    start = now = time.time()
+                    while data_len is None or byte_counter < data_len:
+                        before = now
+                        data_block = data.read(
+                            block_size if data_len is None
+                            else min(block_size, data_len - byte_counter))
+                        if not data_block:
+                            break
+                        stream.write(data_block)
+                        byte_counter += len(data_block)
+                        if bandwidth is not None:
+                            bandwidth.consume(len(data_block))
+                        now = time.time()
+                        if not self.params.get('noresizebuffer', False):
+                            block_size = dl.best_block_size(now - before, len(data_block))
+                        dl._hook_progress({
+                            'status': 'downloading',
+                            'downloaded_bytes': byte_counter,
+                            'total_bytes': data_len,
+                            'filename': progress_filename,
+                            'eta': dl.calc_eta(start, now, data_len, byte_counter),
+                            'speed': dl.calc_speed(start, now, byte_counter),
+                            'elapsed': now - start,
+                        })
+                    if data_len is not None and byte_counter != data_len:
+                        raise ContentTooShortError(byte_counter, data_len)
+                    last_modified = data.info().get('Last-Modified')
+                except (socket.error, ContentTooShortError) as err:
+                    if isinstance(err, compat_urllib_error.URLError) or not (
+                            isinstance(err, (socket.timeout, ContentTooShortError))
+                            or err.errno in (errno.ECONNRESET, errno.ETIMEDOUT)):
+                        raise
+                    count += 1
+                    if count > retries:
+                        self.report_error('giving up after %s retries' % retries)
+                        return False, None, None, None
+                    dl.report_retry(err, count, retries)
+                    # Start the fragment over
+                    discard()
+                    continue
+                finally:
+                    data.close()
+                return True, byte_counter, last_modified, time.time() - start
+        finally:
+            if bandwidth is not None:
+                bandwidth.close()
+
     def _append_fragment(self, ctx, frag_content):
+        """Append frag_content (None if the fragment has been written to
+        the destination stream already) and record the progress"""
         try:
-            ctx['dest_stream'].write(frag_content)
+            if frag_content is not None:
+                ctx['dest_stream'].write(frag_content)
             ctx['dest_stream'].flush()
         finally:
             if self.__do_ytdl_file(ctx):
                 self._write_ytdl_file(ctx)
-            if not self.params.get('keep_fragments', False):
-                os.remove(encodeFilename(ctx['fragment_filename_sanitized']))
-            del ctx['fragment_filename_sanitized']
+            frag_filename = ctx.pop('fragment_filename_sanitized', None)
+            if frag_filename and not self.params.get('keep_fragments', False):
+                os.remove(encodeFilename(frag_filename))
+
+    def _download_fragment_with_retries(self, ctx, fragment, info_dict, stream=None):
+        """
+        Download a single fragment honoring fragment_retries and
+        skip_unavailable_fragments.
+
+        Returns a (status, frag_content) tuple where status is True on
+        success, None if the fragment has been skipped and False if the
+        whole download must be aborted.
+        """
+        frag_index = fragment['frag_index']
+        fatal = fragment.get('fatal') or not self.params.get('skip_unavailable_fragments', True)
+        fragment_retries = self.params.get('fragment_retries', 0)
+        count = 0
+        while count <= fragment_retries:
+            try:
+                success, frag_content = self._download_fragment(
+                    ctx, fragment['url'], info_dict, fragment.get('headers'), stream)
+                if not success:
+                    return False, None
+                return True, frag_content
+            except compat_urllib_error.HTTPError as err:
+                # Unavailable (possibly temporary) fragments may be served.
+                # First we try to retry then either skip or abort.
+                # See https://github.com/ytdl-org/youtube-dl/issues/10165,
+                # https://github.com/ytdl-org/youtube-dl/issues/10448).
+                # YouTube may also return 404 for a DASH fragment that is
+                # served fine when immediately retried with the same request.
+                count += 1
+                if count <= fragment_retries:
+                    self.report_retry_fragment(err, frag_index, count, fragment_retries)
+            except DownloadError:
+                # Don't retry fragment if error occurred during HTTP downloading
+                # itself since it has own retry settings
+                if not fatal:
+                    self.report_skip_fragment(frag_index)
+                    return None, None
+                raise
+        if not fatal:
+            self.report_skip_fragment(frag_index)
+            return None, None
+        self.report_error('giving up after %s fragment retries' % fragment_retries)
+        return False, None
+
+    def download_and_append_fragments(self, ctx, fragments, info_dict, pack_func=None):
+        """
+        Download fragments and append them to the destination file in order.
+
+        fragments is a list of dicts with the following fields:
+        frag_index: 1-based index of the fragment among all fragments
+        url:        URL of the fragment
+        headers:    (optional) HTTP headers for the fragment request
+        fatal:      (optional) Abort the whole download when the fragment is
+                    unavailable even if skip_unavailable_fragments is set
+
+        pack_func, if given, is called as pack_func(frag_content, fragment)
+        right before the fragment is appended and must return the data to be
+        actually written.
+
+        Fragments already recorded in the .ytdl file are skipped. With
+        concurrent_fragments greater than 1 fragments are downloaded by a pool
+        of worker threads and are reordered before appending, so that the
+        destination file and the .ytdl file stay consistent for resuming.
+
+        Returns True on success and False otherwise.
+        """
+        fragments = [f for f in fragments if f['frag_index'] > ctx['fragment_index']]
+
+        def append_fragment(frag_ctx, fragment, result):
+            status, frag_content = result
+            if status is False:
+                return False
+            ctx['fragment_index'] = fragment['frag_index']
+            if status is None:
+                if self.__do_ytdl_file(ctx):
+                    self._write_ytdl_file(ctx)
+                return True
+            if frag_ctx.get('fragment_filetime'):
+                ctx['fragment_filetime'] = frag_ctx['fragment_filetime']
+            if frag_ctx.get('fragment_filename_sanitized'):
+                ctx['fragment_filename_sanitized'] = frag_ctx['fragment_filename_sanitized']
+            if pack_func:
+                frag_content = pack_func(frag_content, fragment)
+            self._append_fragment(ctx, frag_content)
+            return True
+
+        max_workers = self.params.get('concurrent_fragments') or 1
+        if max_workers <= 1 or len(fragments) <= 1 or self.params.get('test', False):
+            # Fragments that need no repacking are read straight into the
+            # destination file
+            stream = None
+            if pack_func is None and ctx['tmpfilename'] != '-':
+                stream = ctx['dest_stream']
+            for fragment in fragments:
+                frag_ctx = dict(ctx, fragment_index=fragment['frag_index'] - 1)
+                result = self._download_fragment_with_retries(
+                    frag_ctx, fragment, info_dict, stream)
+                if not append_fragment(frag_ctx, fragment, result):
+                    return False
+            return True
+
+        return self._download_fragments_concurrently(
+            ctx, fragments, info_dict, min(max_workers, len(fragments)), append_fragment)
+
+    def _download_fragments_concurrently(self, ctx, fragments, info_dict, max_workers, append_fragment):
+        ctx['concurrent'] = True
+        # Downloaded fragments are kept until all the preceding ones are
+        # appended, limit how far ahead of the appending workers may go
+        window = max_workers * 2
+        cond = threading.Condition()
+        pool = {
+            'next_job': 0,
+            'next_append': 0,
+            'results': {},
+            'abort': False,
+        }
+
+        def worker():
+            dl = self._make_fragment_downloader()
+            dl.add_progress_hook(ctx['frag_progress_hook'])
+            fragment_buffer = io.BytesIO()
+            while True:
+                with cond:
+                    while (not pool['abort'] and pool['next_job'] < len(fragments)
+                           and pool['next_job'] >= pool['next_append'] + window):
+                        cond.wait()
+                    if pool['abort'] or pool['next_job'] >= len(fragments):
+                        return
+                    pos = pool['next_job']
+                    pool['next_job'] += 1
+                fragment = fragments[pos]
+                frag_ctx = dict(
+                    ctx, dl=dl, fragment_buffer=fragment_buffer,
+                    fragment_index=fragment['frag_index'] - 1)
+                try:
+                    result = self._download_fragment_with_retries(frag_ctx, fragment, info_dict)
+                except Exception as err:
+                    result = err
+                with cond:
+                    pool['results'][pos] = (frag_ctx, result)
+                    cond.notify_all()
+
+        workers = [threading.Thread(target=worker) for _ in range(max_workers)]
+        for t in workers:
+            t.daemon = True
+            t.start()
+        try:
+            for pos, fragment in enumerate(fragments):
+                with cond:
+                    while pos not in pool['results']:
+                        # Wait with a timeout so that KeyboardInterrupt is
+                        # delivered to the main thread on python 2
+                        cond.wait(1)
+                    frag_ctx, result = pool['results'].pop(pos)
+                    pool['next_append'] = pos + 1
+                    cond.notify_all()
+                if isinstance(result, Exception):
+                    raise result
+                if not append_fragment(frag_ctx, fragment, result):
+                    return False
+        finally:
+            with cond:
+                pool['abort'] = True
+                cond.notify_all()
+            ctx['concurrent'] = False
+        for t in workers:
+            t.join()
+        return True
+
+    def _make_fragment_downloader(self):
+        return HttpQuietDownloader(
+            self.ydl,
+            {
+                'continuedl': True,
+                'quiet': True,
+                'noprogress': True,
+                'ratelimit': self.params.get('ratelimit'),
+                'ratelimit_per_host': self.params.get('ratelimit_per_host'),
+                'retries': self.params.get('retries', 0),
+                'nopart': self.params.get('nopart', False),
+                'test': self.params.get('test', False),
+            }
+        )
 
     def _prepare_frag_download(self, ctx):
         if 'live' not in ctx:
@@ -136,18 +469,7 @@ class FragmentFD(FileDownloader):
         self.to_screen(
             '[%s] Total fragments: %s' % (self.FD_NAME, total_frags_str))
         self.report_destination(ctx['filename'])
-        dl = HttpQuietDownloader(
-            self.ydl,
-            {
-                'continuedl': True,
-                'quiet': True,
-                'noprogress': True,
-                'ratelimit': self.params.get('ratelimit'),
-                'retries': self.params.get('retries', 0),
-                'nopart': self.params.get('nopart', False),
-                'test': self.params.get('test', False),
-            }
-        )
+        dl = self._make_fragment_downloader()
         tmpfilename = self.temp_name(ctx['filename'])
         open_mode = 'wb'
         resume_len = 0
@@ -178,15 +500,22 @@ class FragmentFD(FileDownloader):
                     if 'ytdl_corrupt' in ctx:
                         del ctx['ytdl_corrupt']
                     self._write_ytdl_file(ctx)
+                elif resume_len > ctx.get('ytdl_file_size', resume_len):
+                    # Drop a fragment that was being written straight into
+                    # the file when the download got interrupted
+                    resume_len = ctx['ytdl_file_size']
+                    with open(encodeFilename(tmpfilename), 'r+b') as f:
+                        f.truncate(resume_len)
             else:
                 self._write_ytdl_file(ctx)
                 assert ctx['fragment_index'] == 0
 
-        dest_stream, tmpfilename = sanitize_open(tmpfilename, open_mode)
+        dest_stream, tmpfilename = self.open_output(tmpfilename, open_mode)
 
         ctx.update({
             'dl': dl,
             'dest_stream': dest_stream,
+            'fragment_buffer': io.BytesIO(),
             'tmpfilename': tmpfilename,
             # Total complete fragments downloaded so far in bytes
             'complete_frags_downloaded_bytes': resume_len,
@@ -209,42 +538,53 @@ class FragmentFD(FileDownloader):
         start = time.time()
         ctx.update({
             'started': start,
-            # Amount of fragment's bytes downloaded by the time of the previous
-            # frag progress hook invocation
-            'prev_frag_downloaded_bytes': 0,
+            # Amount of bytes downloaded so far for each fragment being
+            # currently downloaded, keyed by fragment filename
+            'frags_in_flight': {},
         })
+        lock = threading.Lock()
 
         def frag_progress_hook(s):
             if s['status'] not in ('downloading', 'finished'):
                 return
 
-            time_now = time.time()
-            state['elapsed'] = time_now - start
-            frag_total_bytes = s.get('total_bytes') or 0
-            if not ctx['live']:
-                estimated_size = (
-                    (ctx['complete_frags_downloaded_bytes'] + frag_total_bytes)
-                    / (state['fragment_index'] + 1) * total_frags)
-                state['total_bytes_estimate'] = estimated_size
-
-            if s['status'] == 'finished':
-                state['fragment_index'] += 1
-                ctx['fragment_index'] = state['fragment_index']
-                state['downloaded_bytes'] += frag_total_bytes - ctx['prev_frag_downloaded_bytes']
-                ctx['complete_frags_downloaded_bytes'] = state['downloaded_bytes']
-                ctx['prev_frag_downloaded_bytes'] = 0
-            else:
-                frag_downloaded_bytes = s['downloaded_bytes']
-                state['downloaded_bytes'] += frag_downloaded_bytes - ctx['prev_frag_downloaded_bytes']
+            with lock:
+                time_now = time.time()
+                state['elapsed'] = time_now - start
+                frag_total_bytes = s.get('total_bytes') or 0
                 if not ctx['live']:
-                    state['eta'] = self.calc_eta(
-                        start, time_now, estimated_size - resume_len,
-                        state['downloaded_bytes'] - resume_len)
-                state['speed'] = s.get('speed') or ctx.get('speed')
-                ctx['speed'] = state['speed']
-                ctx['prev_frag_downloaded_bytes'] = frag_downloaded_bytes
-            self._hook_progress(state)
-
+                    estimated_size = (
+                        (ctx['complete_frags_downloaded_bytes'] + frag_total_bytes)
+                        / (state['fragment_index'] + 1) * total_frags)
+                    state['total_bytes_estimate'] = estimated_size
+
+                prev_frag_downloaded_bytes = ctx['frags_in_flight'].pop(s['filename'], 0)
+                if s['status'] == 'finished':
+                    state['fragment_index'] += 1
+                    # With concurrent downloads fragments finish out of order,
+                    # the index of the last appended fragment is maintained by
+                    # download_and_append_fragments instead
+                    if not ctx.get('concurrent'):
+                        ctx['fragment_index'] = state['fragment_index']
+                    state['downloaded_bytes'] += frag_total_bytes - prev_frag_downloaded_bytes
+                    ctx['complete_frags_downloaded_bytes'] += frag_total_bytes
+                else:
+                    frag_downloaded_bytes = s['downloaded_bytes']
+                    state['downloaded_bytes'] += frag_downloaded_bytes - prev_frag_downloaded_bytes
+                    if not ctx['live']:
+                        state['eta'] = self.calc_eta(
+                            start, time_now, estimated_size - resume_len,
+                            state['downloaded_bytes'] - resume_len)
+                    if ctx.get('concurrent'):
+                        state['speed'] = self.calc_speed(
+                            start, time_now, state['downloaded_bytes'] - resume_len)
+                    else:
+                        state['speed'] = s.get('speed') or ctx.get('speed')
+                    ctx['speed'] = state['speed']
+                    ctx['frags_in_flight'][s['filename']] = frag_downloaded_bytes
+                self._hook_progress(state)
+
+        ctx['frag_progress_hook'] = frag_progress_hook
         ctx['dl'].add_progress_hook(frag_progress_hook)
 
         return start
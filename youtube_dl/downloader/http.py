@@ -1,8 +1,10 @@
 from __future__ import unicode_literals
 
 import errno
+import json
 import os
 import socket
+import threading
 import time
 import random
 import re
@@ -15,16 +17,91 @@ from ..compat import (
 from ..utils import (
     ContentTooShortError,
     encodeFilename,
+    error_to_compat_str,
     int_or_none,
+    unified_timestamp,
     sanitize_open,
     sanitized_Request,
+    write_json_file,
     write_xattr,
     XAttrMetadataError,
     XAttrUnavailableError,
 )
 
 
+class _RetryChunk(Exception):
+    def __init__(self, source_error):
+        self.source_error = source_error
+
+
+def _retry_after(err, default):
+    """Seconds to wait before retrying as asked by the Retry-After header
+    of the HTTP error err (in seconds or an HTTP date)"""
+    value = (err.headers.get('Retry-After') if err.headers else None) or ''
+    seconds = int_or_none(value.strip())
+    if seconds is None:
+        timestamp = unified_timestamp(value)
+        if timestamp is None:
+            return default
+        seconds = timestamp - time.time()
+    return max(seconds, 0)
+
+
+class AdaptiveChunkSize(object):
+    """
+    Size of the ranges requested for chunk-based HTTP downloading
+
+    Starts from the configured http_chunk_size and is adapted, within 1/8
+    and 8 times of it, after every range: ranges grow while the request
+    latency is significant compared to their transfer time and shrink when
+    the server throttles, that is when it answers 503 or the speed of a
+    range falls below half of the best one seen.
+    """
+
+    # Ranges should take this many times longer to transfer than to request
+    _LATENCY_FACTOR = 10
+
+    def __init__(self, size):
+        self.size = size
+        self._min_size = max(size // 8, 1)
+        self._max_size = size * 8
+        self._best_speed = None
+
+    def _grow(self):
+        self.size = min(self.size * 2, self._max_size)
+
+    def _shrink(self):
+        self.size = max(self.size // 2, self._min_size)
+
+    def update(self, latency, elapsed, byte_counter):
+        """Account for a range of byte_counter bytes that took latency
+        seconds to request and elapsed seconds to transfer"""
+        if elapsed <= 0 or not byte_counter:
+            return
+        speed = byte_counter / elapsed
+        if self._best_speed is not None and speed < self._best_speed / 2:
+            self._shrink()
+        elif latency * self._LATENCY_FACTOR > elapsed:
+            self._grow()
+        self._best_speed = max(self._best_speed or 0, speed)
+
+    def throttled(self):
+        self._shrink()
+
+
 class HttpFD(FileDownloader):
+    # Time (in seconds) to wait before retrying after 429 Too Many Requests
+    # responses without Retry-After and longest wait they can ask for
+    _RETRY_AFTER = 5
+    _MAX_RETRY_AFTER = 300
+
+    @staticmethod
+    def _set_range(req, start, end):
+        range_header = 'bytes=%d-' % start
+        if end is not None:
+            range_header += compat_str(end)
+        req.add_header('Range', range_header)
+
     def real_download(self, filename, info_dict):
         url = info_dict['url']
 
@@ -55,6 +132,11 @@ class HttpFD(FileDownloader):
         ctx.block_size = self.params.get('buffersize', 1024)
         ctx.start_time = time.time()
         ctx.chunk_size = None
+        ctx.next_chunk_size = None
+        ctx.prefetch = None
+        ctx.latency = 0
+        ctx.buffer = None
+        adaptive_chunk_size = AdaptiveChunkSize(chunk_size) if chunk_size and not is_test else None
 
         if self.params.get('continuedl', True):
             # Establish possible resume length
@@ -64,6 +146,25 @@ class HttpFD(FileDownloader):
 
         ctx.is_resume = ctx.resume_len > 0
 
+        http_chunks = self.params.get('http_chunks') or 1
+        if http_chunks > 1 and not is_test and ctx.tmpfilename != '-':
+            res = self._download_chunked(ctx, info_dict, headers, http_chunks, chunk_size)
+            if res is not None:
+                return res
+            # Ranges are not served, go on over a single connection
+
+        chunk_map = encodeFilename(self.ytdl_filename(ctx.filename))
+        if ctx.is_resume and os.path.isfile(chunk_map):
+            # The .part file was preallocated by a chunked download, its
+            # length says nothing about what has been downloaded
+            self.to_screen('[download] Unable to resume chunked download over a single connection, restarting')
+            try:
+                os.remove(chunk_map)
+            except OSError:
+                pass
+            ctx.resume_len = 0
+            ctx.is_resume = False
+
         count = 0
         retries = self.params.get('retries', 0)
 
@@ -77,15 +178,55 @@ class HttpFD(FileDownloader):
         class NextFragment(Exception):
             pass
 
-        def set_range(req, start, end):
-            range_header = 'bytes=%d-' % start
-            if end:
-                range_header += compat_str(end)
-            req.add_header('Range', range_header)
+        def pick_chunk_size():
+            if adaptive_chunk_size is None:
+                return chunk_size
+            size = adaptive_chunk_size.size
+            return random.randint(int(size * 0.95), size)
+
+        def start_prefetch(range_start):
+            # Request the next range while the current one is streaming so
+            # that there is no round trip between ranges
+            ctx.next_chunk_size = pick_chunk_size()
+            range_end = range_start + ctx.next_chunk_size - 1
+            if ctx.data_len is not None and range_end >= ctx.data_len:
+                range_end = ctx.data_len - 1
+            request = sanitized_Request(url, None, headers)
+            self._set_range(request, range_start, range_end)
+            result = {}
+
+            def fetch():
+                before = time.time()
+                try:
+                    result['data'] = self.ydl.urlopen(request)
+                except Exception:
+                    # Requested again without prefetching
+                    pass
+                result['latency'] = time.time() - before
+
+            thread = threading.Thread(target=fetch)
+            thread.daemon = True
+            thread.start()
+            ctx.prefetch = (range_start, range_end, thread, result)
+
+        def take_prefetch(range_start, range_end):
+            """Return the prefetched response for the range, None if there
+            is none"""
+            if ctx.prefetch is None:
+                return None
+            prefetch_start, prefetch_end, thread, result = ctx.prefetch
+            ctx.prefetch = None
+            thread.join()
+            data = result.get('data')
+            if data is not None and (prefetch_start, prefetch_end) != (range_start, range_end):
+                data.close()
+                return None
+            ctx.latency = result['latency']
+            return data
 
         def establish_connection():
-            ctx.chunk_size = (random.randint(int(chunk_size * 0.95), chunk_size)
-                              if not is_test and chunk_size else chunk_size)
+            ctx.chunk_size = ctx.next_chunk_size or pick_chunk_size()
+            ctx.next_chunk_size = None
             if ctx.resume_len > 0:
                 range_start = ctx.resume_len
                 if ctx.is_resume:
@@ -103,11 +244,15 @@ class HttpFD(FileDownloader):
             ctx.has_range = has_range
             request = sanitized_Request(url, None, headers)
             if has_range:
-                set_range(request, range_start, range_end)
+                self._set_range(request, range_start, range_end)
             # Establish connection
             try:
                 try:
-                    ctx.data = self.ydl.urlopen(request)
+                    ctx.data = take_prefetch(range_start, range_end) if has_range else None
+                    if ctx.data is None:
+                        before = time.time()
+                        ctx.data = self.ydl.urlopen(request)
+                        ctx.latency = time.time() - before
                 except (compat_urllib_error.URLError, ) as err:
                     # reason may not be available, e.g. for urllib2.HTTPError on python 2.6
                     reason = getattr(err, 'reason', None)
@@ -183,9 +328,20 @@ class HttpFD(FileDownloader):
                             ctx.resume_len = 0
                             ctx.open_mode = 'wb'
                             return
+                elif err.code == 429 and adaptive_chunk_size is not None:
+                    # Too many requests, requesting smaller ranges would
+                    # make more of them, wait before trying again
+                    if count < retries:
+                        wait = min(_retry_after(err, self._RETRY_AFTER), self._MAX_RETRY_AFTER)
+                        self.to_screen(
+                            '[download] Too many requests, waiting %d seconds' % wait)
+                        time.sleep(wait)
+                    raise RetryDownload(err)
                 elif err.code < 500 or err.code >= 600:
                     # Unexpected HTTP error
                     raise
+                if err.code == 503 and adaptive_chunk_size is not None:
+                    adaptive_chunk_size.throttled()
                 raise RetryDownload(err)
             except socket.error as err:
                 if err.errno != errno.ECONNRESET:
@@ -215,14 +371,28 @@ class HttpFD(FileDownloader):
                     self.to_screen('\r[download] File is larger than max-filesize (%s bytes > %s bytes). Aborting.' % (data_len, max_data_len))
                     return False
 
+            if (adaptive_chunk_size is not None and data_len is not None
+                    and ctx.data_len is not None and data_len < ctx.data_len):
+                start_prefetch(data_len)
+
             byte_counter = 0 + ctx.resume_len
             block_size = ctx.block_size
             start = time.time()
 
-            # measure time over whole while-loop, so slow_down() and best_block_size() work together properly
-            now = None  # needed for slow_down() in the first loop run
+            # measure time over whole while-loop, so rate limiting and best_block_size() work together properly
             before = start  # start measuring
 
+            # Read into a reusable buffer where the response supports it
+            # (http.client on Python 3) instead of allocating every block
+            readinto = getattr(ctx.data, 'readinto', None)
+
+            def read_block(size):
+                if readinto is None:
+                    return ctx.data.read(size)
+                if ctx.buffer is None or len(ctx.buffer) < size:
+                    ctx.buffer = memoryview(bytearray(size))
+                return ctx.buffer[:readinto(ctx.buffer[:size])]
+
             def retry(e):
                 to_stdout = ctx.tmpfilename == '-'
                 if ctx.stream is not None:
@@ -235,7 +405,7 @@ class HttpFD(FileDownloader):
             while True:
                 try:
                     # Download and write
-                    data_block = ctx.data.read(block_size if data_len is None else min(block_size, data_len - byte_counter))
+                    data_block = read_block(block_size if data_len is None else min(block_size, data_len - byte_counter))
                 # socket.timeout is a subclass of socket.error but may not have
                 # errno set
                 except socket.timeout as e:
@@ -256,7 +426,7 @@ class HttpFD(FileDownloader):
                 # Open destination file just in time
                 if ctx.stream is None:
                     try:
-                        ctx.stream, ctx.tmpfilename = sanitize_open(
+                        ctx.stream, ctx.tmpfilename = self.open_output(
                             ctx.tmpfilename, ctx.open_mode)
                         assert ctx.stream is not None
                         ctx.filename = self.undo_temp_name(ctx.tmpfilename)
@@ -279,7 +449,8 @@ class HttpFD(FileDownloader):
                     return False
 
                 # Apply rate limit
-                self.slow_down(start, now, byte_counter - ctx.resume_len)
+                if bandwidth is not None:
+                    bandwidth.consume(len(data_block))
 
                 # end measuring of one loop run
                 now = time.time()
@@ -291,28 +462,32 @@ class HttpFD(FileDownloader):
 
                 before = after
 
-                # Progress message
-                speed = self.calc_speed(start, now, byte_counter - ctx.resume_len)
-                if ctx.data_len is None:
-                    eta = None
-                else:
-                    eta = self.calc_eta(start, time.time(), ctx.data_len - ctx.resume_len, byte_counter - ctx.resume_len)
-
-                self._hook_progress({
-                    'status': 'downloading',
-                    'downloaded_bytes': byte_counter,
-                    'total_bytes': ctx.data_len,
-                    'tmpfilename': ctx.tmpfilename,
-                    'filename': ctx.filename,
-                    'eta': eta,
-                    'speed': speed,
-                    'elapsed': now - ctx.start_time,
-                })
+                # Progress message, unless it would be coalesced anyway
+                if self._progress.due(now):
+                    speed = self.calc_speed(start, now, byte_counter - ctx.resume_len)
+                    if ctx.data_len is None:
+                        eta = None
+                    else:
+                        eta = self.calc_eta(start, now, ctx.data_len - ctx.resume_len, byte_counter - ctx.resume_len)
+
+                    self._hook_progress({
+                        'status': 'downloading',
+                        'downloaded_bytes': byte_counter,
+                        'total_bytes': ctx.data_len,
+                        'tmpfilename': ctx.tmpfilename,
+                        'filename': ctx.filename,
+                        'eta': eta,
+                        'speed': speed,
+                        'elapsed': now - ctx.start_time,
+                    })
 
                 if data_len is not None and byte_counter == data_len:
                     break
 
             if not is_test and ctx.chunk_size and ctx.data_len is not None and byte_counter < ctx.data_len:
+                if adaptive_chunk_size is not None:
+                    adaptive_chunk_size.update(
+                        ctx.latency, time.time() - start, byte_counter - ctx.resume_len)
                 ctx.resume_len = byte_counter
                 # ctx.block_size = block_size
                 raise NextFragment()
@@ -346,19 +521,286 @@ class HttpFD(FileDownloader):
 
             return True
 
-        while count <= retries:
+        bandwidth = self.bandwidth_stream(url)
+        try:
+            while count <= retries:
+                try:
+                    establish_connection()
+                    return download()
+                except RetryDownload as e:
+                    count += 1
+                    if count <= retries:
+                        self.report_retry(e.source_error, count, retries)
+                    continue
+                except NextFragment:
+                    continue
+                except SucceedDownload:
+                    return True
+
+            self.report_error('giving up after %s retries' % retries)
+            return False
+        finally:
+            data = take_prefetch(None, None)
+            if data is not None:
+                data.close()
+            if bandwidth is not None:
+                bandwidth.close()
+            # Flush what has been downloaded so far if the download has been
+            # interrupted, e.g. cancelled, so that it can be resumed
+            if ctx.stream is not None and ctx.tmpfilename != '-':
+                ctx.stream.close()
+
+    def _probe_size(self, url, headers):
+        """Return the response to a request of the first byte of url and
+        the total size, or (None, None) if the server does not serve ranges"""
+        request = sanitized_Request(url, None, headers)
+        self._set_range(request, 0, 0)
+        try:
+            data = self.ydl.urlopen(request)
+        except (compat_urllib_error.URLError, socket.error):
+            return None, None
+        try:
+            # Servers that ignore the range send the whole file, do not
+            # read it
+            content_range_m = re.search(
+                r'bytes 0-0/(\d+)', data.headers.get('Content-Range') or '')
+            if data.getcode() != 206 or not content_range_m:
+                return None, None
+            data.read(1)
+        except (socket.error, IOError):
+            return None, None
+        finally:
+            data.close()
+        return data, int(content_range_m.group(1))
+
+    def _read_chunk_map(self, filename, size):
+        try:
+            stream, _ = sanitize_open(self.ytdl_filename(filename), 'r')
             try:
-                establish_connection()
-                return download()
-            except RetryDownload as e:
-                count += 1
-                if count <= retries:
-                    self.report_retry(e.source_error, count, retries)
-                continue
-            except NextFragment:
-                continue
-            except SucceedDownload:
-                return True
-
-        self.report_error('giving up after %s retries' % retries)
-        return False
+                downloader = json.loads(stream.read())['downloader']
+            finally:
+                stream.close()
+            if downloader['file_size'] != size:
+                return None
+            return [list(map(int, chunk)) for chunk in downloader['http_chunks']]
+        except Exception:
+            return None
+
+    def _write_chunk_map(self, filename, size, chunks):
+        write_json_file({
+            'downloader': {
+                'file_size': size,
+                'http_chunks': chunks,
+            },
+        }, encodeFilename(self.ytdl_filename(filename)))
+
+    def _download_chunked(self, ctx, info_dict, headers, http_chunks, chunk_size):
+        """
+        Download over up to http_chunks connections at once, each fetching
+        byte ranges of chunk_size (the size divided by http_chunks by
+        default) into the preallocated .part file.
+
+        Chunks are retried independently. Their progress is kept in the
+        .ytdl file so that an interrupted download resumes where each chunk
+        stopped. Returns None if the server does not serve ranges.
+        """
+        url = info_dict['url']
+        probe, size = self._probe_size(url, headers)
+        if size is None or size < 2:
+            return None
+
+        min_data_len = self.params.get('min_filesize')
+        max_data_len = self.params.get('max_filesize')
+        if min_data_len is not None and size < min_data_len:
+            self.to_screen('\r[download] File is smaller than min-filesize (%s bytes < %s bytes). Aborting.' % (size, min_data_len))
+            return False
+        if max_data_len is not None and size > max_data_len:
+            self.to_screen('\r[download] File is larger than max-filesize (%s bytes > %s bytes). Aborting.' % (size, max_data_len))
+            return False
+
+        # Chunks are [start, end, downloaded bytes] with end inclusive
+        chunks = None
+        if ctx.is_resume:
+            chunks = self._read_chunk_map(ctx.filename, size)
+            if chunks is None:
+                # Without a usable chunk map the .part file may be preallocated
+                # anywhere, so it cannot be resumed
+                self.to_screen('[download] Unable to resume chunked download, restarting')
+        resume = chunks is not None
+        if not resume:
+            chunk_len = chunk_size or -(-size // http_chunks)
+            chunks = [
+                [start, min(start + chunk_len, size) - 1, 0]
+                for start in range(0, size, chunk_len)]
+
+        try:
+            stream, tmpfilename = sanitize_open(
+                ctx.tmpfilename, 'r+b' if resume else 'wb')
+            # Preallocate, sparsely where the filesystem supports it
+            stream.truncate(size)
+            stream.close()
+        except (OSError, IOError) as err:
+            self.report_error('unable to open for writing: %s' % str(err))
+            return False
+        ctx.filename = self.undo_temp_name(tmpfilename)
+        self.report_destination(ctx.filename)
+        if self.params.get('xattr_set_filesize', False):
+            try:
+                write_xattr(tmpfilename, 'user.ytdl.filesize', str(size).encode('utf-8'))
+            except (XAttrUnavailableError, XAttrMetadataError) as err:
+                self.report_error('unable to set filesize xattr: %s' % str(err))
+
+        resume_len = sum(chunk[2] for chunk in chunks)
+        if resume_len:
+            self.report_resuming_byte(resume_len)
+        pending = [chunk for chunk in chunks if chunk[0] + chunk[2] <= chunk[1]]
+        self.to_screen('[download] Downloading %d chunks over %d connections' % (
+            len(pending), min(http_chunks, len(pending))))
+
+        retries = self.params.get('retries', 0)
+        cond = threading.Condition()
+        state = {'running': 0, 'error': None, 'stop': False}
+
+        def download_chunk(chunk, bandwidth):
+            start = chunk[0] + chunk[2]
+            request = sanitized_Request(url, None, headers)
+            self._set_range(request, start, chunk[1])
+            try:
+                data = self.ydl.urlopen(request)
+            except compat_urllib_error.HTTPError as err:
+                if err.code < 500 or err.code >= 600:
+                    raise
+                raise _RetryChunk(err)
+            except compat_urllib_error.URLError as err:
+                if isinstance(getattr(err, 'reason', None), socket.timeout):
+                    raise _RetryChunk(err)
+                raise
+            try:
+                content_range_m = re.search(
+                    r'bytes (\d+)-', data.headers.get('Content-Range') or '')
+                if not content_range_m or int(content_range_m.group(1)) != start:
+                    raise ContentTooShortError(0, chunk[1] - start + 1)
+                buf = memoryview(bytearray(ctx.block_size)) if hasattr(data, 'readinto') else None
+                stream = open(encodeFilename(tmpfilename), 'r+b')
+                try:
+                    stream.seek(start)
+                    while chunk[0] + chunk[2] <= chunk[1] and not state['stop']:
+                        size = min(ctx.block_size, chunk[1] - chunk[0] - chunk[2] + 1)
+                        block = buf[:data.readinto(buf[:size])] if buf is not None else data.read(size)
+                        if not block:
+                            raise ContentTooShortError(
+                                chunk[2], chunk[1] - chunk[0] + 1)
+                        stream.write(block)
+                        # Only count what has reached the file so that the
+                        # chunk map never runs ahead of the data
+                        stream.flush()
+                        with cond:
+                            chunk[2] += len(block)
+                        if bandwidth is not None:
+                            bandwidth.consume(len(block))
+                finally:
+                    stream.close()
+            except (socket.timeout, ContentTooShortError) as err:
+                raise _RetryChunk(err)
+            except socket.error as err:
+                if err.errno not in (errno.ECONNRESET, errno.ETIMEDOUT):
+                    raise
+                raise _RetryChunk(err)
+            finally:
+                data.close()
+
+        def worker():
+            error = None
+            # One stream per connection so that they share the rate limit fairly
+            bandwidth = self.bandwidth_stream(url)
+            while error is None:
+                with cond:
+                    if not pending or state['stop']:
+                        break
+                    chunk = pending.pop(0)
+                count = 0
+                while True:
+                    try:
+                        download_chunk(chunk, bandwidth)
+                    except _RetryChunk as e:
+                        count += 1
+                        if count <= retries and not state['stop']:
+                            self.report_retry(e.source_error, count, retries)
+                            continue
+                        error = e.source_error
+                    except Exception as e:
+                        error = e
+                    break
+            if bandwidth is not None:
+                bandwidth.close()
+            with cond:
+                if error is not None:
+                    if state['error'] is None:
+                        state['error'] = error
+                    state['stop'] = True
+                state['running'] -= 1
+                cond.notify_all()
+
+        def stop_workers():
+            with cond:
+                state['stop'] = True
+            # Workers close their files on the way out
+            for thread in threads:
+                thread.join()
+
+        start_time = time.time()
+        threads = []
+        for _ in range(min(http_chunks, len(pending))):
+            state['running'] += 1
+            thread = threading.Thread(target=worker)
+            thread.daemon = True
+            thread.start()
+            threads.append(thread)
+
+        try:
+            with cond:
+                while state['running']:
+                    # Wake up periodically to report progress and so that
+                    # KeyboardInterrupt is delivered on Python 2
+                    cond.wait(1)
+                    self._write_chunk_map(ctx.filename, size, chunks)
+                    downloaded = sum(chunk[2] for chunk in chunks)
+                    now = time.time()
+                    self._hook_progress({
+                        'status': 'downloading',
+                        'downloaded_bytes': downloaded,
+                        'total_bytes': size,
+                        'tmpfilename': tmpfilename,
+                        'filename': ctx.filename,
+                        'eta': self.calc_eta(start_time, now, size - resume_len, downloaded - resume_len),
+                        'speed': self.calc_speed(start_time, now, downloaded - resume_len),
+                        'elapsed': now - ctx.start_time,
+                    })
+        except BaseException:
+            stop_workers()
+            self._write_chunk_map(ctx.filename, size, chunks)
+            raise
+
+        stop_workers()
+        if state['error'] is not None:
+            self._write_chunk_map(ctx.filename, size, chunks)
+            self.report_error('unable to download chunk: %s' % error_to_compat_str(state['error']))
+            return False
+
+        try:
+            os.remove(encodeFilename(self.ytdl_filename(ctx.filename)))
+        except OSError:
+            pass
+        self.try_rename(tmpfilename, ctx.filename)
+
+        if self.params.get('updatetime', True):
+            info_dict['filetime'] = self.try_utime(ctx.filename, probe.info().get('last-modified', None))
+
+        self._hook_progress({
+            'downloaded_bytes': size,
+            'total_bytes': size,
+            'filename': ctx.filename,
+            'status': 'finished',
+            'elapsed': time.time() - ctx.start_time,
+        })
+        return True
@@ -0,0 +1,120 @@
+from __future__ import unicode_literals
+
+import io
+import json
+import threading
+import time
+
+from ..compat import (
+    compat_numeric_types,
+    compat_str,
+)
+
+
+class ProgressDispatcher(object):
+    """
+    Calls progress hooks with "downloading" updates coalesced to at most
+    rate per second (every update if rate is 0). Updates with any other
+    status, e.g. "finished" or "error", are always delivered.
+
+    Callers may check due() before building an update to skip the work for
+    updates that would be dropped.
+    """
+
+    def __init__(self, hooks, rate):
+        self.hooks = hooks
+        self.interval = 1.0 / rate if rate else 0
+        self._last = None
+        self._lock = threading.Lock()
+
+    def due(self, now=None):
+        """Whether a "downloading" update would be delivered now"""
+        if self._last is None or not self.interval:
+            return True
+        if now is None:
+            now = time.time()
+        return now - self._last >= self.interval
+
+    def dispatch(self, status):
+        if status['status'] == 'downloading':
+            now = time.time()
+            with self._lock:
+                if not self.due(now):
+                    return
+                self._last = now
+        else:
+            # Report the next download right away
+            self._last = None
+        for ph in self.hooks:
+            ph(status)
+
+
+class CombinedProgress(object):
+    """
+    Combines the progress updates of downloads running at once, e.g. the
+    formats to merge, into updates of their total that are passed to report
+    (usually a FileDownloader.report_progress) at most rate per second.
+
+    hook(index) returns the progress hook of the download index.
+    """
+
+    def __init__(self, count, report, rate):
+        self._statuses = [None] * count
+        self._dispatcher = ProgressDispatcher([report], rate)
+        self._lock = threading.Lock()
+
+    def hook(self, index):
+        def progress_hook(status):
+            with self._lock:
+                self._statuses[index] = status
+                self._dispatcher.dispatch(self._combine())
+        return progress_hook
+
+    def _combine(self):
+        statuses = [s or {'status': 'downloading'} for s in self._statuses]
+        finished = [s['status'] == 'finished' for s in statuses]
+        downloaded = 0
+        speed = None
+        elapsed = None
+        for s, done in zip(statuses, finished):
+            downloaded += s.get('downloaded_bytes') or (s.get('total_bytes') if done else 0) or 0
+            if not done and s.get('speed') is not None:
+                speed = (speed or 0) + s['speed']
+            if s.get('elapsed') is not None:
+                elapsed = max(elapsed or 0, s['elapsed'])
+        combined = {
+            'status': 'finished' if all(finished) else 'downloading',
+            'downloaded_bytes': downloaded,
+            'speed': speed,
+            'elapsed': elapsed,
+        }
+        totals = [s.get('total_bytes') for s in statuses]
+        if all(t is not None for t in totals):
+            combined['total_bytes'] = total = sum(totals)
+        else:
+            totals = [t or s.get('total_bytes_estimate') for t, s in zip(totals, statuses)]
+            total = sum(totals) if all(t is not None for t in totals) else None
+            if total is not None:
+                combined['total_bytes_estimate'] = total
+        if total is not None and speed:
+            combined['eta'] = max(int((total - downloaded) / speed), 0)
+        return combined
+
+
+class NDJSONProgressWriter(object):
+    """Progress hook writing updates as JSON objects, one per line, to a
+    file descriptor"""
+
+    def __init__(self, fd):
+        self._stream = io.open(fd, 'wb', closefd=False)
+        self._lock = threading.Lock()
+
+    def __call__(self, status):
+        record = dict(
+            (key, value) for key, value in status.items()
+            if not key.startswith('_') and (
+                value is None or isinstance(value, (compat_str, bool) + compat_numeric_types)))
+        line = (json.dumps(record, sort_keys=True) + '\n').encode('utf-8')
+        with self._lock:
+            self._stream.write(line)
+            self._stream.flush()
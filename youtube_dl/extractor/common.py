@@ -36,6 +36,7 @@ from ..downloader.f4m import (
     get_base_url,
     remove_encrypted_media,
 )
+from ..m3u8 import parse_m3u8
 from ..utils import (
     NO_DEFAULT,
     age_restricted,
@@ -62,7 +63,6 @@ from ..utils import (
     parse_codecs,
     parse_duration,
     parse_iso8601,
-    parse_m3u8_attributes,
     parse_resolution,
     RegexNotFoundError,
     sanitized_Request,
@@ -173,6 +173,12 @@ class InfoExtractor(object):
                                             fragment_base_url
                                  * "duration" (optional, int or float)
                                  * "filesize" (optional, int)
+                    * hls_playlist  The media playlist at url parsed with
+                                 youtube_dl.m3u8.parse_m3u8(), so that the
+                                 native HLS downloader does not have to
+                                 download and parse it again. Ignored for
+                                 live streams, left out of the JSON output,
+                                 .info.json files and the extraction cache.
                     * preference Order number of this format. If this field is
                                  present and not None, the formats get sorted
                                  by this field, regardless of all other values.
@@ -370,6 +376,11 @@ class InfoExtractor(object):
     _real_extract() methods and define a _VALID_URL regexp.
     Probably, they should also be added to the list of extractors.
 
+    Extractors are looked up by the literals their _VALID_URL requires (see
+    extractor/dispatch.py), so a suitable() override may only reject URLs
+    matched by _VALID_URL, never accept other ones. An extractor that needs
+    to do so must set the _URL_LITERALS attribute to None.
+
     _GEO_BYPASS attribute may be set to False in order to disable
     geo restriction bypass mechanisms for a particular extractor.
     Though it won't disable explicit geo restriction bypass based on
@@ -422,6 +433,14 @@ class InfoExtractor(object):
         assert m
         return compat_str(m.group('id'))
 
+    @classmethod
+    def get_temp_id(cls, url):
+        """Return the video id in url if _VALID_URL captures it, else None"""
+        try:
+            return cls._match_id(url)
+        except (AssertionError, IndexError, TypeError):
+            return None
+
     @classmethod
     def working(cls):
         """Getter method for _WORKING."""
@@ -1684,20 +1703,23 @@ class InfoExtractor(object):
         # media playlist and MUST NOT appear in master playlist thus we can
         # clearly detect media playlist with this criterion.
 
-        if '#EXT-X-TARGETDURATION' in m3u8_doc:  # media playlist, return as is
+        playlist = parse_m3u8(m3u8_doc, m3u8_url)
+
+        if playlist['target_duration'] is not None:  # media playlist, return as is
             return [{
                 'url': m3u8_url,
                 'format_id': m3u8_id,
                 'ext': ext,
                 'protocol': entry_protocol,
                 'preference': preference,
+                # Spares the downloader fetching and parsing it again
+                'hls_playlist': playlist,
             }]
 
         groups = {}
         last_stream_inf = {}
 
-        def extract_media(x_media_line):
-            media = parse_m3u8_attributes(x_media_line)
+        def extract_media(media):
             # As per [1, 4.3.4.1] TYPE, GROUP-ID and NAME are REQUIRED
             media_type, group_id, name = media.get('TYPE'), media.get('GROUP-ID'), media.get('NAME')
             if not (media_type and group_id and name):
@@ -1743,91 +1765,84 @@ class InfoExtractor(object):
             rendition = stream_group[0]
             return rendition.get('NAME') or stream_group_id
 
-        # parse EXT-X-MEDIA tags before EXT-X-STREAM-INF in order to have the
-        # chance to detect video only formats when EXT-X-STREAM-INF tags
+        # extract EXT-X-MEDIA tags before EXT-X-STREAM-INF in order to have
+        # the chance to detect video only formats when EXT-X-STREAM-INF tags
         # precede EXT-X-MEDIA tags in HLS manifest such as [3].
-        for line in m3u8_doc.splitlines():
-            if line.startswith('#EXT-X-MEDIA:'):
-                extract_media(line)
-
-        for line in m3u8_doc.splitlines():
-            if line.startswith('#EXT-X-STREAM-INF:'):
-                last_stream_inf = parse_m3u8_attributes(line)
-            elif line.startswith('#') or not line.strip():
-                continue
-            else:
-                tbr = float_or_none(
-                    last_stream_inf.get('AVERAGE-BANDWIDTH')
-                    or last_stream_inf.get('BANDWIDTH'), scale=1000)
-                format_id = []
-                if m3u8_id:
-                    format_id.append(m3u8_id)
-                stream_name = build_stream_name()
-                # Bandwidth of live streams may differ over time thus making
-                # format_id unpredictable. So it's better to keep provided
-                # format_id intact.
-                if not live:
-                    format_id.append(stream_name if stream_name else '%d' % (tbr if tbr else len(formats)))
-                manifest_url = format_url(line.strip())
-                f = {
-                    'format_id': '-'.join(format_id),
-                    'url': manifest_url,
-                    'manifest_url': m3u8_url,
-                    'tbr': tbr,
-                    'ext': ext,
-                    'fps': float_or_none(last_stream_inf.get('FRAME-RATE')),
-                    'protocol': entry_protocol,
-                    'preference': preference,
-                }
-                resolution = last_stream_inf.get('RESOLUTION')
-                if resolution:
-                    mobj = re.search(r'(?P<width>\d+)[xX](?P<height>\d+)', resolution)
-                    if mobj:
-                        f['width'] = int(mobj.group('width'))
-                        f['height'] = int(mobj.group('height'))
-                # Unified Streaming Platform
-                mobj = re.search(
-                    r'audio.*?(?:%3D|=)(\d+)(?:-video.*?(?:%3D|=)(\d+))?', f['url'])
+        for media in playlist['media']:
+            extract_media(media)
+
+        for variant in playlist['variants']:
+            last_stream_inf = variant['stream_inf']
+            tbr = float_or_none(
+                last_stream_inf.get('AVERAGE-BANDWIDTH')
+                or last_stream_inf.get('BANDWIDTH'), scale=1000)
+            format_id = []
+            if m3u8_id:
+                format_id.append(m3u8_id)
+            stream_name = build_stream_name()
+            # Bandwidth of live streams may differ over time thus making
+            # format_id unpredictable. So it's better to keep provided
+            # format_id intact.
+            if not live:
+                format_id.append(stream_name if stream_name else '%d' % (tbr if tbr else len(formats)))
+            manifest_url = variant['url']
+            f = {
+                'format_id': '-'.join(format_id),
+                'url': manifest_url,
+                'manifest_url': m3u8_url,
+                'tbr': tbr,
+                'ext': ext,
+                'fps': float_or_none(last_stream_inf.get('FRAME-RATE')),
+                'protocol': entry_protocol,
+                'preference': preference,
+            }
+            resolution = last_stream_inf.get('RESOLUTION')
+            if resolution:
+                mobj = re.search(r'(?P<width>\d+)[xX](?P<height>\d+)', resolution)
                 if mobj:
-                    abr, vbr = mobj.groups()
-                    abr, vbr = float_or_none(abr, 1000), float_or_none(vbr, 1000)
-                    f.update({
-                        'vbr': vbr,
-                        'abr': abr,
-                    })
-                codecs = parse_codecs(last_stream_inf.get('CODECS'))
-                f.update(codecs)
-                audio_group_id = last_stream_inf.get('AUDIO')
-                # As per [1, 4.3.4.1.1] any EXT-X-STREAM-INF tag which
-                # references a rendition group MUST have a CODECS attribute.
-                # However, this is not always respected, for example, [2]
-                # contains EXT-X-STREAM-INF tag which references AUDIO
-                # rendition group but does not have CODECS and despite
-                # referencing an audio group it represents a complete
-                # (with audio and video) format. So, for such cases we will
-                # ignore references to rendition groups and treat them
-                # as complete formats.
-                if audio_group_id and codecs and f.get('vcodec') != 'none':
-                    audio_group = groups.get(audio_group_id)
-                    if audio_group and audio_group[0].get('URI'):
-                        # TODO: update acodec for audio only formats with
-                        # the same GROUP-ID
-                        f['acodec'] = 'none'
-                formats.append(f)
-
-                # for DailyMotion
-                progressive_uri = last_stream_inf.get('PROGRESSIVE-URI')
-                if progressive_uri:
-                    http_f = f.copy()
-                    del http_f['manifest_url']
-                    http_f.update({
-                        'format_id': f['format_id'].replace('hls-', 'http-'),
-                        'protocol': 'http',
-                        'url': progressive_uri,
-                    })
-                    formats.append(http_f)
-
-                last_stream_inf = {}
+                    f['width'] = int(mobj.group('width'))
+                    f['height'] = int(mobj.group('height'))
+            # Unified Streaming Platform
+            mobj = re.search(
+                r'audio.*?(?:%3D|=)(\d+)(?:-video.*?(?:%3D|=)(\d+))?', f['url'])
+            if mobj:
+                abr, vbr = mobj.groups()
+                abr, vbr = float_or_none(abr, 1000), float_or_none(vbr, 1000)
+                f.update({
+                    'vbr': vbr,
+                    'abr': abr,
+                })
+            codecs = parse_codecs(last_stream_inf.get('CODECS'))
+            f.update(codecs)
+            audio_group_id = last_stream_inf.get('AUDIO')
+            # As per [1, 4.3.4.1.1] any EXT-X-STREAM-INF tag which
+            # references a rendition group MUST have a CODECS attribute.
+            # However, this is not always respected, for example, [2]
+            # contains EXT-X-STREAM-INF tag which references AUDIO
+            # rendition group but does not have CODECS and despite
+            # referencing an audio group it represents a complete
+            # (with audio and video) format. So, for such cases we will
+            # ignore references to rendition groups and treat them
+            # as complete formats.
+            if audio_group_id and codecs and f.get('vcodec') != 'none':
+                audio_group = groups.get(audio_group_id)
+                if audio_group and audio_group[0].get('URI'):
+                    # TODO: update acodec for audio only formats with
+                    # the same GROUP-ID
+                    f['acodec'] = 'none'
+            formats.append(f)
+
+            # for DailyMotion
+            progressive_uri = last_stream_inf.get('PROGRESSIVE-URI')
+            if progressive_uri:
+                http_f = f.copy()
+                del http_f['manifest_url']
+                http_f.update({
+                    'format_id': f['format_id'].replace('hls-', 'http-'),
+                    'protocol': 'http',
+                    'url': progressive_uri,
+                })
+                formats.append(http_f)
         return formats
 
     @staticmethod
@@ -0,0 +1,167 @@
+from __future__ import unicode_literals
+
+import collections
+import re
+
+try:
+    import re._parser as sre_parse  # Python >= 3.11
+except ImportError:
+    import sre_parse
+
+from ..compat import compat_chr
+
+
+# Literals shorter than this are not selective enough to be indexed
+_MIN_LITERAL_LEN = 3
+
+# Parts of literals that occur in most URLs and do not tell extractors apart
+_GENERIC_LITERAL_RE = re.compile(r'https?|www|\b(?:com|net|org)\b|[^a-z0-9]')
+
+
+def _selectivity(literals):
+    return (
+        min(len(_GENERIC_LITERAL_RE.sub('', literal)) for literal in literals),
+        min(map(len, literals)),
+        -len(literals))
+
+
+def _required_literals(pattern):
+    """
+    Return a set of literal strings at least one of which must occur
+    (lowercased) in every string matched by the parsed regular expression
+    pattern, or None if no such set could be determined.
+    """
+    candidates = []
+    run = []
+
+    def end_run():
+        if len(run) >= _MIN_LITERAL_LEN:
+            candidates.append(set([''.join(run)]))
+        del run[:]
+
+    for op, av in pattern:
+        # Opcodes are lowercase strings on Python 2
+        op = str(op).upper()
+        if op == 'LITERAL':
+            run.append(compat_chr(av).lower())
+            continue
+        if op == 'AT':
+            # Zero-width anchors do not break a literal
+            continue
+        end_run()
+        if op == 'SUBPATTERN':
+            sub = _required_literals(av[-1])
+            if sub:
+                candidates.append(sub)
+        elif op in ('MAX_REPEAT', 'MIN_REPEAT'):
+            min_repeat, _, sub_pattern = av
+            if min_repeat >= 1:
+                sub = _required_literals(sub_pattern)
+                if sub:
+                    candidates.append(sub)
+        elif op == 'BRANCH':
+            alternatives = set()
+            for branch in av[1]:
+                sub = _required_literals(branch)
+                if not sub:
+                    break
+                alternatives.update(sub)
+            else:
+                candidates.append(alternatives)
+    end_run()
+
+    if not candidates:
+        return None
+    return max(candidates, key=_selectivity)
+
+
+def url_literals(ie):
+    """
+    Return a tuple of lowercase literals one of which must occur in every
+    URL the extractor (class or instance) is suitable for, or None if
+    suitable() has to be tried for every URL.
+    """
+    ie_cls = ie if isinstance(ie, type) else type(ie)
+    if '_URL_LITERALS' in ie_cls.__dict__:
+        # Precomputed by devscripts/make_lazy_extractors.py or explicitly
+        # disabled by the extractor
+        return ie_cls._URL_LITERALS
+    # Search extractors match their own query syntax
+    if hasattr(ie_cls, '_make_valid_url'):
+        return None
+    valid_url = getattr(ie_cls, '_VALID_URL', None)
+    if not valid_url:
+        return None
+    try:
+        literals = _required_literals(sre_parse.parse(valid_url))
+    except Exception:
+        return None
+    return tuple(sorted(literals)) if literals else None
+
+
+class ExtractorDispatcher(object):
+    """
+    Index of extractors by the literals their _VALID_URL requires.
+
+    Extractors are kept in the order they were added; candidates() yields
+    only those that may be suitable for a URL, preserving that order, so
+    that the first suitable extractor is the same as with a linear scan of
+    all extractors. Extractors without usable literals (e.g. GenericIE or
+    search extractors) are always yielded.
+    """
+
+    def __init__(self, ies=()):
+        self._ies = []
+        self._literals = []
+        # Positions of extractors that must be tried for every URL
+        self._fallback = []
+        # trigram -> positions of extractors with a literal containing it
+        self._index = collections.defaultdict(list)
+        self._trigram_counts = collections.defaultdict(int)
+        for ie in ies:
+            self.add(ie)
+
+    @staticmethod
+    def _trigrams(s):
+        return set(s[i:i + 3] for i in range(len(s) - 2))
+
+    def add(self, ie):
+        pos = len(self._ies)
+        literals = url_literals(ie)
+        self._ies.append(ie)
+        self._literals.append(literals)
+        if not literals:
+            self._fallback.append(pos)
+            return
+        for literal in literals:
+            trigrams = self._trigrams(literal)
+            for trigram in trigrams:
+                self._trigram_counts[trigram] += 1
+            # Index under the least common trigram seen so far so that
+            # lookups produce as few false candidates as possible
+            key = min(trigrams, key=lambda t: (self._trigram_counts[t], t))
+            self._index[key].append(pos)
+
+    def candidates(self, url):
+        lurl = url.lower()
+        positions = set(self._fallback)
+        for trigram in self._trigrams(lurl):
+            for pos in self._index.get(trigram, ()):
+                if pos not in positions and any(
+                        literal in lurl for literal in self._literals[pos]):
+                    positions.add(pos)
+        for pos in sorted(positions):
+            yield self._ies[pos]
+
+    def find(self, url):
+        """Return the first extractor suitable for url or None"""
+        for ie in self.candidates(url):
+            if ie.suitable(url):
+                return ie
+        return None
+
+
+__all__ = [
+    'ExtractorDispatcher',
+    'url_literals',
+]
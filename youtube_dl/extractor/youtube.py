@@ -1238,6 +1238,7 @@ class YoutubeIE(YoutubeBaseInfoExtractor):
         super(YoutubeIE, self).__init__(*args, **kwargs)
         self._code_cache = {}
         self._player_cache = {}
+        self._sig_func_cache = {}
 
     def _signature_cache_id(self, example_sig):
         """ Return a string representation of a signature """
@@ -1253,6 +1254,27 @@ class YoutubeIE(YoutubeBaseInfoExtractor):
             raise ExtractorError('Cannot identify player %r' % player_url)
         return id_m.group('id')
 
+    def _load_player(self, video_id, player_url, player_id):
+        """Return the code of the player, downloading it only if it is not
+        in the filesystem cache already"""
+        if player_id in self._code_cache:
+            return self._code_cache[player_id]
+        cache = self._downloader.cache
+        code = cache.load('youtube-players', player_id, dtype='json.gz')
+        if code is None:
+            # Let a single process download the player while the others
+            # sharing the cache directory wait for it
+            with cache.locked('youtube-players', player_id):
+                code = cache.load('youtube-players', player_id, dtype='json.gz')
+                if code is None:
+                    code = self._download_webpage(
+                        player_url, video_id,
+                        note='Downloading player ' + player_id,
+                        errnote='Download of %s failed' % player_url)
+                    cache.store('youtube-players', player_id, code, dtype='json.gz')
+        self._code_cache[player_id] = code
+        return code
+
     def _extract_signature_function(self, video_id, player_url, example_sig):
         player_id = self._extract_player_info(player_url)
 
@@ -1265,13 +1287,12 @@ class YoutubeIE(YoutubeBaseInfoExtractor):
         if cache_spec is not None:
             return lambda s: ''.join(s[i] for i in cache_spec)
 
-        if player_id not in self._code_cache:
-            self._code_cache[player_id] = self._download_webpage(
-                player_url, video_id,
-                note='Downloading player ' + player_id,
-                errnote='Download of %s failed' % player_url)
-        code = self._code_cache[player_id]
-        res = self._parse_sig_js(code)
+        # The compiled signature function does not depend on the length of
+        # the signature and is shared by all signatures of a player
+        res = self._sig_func_cache.get(player_id)
+        if res is None:
+            code = self._load_player(video_id, player_url, player_id)
+            res = self._sig_func_cache[player_id] = self._parse_sig_js(code)
 
         test_string = ''.join(map(compat_chr, range(len(example_sig))))
         cache_res = res(test_string)
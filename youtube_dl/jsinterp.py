@@ -4,6 +4,7 @@ import json
 import operator
 import re
 
+from .compat import compat_chr
 from .utils import (
     ExtractorError,
     remove_quotes,
@@ -26,6 +27,209 @@ _ASSIGN_OPERATORS.append(('=', lambda cur, right: right))
 
 _NAME_RE = r'[a-zA-Z_$][a-zA-Z_$0-9]*'
 
+_TOKEN_RE = re.compile(r'''(?sx)
+    (?P<space>\s+|//[^\n]*|/\*.*?\*/)|
+    (?P<num>0[xX][0-9a-fA-F]+|(?:\d+\.?\d*|\.\d+)(?:[eE][+-]?\d+)?)|
+    (?P<str>"(?:[^"\\]|\\.)*"|'(?:[^'\\]|\\.)*')|
+    (?P<name>%s)|
+    (?P<op>>>>=|===|!==|>>>|<<=|>>=|&&|\|\||\+\+|--|<<|>>|[-+*/%%&|^!<>=]=|[-+*/%%&|^!~<>=?:.,;()\[\]{}])
+''' % _NAME_RE)
+
+_ESCAPE_RE = re.compile(r'''\\(?:x([0-9a-fA-F]{2})|u([0-9a-fA-F]{4})|(.))''', re.S)
+_ESCAPES = {'b': '\b', 'f': '\f', 'n': '\n', 'r': '\r', 't': '\t', 'v': '\v', '0': '\0'}
+
+# Binary operators by increasing precedence
+_BINARY_PRECEDENCE = dict(
+    (op, i) for i, ops in enumerate((
+        ('|', ), ('^', ), ('&', ), ('>>', '<<'), ('-', '+'), ('%', '/', '*'),
+    )) for op in ops)
+_BINARY_OPERATORS = dict(_OPERATORS)
+_ASSIGN_OPERATOR_FUNCS = dict(_ASSIGN_OPERATORS)
+_UNARY_OPERATORS = {
+    '-': operator.neg,
+    '+': operator.pos,
+    '~': operator.invert,
+    '!': operator.not_,
+}
+_CONSTANTS = {
+    'true': True,
+    'false': False,
+    'null': None,
+    'undefined': None,
+}
+
+
+class _CompileError(Exception):
+    """Raised for code the compiler does not support"""
+
+
+def _unescape(s):
+    def repl(m):
+        if m.group(3) is None:
+            return compat_chr(int(m.group(1) or m.group(2), 16))
+        return _ESCAPES.get(m.group(3), m.group(3))
+    return _ESCAPE_RE.sub(repl, s)
+
+
+def _tokenize(code):
+    tokens = []
+    pos = 0
+    while pos < len(code):
+        m = _TOKEN_RE.match(code, pos)
+        if not m:
+            raise _CompileError('Unexpected character %r' % code[pos])
+        pos = m.end()
+        kind = m.lastgroup
+        if kind == 'space':
+            continue
+        value = m.group(kind)
+        if kind == 'num':
+            value = (
+                int(value, 16) if value[:2] in ('0x', '0X')
+                else int(value) if value.isdigit()
+                else float(value))
+        elif kind == 'str':
+            value = _unescape(value[1:-1])
+        tokens.append((kind, value))
+    tokens.append(('end', None))
+    return tokens
+
+
+class _Parser(object):
+    """
+    Parse the statements of a function body into an AST of nested tuples
+
+    Only the subset of JavaScript the interpreter supports is accepted:
+    var, return and expression statements with literals, arrays, member
+    access, calls, unary, arithmetic and bitwise operators and assignments.
+    """
+
+    def __init__(self, code):
+        self._tokens = _tokenize(code)
+        self._pos = 0
+
+    def _peek(self):
+        return self._tokens[self._pos]
+
+    def _next(self):
+        token = self._tokens[self._pos]
+        self._pos += 1
+        return token
+
+    def _accept(self, value):
+        kind, token_value = self._peek()
+        if kind in ('op', 'name') and token_value == value:
+            self._pos += 1
+            return True
+        return False
+
+    def _expect(self, value):
+        if not self._accept(value):
+            raise _CompileError('Expected %r, got %r' % (value, self._peek()[1]))
+
+    def parse_body(self):
+        statements = []
+        while self._peek()[0] != 'end':
+            if self._accept(';'):
+                continue
+            statements.append(self._statement())
+        return statements
+
+    def _statement(self):
+        if self._accept('var'):
+            declarations = []
+            while True:
+                kind, name = self._next()
+                if kind != 'name':
+                    raise _CompileError('Expected variable name, got %r' % name)
+                value = self._expression() if self._accept('=') else ('const', None)
+                declarations.append(('assign', '=', ('name', name), value))
+                if not self._accept(','):
+                    break
+            self._end_statement()
+            return ('expr', ('seq', declarations))
+        if self._accept('return'):
+            kind, value = self._peek()
+            expr = (
+                ('const', None) if kind == 'end' or (kind == 'op' and value in (';', '}'))
+                else self._expression())
+            self._end_statement()
+            return ('return', expr)
+        expr = self._expression()
+        self._end_statement()
+        return ('expr', expr)
+
+    def _end_statement(self):
+        if not self._accept(';') and self._peek()[0] != 'end':
+            raise _CompileError('Expected end of statement, got %r' % self._peek()[1])
+
+    def _expression(self):
+        target = self._binary(0)
+        kind, value = self._peek()
+        if kind == 'op' and value in _ASSIGN_OPERATOR_FUNCS:
+            if target[0] not in ('name', 'member'):
+                raise _CompileError('Invalid assignment target')
+            self._pos += 1
+            return ('assign', value, target, self._expression())
+        return target
+
+    def _binary(self, min_precedence):
+        left = self._unary()
+        while True:
+            kind, value = self._peek()
+            precedence = _BINARY_PRECEDENCE.get(value) if kind == 'op' else None
+            if precedence is None or precedence < min_precedence:
+                return left
+            self._pos += 1
+            left = ('binary', value, left, self._binary(precedence + 1))
+
+    def _unary(self):
+        kind, value = self._peek()
+        if kind == 'op' and value in _UNARY_OPERATORS:
+            self._pos += 1
+            return ('unary', value, self._unary())
+        return self._postfix(self._primary())
+
+    def _primary(self):
+        kind, value = self._next()
+        if kind in ('num', 'str'):
+            return ('const', value)
+        if kind == 'name':
+            if value in _CONSTANTS:
+                return ('const', _CONSTANTS[value])
+            return ('name', value)
+        if value == '(':
+            expr = self._expression()
+            self._expect(')')
+            return expr
+        if value == '[':
+            return ('array', self._list(']'))
+        raise _CompileError('Unexpected token %r' % value)
+
+    def _list(self, closing):
+        items = []
+        while not self._accept(closing):
+            items.append(self._expression())
+            if not self._accept(','):
+                self._expect(closing)
+                break
+        return items
+
+    def _postfix(self, expr):
+        while True:
+            if self._accept('.'):
+                kind, name = self._next()
+                if kind != 'name':
+                    raise _CompileError('Expected member name, got %r' % name)
+                expr = ('member', expr, ('const', name))
+            elif self._accept('['):
+                expr = ('member', expr, self._expression())
+                self._expect(']')
+            elif self._accept('('):
+                expr = ('call', expr, self._list(')'))
+            else:
+                return expr
+
 
 class JSInterpreter(object):
     def __init__(self, code, objects=None):
@@ -234,6 +438,8 @@ class JSInterpreter(object):
         return obj
 
     def extract_function(self, funcname):
+        if funcname in self._functions:
+            return self._functions[funcname]
         func_m = re.search(
             r'''(?x)
                 (?:function\s+%s|[{;,]\s*%s\s*=\s*function|var\s+%s\s*=\s*function)\s*
@@ -245,13 +451,20 @@ class JSInterpreter(object):
             raise ExtractorError('Could not find JS function %r' % funcname)
         argnames = func_m.group('args').split(',')
 
-        return self.build_function(argnames, func_m.group('code'))
+        func = self._functions[funcname] = self.build_function(argnames, func_m.group('code'))
+        return func
 
     def call_function(self, funcname, *args):
         f = self.extract_function(funcname)
         return f(args)
 
     def build_function(self, argnames, code):
+        try:
+            return self._compile_function(argnames, code)
+        except _CompileError:
+            # Fall back to interpreting the statements on every call
+            pass
+
         def resf(args):
             local_vars = dict(zip(argnames, args))
             for stmt in code.split(';'):
@@ -260,3 +473,157 @@ class JSInterpreter(object):
                     break
             return res
         return resf
+
+    def _compile_function(self, argnames, code):
+        argnames = [argname.strip() for argname in argnames]
+        statements = [
+            (kind == 'return', self._compile(expr))
+            for kind, expr in _Parser(code).parse_body()]
+
+        def resf(args):
+            local_vars = dict(zip(argnames, args))
+            for is_return, stmt in statements:
+                res = stmt(local_vars)
+                if is_return:
+                    return res
+            return None
+        return resf
+
+    def _get_object(self, name):
+        if name not in self._objects:
+            self._objects[name] = self.extract_object(name)
+        return self._objects[name]
+
+    def _compile(self, node):
+        """Compile an AST node into a function of the local variables"""
+        kind = node[0]
+
+        if kind == 'const':
+            value = node[1]
+            return lambda local_vars: value
+
+        if kind == 'name':
+            name = node[1]
+
+            def load_name(local_vars):
+                if name in local_vars:
+                    return local_vars[name]
+                return self._get_object(name)
+            return load_name
+
+        if kind == 'array':
+            items = [self._compile(item) for item in node[1]]
+            return lambda local_vars: [item(local_vars) for item in items]
+
+        if kind == 'seq':
+            exprs = [self._compile(expr) for expr in node[1]]
+
+            def run_seq(local_vars):
+                res = None
+                for expr in exprs:
+                    res = expr(local_vars)
+                return res
+            return run_seq
+
+        if kind == 'unary':
+            opfunc = _UNARY_OPERATORS[node[1]]
+            operand = self._compile(node[2])
+            return lambda local_vars: opfunc(operand(local_vars))
+
+        if kind == 'binary':
+            opfunc = _BINARY_OPERATORS[node[1]]
+            left = self._compile(node[2])
+            right = self._compile(node[3])
+            return lambda local_vars: opfunc(left(local_vars), right(local_vars))
+
+        if kind == 'member':
+            obj = self._compile(node[1])
+            member = self._compile(node[2])
+            return lambda local_vars: self._get_member(obj(local_vars), member(local_vars))
+
+        if kind == 'call':
+            return self._compile_call(node[1], [self._compile(arg) for arg in node[2]])
+
+        if kind == 'assign':
+            return self._compile_assign(
+                _ASSIGN_OPERATOR_FUNCS[node[1]], node[2], self._compile(node[3]))
+
+        raise _CompileError('Unsupported AST node %r' % kind)
+
+    @staticmethod
+    def _get_member(obj, member):
+        if member == 'length' and not isinstance(obj, dict):
+            return len(obj)
+        if isinstance(member, float) and member.is_integer():
+            member = int(member)
+        return obj[member]
+
+    def _compile_assign(self, opfunc, target, value):
+        if target[0] == 'name':
+            name = target[1]
+
+            def assign_name(local_vars):
+                right_val = value(local_vars)
+                val = local_vars[name] = opfunc(local_vars.get(name), right_val)
+                return val
+            return assign_name
+
+        obj = self._compile(target[1])
+        index = self._compile(target[2])
+        compound = opfunc is not _ASSIGN_OPERATOR_FUNCS['=']
+
+        def assign_member(local_vars):
+            lvar = obj(local_vars)
+            idx = index(local_vars)
+            right_val = value(local_vars)
+            val = lvar[idx] = opfunc(lvar[idx] if compound else None, right_val)
+            return val
+        return assign_member
+
+    def _compile_call(self, callee, args):
+        def eval_args(local_vars):
+            return tuple(arg(local_vars) for arg in args)
+
+        if callee[0] == 'name':
+            fname = callee[1]
+
+            def call_name(local_vars):
+                func = local_vars.get(fname)
+                if func is None:
+                    func = self.extract_function(fname)
+                return func(eval_args(local_vars))
+            return call_name
+
+        if callee[0] != 'member':
+            raise _CompileError('Unsupported callee %r' % (callee, ))
+        obj_func = self._compile(callee[1])
+        member_func = self._compile(callee[2])
+
+        def call_member(local_vars):
+            obj = obj_func(local_vars)
+            member = member_func(local_vars)
+            argvals = eval_args(local_vars)
+            if isinstance(obj, dict):
+                return obj[member](argvals)
+            if member == 'split':
+                assert argvals == ('',)
+                return list(obj)
+            if member == 'join':
+                assert len(argvals) == 1
+                return argvals[0].join(obj)
+            if member == 'reverse':
+                assert len(argvals) == 0
+                obj.reverse()
+                return obj
+            if member == 'slice':
+                assert len(argvals) == 1
+                return obj[argvals[0]:]
+            if member == 'splice':
+                assert isinstance(obj, list)
+                index, howMany = argvals
+                res = []
+                for i in range(index, min(index + howMany, len(obj))):
+                    res.append(obj.pop(index))
+                return res
+            return obj[member](argvals)
+        return call_member
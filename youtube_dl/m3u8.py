@@ -0,0 +1,184 @@
+from __future__ import unicode_literals
+
+import re
+
+from .compat import compat_urlparse
+from .utils import (
+    float_or_none,
+    parse_m3u8_attributes,
+)
+
+
+# Relative URLs that resolve by appending them to the directory of the
+# playlist URL, i.e. without scheme, authority or dot segments
+_SIMPLE_RELATIVE_URL_RE = re.compile(r'[^:/?#.][^:/?#]*(?:/[^/?#.][^/?#]*)*(?:[?#]|$)')
+
+
+def _is_ad_segment_start(line):
+    return (line.startswith('#ANVATO-SEGMENT-INFO') and 'type=ad' in line
+            or line.startswith('#UPLYNK-SEGMENT') and line.endswith(',ad'))
+
+
+def _is_ad_segment_end(line):
+    return (line.startswith('#ANVATO-SEGMENT-INFO') and 'type=master' in line
+            or line.startswith('#UPLYNK-SEGMENT') and line.endswith(',segment'))
+
+
+class M3U8Parser(object):
+    """
+    Single-pass parser of m3u8 playlists (RFC 8216)
+
+    The playlist may be passed in pieces to feed() as it is downloaded,
+    close() returns the parsed playlist. Playlists are made of plain dicts
+    and lists so that extractors can pass them to the downloader in the
+    "hls_playlist" field of formats (see parse_m3u8()).
+    """
+
+    def __init__(self, base_url=None):
+        self._base_url = base_url
+        # Directory of base_url with a trailing slash
+        self._base_dir = compat_urlparse.urljoin(base_url, '_')[:-1] if base_url else None
+        self._buffer = ''
+        self._key = None
+        self._byte_range_end = 0
+        self._segment = {}
+        self._ad = False
+        self._media_sequence = 0
+        self.playlist = {
+            'target_duration': None,
+            'media_sequence': 0,
+            'playlist_type': None,
+            'endlist': False,
+            'segments': [],
+            'media': [],
+            'variants': [],
+        }
+
+    def _url(self, url):
+        if not self._base_url or url.startswith(('http://', 'https://')):
+            return url
+        # urljoin() takes most of the time of parsing long playlists
+        if _SIMPLE_RELATIVE_URL_RE.match(url):
+            return self._base_dir + url
+        return compat_urlparse.urljoin(self._base_url, url)
+
+    def feed(self, data):
+        lines = (self._buffer + data).split('\n')
+        self._buffer = lines.pop()
+        for line in lines:
+            self._parse_line(line.strip())
+
+    def close(self):
+        """Parse what is left and return the playlist"""
+        self._parse_line(self._buffer.strip())
+        self._buffer = ''
+        playlist = self.playlist
+        if playlist['target_duration'] is None:
+            # URIs of a master playlist are its variant streams
+            playlist['variants'] = [{
+                'url': segment['url'],
+                'stream_inf': segment.get('stream_inf', {}),
+            } for segment in playlist['segments']]
+            playlist['segments'] = []
+        return playlist
+
+    def _parse_line(self, line):
+        if not line:
+            return
+        if not line.startswith('#'):
+            segment = self._segment
+            self._segment = {}
+            segment.update({
+                'url': self._url(line),
+                'media_sequence': self._media_sequence,
+            })
+            if self._key is not None:
+                segment['key'] = self._key
+            if self._ad:
+                segment['ad'] = True
+            self._media_sequence += 1
+            self.playlist['segments'].append(segment)
+            return
+
+        tag, _, value = line.partition(':')
+        if tag == '#EXTINF':
+            duration, _, title = value.partition(',')
+            self._segment['duration'] = float_or_none(duration)
+            if title:
+                self._segment['title'] = title
+        elif tag == '#EXT-X-BYTERANGE':
+            length, _, start = value.partition('@')
+            start = int(start) if start else self._byte_range_end
+            self._byte_range_end = start + int(length)
+            self._segment['byte_range'] = {
+                'start': start,
+                'end': self._byte_range_end,
+            }
+        elif tag == '#EXT-X-KEY':
+            key = parse_m3u8_attributes(value)
+            if key.get('METHOD', 'NONE') == 'NONE':
+                self._key = None
+            else:
+                if 'URI' in key:
+                    key['URI'] = self._url(key['URI'])
+                self._key = key
+        elif tag == '#EXT-X-DISCONTINUITY':
+            self._segment['discontinuity'] = True
+        elif tag == '#EXT-X-MAP':
+            init = parse_m3u8_attributes(value)
+            if 'URI' in init:
+                init['URI'] = self._url(init['URI'])
+            self._segment['map'] = init
+        elif tag == '#EXT-X-MEDIA-SEQUENCE':
+            self.playlist['media_sequence'] = self._media_sequence = int(value)
+        elif tag == '#EXT-X-TARGETDURATION':
+            self.playlist['target_duration'] = float_or_none(value, default=0.0)
+        elif tag == '#EXT-X-ENDLIST':
+            self.playlist['endlist'] = True
+        elif tag == '#EXT-X-PLAYLIST-TYPE':
+            self.playlist['playlist_type'] = value
+        elif tag == '#EXT-X-STREAM-INF':
+            self._segment['stream_inf'] = parse_m3u8_attributes(value)
+        elif tag == '#EXT-X-MEDIA':
+            self.playlist['media'].append(parse_m3u8_attributes(value))
+        elif _is_ad_segment_start(line):
+            self._ad = True
+        elif _is_ad_segment_end(line):
+            self._ad = False
+
+
+def parse_m3u8(m3u8_doc, base_url=None):
+    """
+    Parse the m3u8 playlist m3u8_doc and return a dict with
+
+    target_duration: #EXT-X-TARGETDURATION, None for master playlists
+    media_sequence:  #EXT-X-MEDIA-SEQUENCE of the first segment
+    playlist_type:   #EXT-X-PLAYLIST-TYPE or None
+    endlist:         Whether the playlist has #EXT-X-ENDLIST
+    segments:        List of the media segments with
+                     * url: Absolute URL of the segment
+                     * media_sequence: Media sequence number of the segment
+                     * duration: (optional) #EXTINF duration in seconds
+                     * title: (optional) #EXTINF title
+                     * byte_range: (optional) Dict with start and end (not
+                       inclusive) of #EXT-X-BYTERANGE
+                     * key: (optional) Attributes of the #EXT-X-KEY the
+                       segment is encrypted with, with an absolute URI
+                     * map: (optional) Attributes of the #EXT-X-MAP preceding
+                       the segment, with an absolute URI
+                     * discontinuity: (optional) True after
+                       #EXT-X-DISCONTINUITY
+                     * ad: (optional) True for ad segments
+    media:           Attributes of the #EXT-X-MEDIA tags
+    variants:        List of the variant streams of master playlists, dicts
+                     with url and stream_inf, the #EXT-X-STREAM-INF attributes
+    """
+    parser = M3U8Parser(base_url)
+    parser.feed(m3u8_doc)
+    return parser.close()
+
+
+__all__ = [
+    'M3U8Parser',
+    'parse_m3u8',
+]
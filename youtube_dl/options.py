@@ -211,6 +211,18 @@ def parseOpts(overrideArguments=None):
         '--socket-timeout',
         dest='socket_timeout', type=float, default=None, metavar='SECONDS',
         help='Time to wait before giving up, in seconds')
+    network.add_option(
+        '--no-keep-alive',
+        action='store_false', dest='http_keep_alive', default=True,
+        help='Open a new connection for every HTTP request instead of reusing connections')
+    network.add_option(
+        '--keep-alive-timeout',
+        dest='keep_alive_timeout', type=float, default=None, metavar='SECONDS',
+        help='Close connections that have been idle for longer than SECONDS (default is 15)')
+    network.add_option(
+        '--max-connections-per-host',
+        dest='max_connections_per_host', type=int, default=None, metavar='N',
+        help='Maximum number of concurrent connections to the same host (default is 8)')
     network.add_option(
         '--source-address',
         metavar='IP', dest='source_address', default=None,
@@ -344,6 +356,11 @@ def parseOpts(overrideArguments=None):
         '--download-archive', metavar='FILE',
         dest='download_archive',
         help='Download only videos not listed in the archive file. Record the IDs of all downloaded videos in it.')
+    selection.add_option(
+        '--download-archive-format', metavar='FORMAT',
+        dest='download_archive_format', default='text', choices=('text', 'sqlite'),
+        help='Format of the archive file: "text" (default, one video ID per line) or "sqlite" '
+             '(a SQLite database that may be safely shared by several concurrent youtube-dl processes)')
     selection.add_option(
         '--include-ads',
         dest='include_ads', action='store_true',
@@ -453,7 +470,12 @@ def parseOpts(overrideArguments=None):
     downloader.add_option(
         '-r', '--limit-rate', '--rate-limit',
         dest='ratelimit', metavar='RATE',
-        help='Maximum download rate in bytes per second (e.g. 50K or 4.2M)')
+        help='Maximum download rate in bytes per second (e.g. 50K or 4.2M), '
+             'shared by all concurrent downloads and connections')
+    downloader.add_option(
+        '--limit-rate-per-host',
+        dest='ratelimit_per_host', metavar='RATE',
+        help='Maximum download rate from each host in bytes per second (e.g. 50K or 4.2M)')
     downloader.add_option(
         '-R', '--retries',
         dest='retries', metavar='RETRIES', default=10,
@@ -473,7 +495,19 @@ def parseOpts(overrideArguments=None):
     downloader.add_option(
         '--keep-fragments',
         action='store_true', dest='keep_fragments', default=False,
-        help='Keep downloaded fragments on disk after downloading is finished; fragments are erased by default')
+        help='Keep downloaded fragments on disk after downloading is finished; by default fragments are not written to separate files')
+    downloader.add_option(
+        '--concurrent-fragments',
+        dest='concurrent_fragments', metavar='N', default=1, type=int,
+        help='Number of fragments to download concurrently (default is %default) (DASH, hlsnative and ISM)')
+    downloader.add_option(
+        '--jobs',
+        dest='jobs', metavar='N', default=1, type=int,
+        help='Number of URLs and playlist entries to download concurrently (default is %default)')
+    downloader.add_option(
+        '--jobs-per-host',
+        dest='jobs_per_host', metavar='N', default=None, type=int,
+        help='Maximum number of concurrent downloads from the same host (default is no limit)')
     downloader.add_option(
         '--buffer-size',
         dest='buffersize', metavar='SIZE', default='1024',
@@ -487,6 +521,11 @@ def parseOpts(overrideArguments=None):
         dest='http_chunk_size', metavar='SIZE', default=None,
         help='Size of a chunk for chunk-based HTTP downloading (e.g. 10485760 or 10M) (default is disabled). '
              'May be useful for bypassing bandwidth throttling imposed by a webserver (experimental)')
+    downloader.add_option(
+        '--http-chunks',
+        dest='http_chunks', metavar='N', default=1, type=int,
+        help='Number of connections to download a file over HTTP at once, each fetching a range of it '
+             '(default is %default)')
     downloader.add_option(
         '--test',
         action='store_true', dest='test', default=False,
@@ -499,6 +538,11 @@ def parseOpts(overrideArguments=None):
         '--playlist-random',
         action='store_true',
         help='Download playlist videos in random order')
+    downloader.add_option(
+        '--lazy-playlist',
+        action='store_true', dest='lazy_playlist', default=False,
+        help='Download playlist videos while the playlist is still being collected, '
+             'fetching its pages only as needed (not used with --playlist-reverse and --playlist-random)')
     downloader.add_option(
         '--xattr-set-filesize',
         dest='xattr_set_filesize', action='store_true',
@@ -506,7 +550,7 @@ def parseOpts(overrideArguments=None):
     downloader.add_option(
         '--hls-prefer-native',
         dest='hls_prefer_native', action='store_true', default=None,
-        help='Use the native HLS downloader instead of ffmpeg')
+        help='Use the native HLS downloader instead of ffmpeg, also for live streams')
     downloader.add_option(
         '--hls-prefer-ffmpeg',
         dest='hls_prefer_native', action='store_false', default=None,
@@ -639,6 +683,14 @@ def parseOpts(overrideArguments=None):
         '--newline',
         action='store_true', dest='progress_with_newline', default=False,
         help='Output progress bar as new lines')
+    verbosity.add_option(
+        '--progress-rate',
+        dest='progress_rate', metavar='HZ', default=10, type=float,
+        help='Maximum number of progress updates per second (default is %default), 0 for every update')
+    verbosity.add_option(
+        '--progress-fd',
+        dest='progress_fd', metavar='FD', default=None, type=int,
+        help='Also write progress updates as newline-delimited JSON objects to file descriptor FD')
     verbosity.add_option(
         '--no-progress',
         action='store_true', dest='noprogress', default=False,
@@ -763,6 +815,14 @@ def parseOpts(overrideArguments=None):
     filesystem.add_option(
         '--no-cache-dir', action='store_const', const=False, dest='cachedir',
         help='Disable filesystem caching')
+    filesystem.add_option(
+        '--info-cache-ttl', dest='info_cache_ttl', type=float, default=None, metavar='SECONDS',
+        help='Cache extraction results of videos and reuse them for SECONDS (or until their media URLs expire) '
+             'instead of extracting the videos again (disabled by default)')
+    filesystem.add_option(
+        '--cache-max-size', dest='cache_max_size', default=None, metavar='SIZE',
+        help='Remove the least recently used cache files once the cache directory grows larger than SIZE '
+             '(e.g. 50k or 44.6m, 0 for no limit, default 256m)')
     filesystem.add_option(
         '--rm-cache-dir',
         action='store_true', dest='rm_cachedir',
@@ -842,6 +902,17 @@ def parseOpts(overrideArguments=None):
         help='Automatically correct known faults of the file. '
              'One of never (do nothing), warn (only emit a warning), '
              'detect_or_warn (the default; fix file if we can, warn otherwise)')
+    postproc.add_option(
+        '--stream-postprocess',
+        action='store_true', dest='stream_postprocess', default=False,
+        help='Merge formats and fix up downloads with ffmpeg while they are downloaded, '
+             'instead of rewriting the files once downloaded, when they can be read without seeking. '
+             'Such downloads cannot be resumed')
+    postproc.add_option(
+        '--postprocessor-workers',
+        dest='postprocessor_workers', metavar='N', default=None, type=int,
+        help='Post-process downloaded files in N threads while the next files are downloaded, '
+             'instead of before downloading them. --exec commands still run in download order')
     postproc.add_option(
         '--prefer-avconv',
         action='store_false', dest='prefer_ffmpeg',
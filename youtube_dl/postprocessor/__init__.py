@@ -10,6 +10,7 @@ from .ffmpeg import (
     FFmpegFixupM4aPP,
     FFmpegMergerPP,
     FFmpegMetadataPP,
+    FFmpegStreamer,
     FFmpegVideoConvertorPP,
     FFmpegSubtitlesConvertorPP,
 )
@@ -33,6 +34,7 @@ __all__ = [
     'FFmpegMergerPP',
     'FFmpegMetadataPP',
     'FFmpegPostProcessor',
+    'FFmpegStreamer',
     'FFmpegSubtitlesConvertorPP',
     'FFmpegVideoConvertorPP',
     'MetadataFromTitlePP',
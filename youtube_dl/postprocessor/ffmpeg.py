@@ -1,14 +1,21 @@
 from __future__ import unicode_literals
 
+import errno
+import hashlib
 import io
 import os
+import shutil
 import subprocess
+import sys
+import tempfile
+import threading
 import time
 import re
 
 
 from .common import AudioConversionError, PostProcessor
 
+from ..compat import compat_getenv
 from ..utils import (
     encodeArgument,
     encodeFilename,
@@ -23,6 +30,11 @@ from ..utils import (
     replace_extension,
 )
 
+try:
+    import fcntl
+except ImportError:  # Not a POSIX system
+    fcntl = None
+
 
 EXT_TO_OUT_FORMATS = {
     'aac': 'adts',
@@ -51,6 +63,24 @@ class FFmpegPostProcessorError(PostProcessingError):
     pass
 
 
+def _find_executable(path):
+    """Return the absolute path of the file that running path (a path or a
+    name to look up on PATH) would execute, None if there is none"""
+    exts = ['']
+    if sys.platform == 'win32':
+        exts += (compat_getenv('PATHEXT') or '.EXE').split(os.pathsep)
+    if os.path.dirname(path):
+        dirs = ['']
+    else:
+        dirs = (compat_getenv('PATH') or os.defpath).split(os.pathsep)
+    for d in dirs:
+        for ext in exts:
+            fn = os.path.join(d, path + ext)
+            if os.path.isfile(fn) and os.access(fn, os.X_OK):
+                return os.path.abspath(fn)
+    return None
+
+
 class FFmpegPostProcessor(PostProcessor):
     def __init__(self, downloader=None):
         PostProcessor.__init__(self, downloader)
@@ -72,29 +102,21 @@ class FFmpegPostProcessor(PostProcessor):
     def get_versions(downloader=None):
         return FFmpegPostProcessor(downloader)._versions
 
+    # Paths and versions of the programs by ffmpeg location (None for PATH),
+    # shared by all the instances of the process
+    _executables = {}
+    _executables_lock = threading.Lock()
+
     def _determine_executables(self):
         programs = ['avprobe', 'avconv', 'ffmpeg', 'ffprobe']
         prefer_ffmpeg = True
 
-        def get_ffmpeg_version(path):
-            ver = get_exe_version(path, args=['-version'])
-            if ver:
-                regexs = [
-                    r'(?:\d+:)?([0-9.]+)-[0-9]+ubuntu[0-9.]+$',  # Ubuntu, see [1]
-                    r'n([0-9.]+)$',  # Arch Linux
-                    # 1. http://www.ducea.com/2006/06/17/ubuntu-package-version-naming-explanation/
-                ]
-                for regex in regexs:
-                    mobj = re.match(regex, ver)
-                    if mobj:
-                        ver = mobj.group(1)
-            return ver
-
         self.basename = None
         self.probe_basename = None
 
         self._paths = None
         self._versions = None
+        location = None
         if self._downloader:
             prefer_ffmpeg = self._downloader.params.get('prefer_ffmpeg', True)
             location = self._downloader.params.get('ffmpeg_location')
@@ -118,14 +140,13 @@ class FFmpegPostProcessor(PostProcessor):
                     if basename in ('ffmpeg', 'ffprobe'):
                         prefer_ffmpeg = True
 
-                self._paths = dict(
-                    (p, os.path.join(location, p)) for p in programs)
-                self._versions = dict(
-                    (p, get_ffmpeg_version(self._paths[p])) for p in programs)
-        if self._versions is None:
-            self._versions = dict(
-                (p, get_ffmpeg_version(p)) for p in programs)
-            self._paths = dict((p, p) for p in programs)
+        with FFmpegPostProcessor._executables_lock:
+            executables = FFmpegPostProcessor._executables.get(location)
+            if executables is None:
+                executables = self._probe_executables(programs, location)
+                FFmpegPostProcessor._executables[location] = executables
+        paths, versions = executables
+        self._paths, self._versions = dict(paths), dict(versions)
 
         if prefer_ffmpeg is False:
             prefs = ('avconv', 'ffmpeg')
@@ -145,6 +166,57 @@ class FFmpegPostProcessor(PostProcessor):
                 self.probe_basename = p
                 break
 
+    @staticmethod
+    def _get_ffmpeg_version(path):
+        ver = get_exe_version(path, args=['-version'])
+        if ver:
+            regexs = [
+                r'(?:\d+:)?([0-9.]+)-[0-9]+ubuntu[0-9.]+$',  # Ubuntu, see [1]
+                r'n([0-9.]+)$',  # Arch Linux
+                # 1. http://www.ducea.com/2006/06/17/ubuntu-package-version-naming-explanation/
+            ]
+            for regex in regexs:
+                mobj = re.match(regex, ver)
+                if mobj:
+                    ver = mobj.group(1)
+        return ver
+
+    def _probe_executables(self, programs, location):
+        """
+        Return the paths and the versions of programs in the location
+        directory (on PATH if None).
+
+        Versions are kept in the cache along with the file and modification
+        time of each executable, only the executables that changed since are
+        run to find out their versions.
+        """
+        if location is None:
+            paths = dict((p, p) for p in programs)
+        else:
+            paths = dict((p, os.path.join(location, p)) for p in programs)
+
+        # FFmpegFD passes itself as the downloader
+        ydl = getattr(self._downloader, 'ydl', self._downloader)
+        cache = getattr(ydl, 'cache', None)
+        cache_key = 'versions-%s' % hashlib.sha1(
+            repr(location).encode('utf-8')).hexdigest()
+        cached = (cache.load('ffmpeg', cache_key) if cache else None) or {}
+
+        versions = {}
+        entries = {}
+        for p in programs:
+            exe = _find_executable(paths[p])
+            stamp = [exe, os.path.getmtime(exe)] if exe else None
+            entry = cached.get(p)
+            if entry is not None and entry['stamp'] == stamp:
+                versions[p] = entry['version']
+            else:
+                versions[p] = self._get_ffmpeg_version(paths[p])
+            entries[p] = {'stamp': stamp, 'version': versions[p]}
+        if cache and entries != cached:
+            cache.store('ffmpeg', cache_key, entries)
+        return paths, versions
+
     @property
     def available(self):
         return self.basename is not None
@@ -241,6 +313,69 @@ class FFmpegPostProcessor(PostProcessor):
     def run_ffmpeg(self, path, out_path, opts):
         self.run_ffmpeg_multiple_files([path], out_path, opts)
 
+    def plan(self, info, first_input=1):
+        """
+        Return what running the postprocessor on info takes as an ffmpeg
+        step, so that the steps of consecutive postprocessors can be run by
+        a single ffmpeg invocation (see plan_ffmpeg_steps() and run_steps()).
+        None if the postprocessor has to be run on its own, as are
+        subclasses that override run() but not plan().
+
+        Steps must leave info as it is. They are dicts with the optional
+        fields:
+        message:  What the step does, to show on screen
+        merge:    Files that are the input instead of info['filepath'],
+                  only for the first step of an invocation
+        inputs:   Files to read besides the file, they get the input
+                  indices from first_input on
+        maps:     Stream selection options, at most one step of an
+                  invocation may select streams
+        copy:     Whether streams are copied rather than encoded
+        opts:     Other output options
+        delete:   Files that can be deleted once done
+        cleanup:  Temporary files to remove once done
+        A step without merge, maps, copy and opts does nothing.
+        """
+        return None
+
+    def run_steps(self, info, steps):
+        """Run the steps planned for info with a single ffmpeg invocation,
+        return the files that can be deleted and info like run()"""
+        for step in steps:
+            if step.get('message'):
+                self._downloader.to_screen(step['message'])
+        steps = [
+            step for step in steps
+            if any(step.get(key) for key in ('merge', 'maps', 'copy', 'opts'))]
+        if not steps:
+            return [], info
+
+        filename = info['filepath']
+        input_paths = list(steps[0].get('merge') or [filename])
+        maps = []
+        opts = []
+        for step in steps:
+            input_paths.extend(step.get('inputs', []))
+            maps.extend(step.get('maps', []))
+            opts.extend(step.get('opts', []))
+        # Codecs of specific streams have to come after the one for all the
+        # streams to apply
+        if any(step.get('copy') for step in steps):
+            opts = ['-c', 'copy'] + opts
+
+        temp_filename = prepend_extension(filename, 'temp')
+        self.run_ffmpeg_multiple_files(input_paths, temp_filename, maps + opts)
+        if not steps[0].get('merge'):
+            os.remove(encodeFilename(filename))
+        os.rename(encodeFilename(temp_filename), encodeFilename(filename))
+
+        files_to_delete = []
+        for step in steps:
+            for cleanup_filename in step.get('cleanup', []):
+                os.remove(encodeFilename(cleanup_filename))
+            files_to_delete.extend(step.get('delete', []))
+        return files_to_delete, info
+
     def _ffmpeg_filename_argument(self, fn):
         # Always use 'file:' because the filename may contain ':' (ffmpeg
         # interprets that as a protocol) or can start with '-' (-- is broken in
@@ -249,6 +384,40 @@ class FFmpegPostProcessor(PostProcessor):
         return 'file:' + fn if fn != '-' else fn
 
 
+def _plans_run(pp):
+    """Whether pp.plan() describes what pp.run() does, that is whether run()
+    is not overridden by a subclass of the class defining plan()"""
+    mro = type(pp).__mro__
+    plan_cls = next((cls for cls in mro if 'plan' in vars(cls)), None)
+    run_cls = next((cls for cls in mro if 'run' in vars(cls)), None)
+    return plan_cls is not None and run_cls is not None and issubclass(plan_cls, run_cls)
+
+
+def plan_ffmpeg_steps(pps, info):
+    """
+    Plan the longest run of postprocessors at the start of pps that can be
+    done by a single ffmpeg invocation, see FFmpegPostProcessor.plan().
+
+    Returns the steps to pass to run_steps() of the first postprocessor,
+    [] if it has to be run on its own.
+    """
+    steps = []
+    first_input = 1
+    for pp in pps:
+        step = pp.plan(info, first_input) if _plans_run(pp) else None
+        if step is None:
+            break
+        if steps and step.get('merge'):
+            break
+        if step.get('maps') and any(s.get('maps') for s in steps):
+            break
+        if step.get('merge'):
+            first_input = len(step['merge'])
+        first_input += len(step.get('inputs', []))
+        steps.append(step)
+    return steps
+
+
 class FFmpegExtractAudioPP(FFmpegPostProcessor):
     def __init__(self, downloader=None, preferredcodec=None, preferredquality=None, nopostoverwrites=False):
         FFmpegPostProcessor.__init__(self, downloader)
@@ -377,20 +546,21 @@ class FFmpegVideoConvertorPP(FFmpegPostProcessor):
 
 class FFmpegEmbedSubtitlePP(FFmpegPostProcessor):
     def run(self, information):
+        return self.run_steps(information, [self.plan(information)])
+
+    def plan(self, information, first_input=1):
         if information['ext'] not in ('mp4', 'webm', 'mkv'):
-            self._downloader.to_screen('[ffmpeg] Subtitles can only be embedded in mp4, webm or mkv files')
-            return [], information
+            return {'message': '[ffmpeg] Subtitles can only be embedded in mp4, webm or mkv files'}
         subtitles = information.get('requested_subtitles')
         if not subtitles:
-            self._downloader.to_screen('[ffmpeg] There aren\'t any subtitles to embed')
-            return [], information
+            return {'message': '[ffmpeg] There aren\'t any subtitles to embed'}
 
         filename = information['filepath']
 
         ext = information['ext']
         sub_langs = []
         sub_filenames = []
-        webm_vtt_warn = False
+        messages = []
 
         for lang, sub_info in subtitles.items():
             sub_ext = sub_info['ext']
@@ -398,18 +568,14 @@ class FFmpegEmbedSubtitlePP(FFmpegPostProcessor):
                 sub_langs.append(lang)
                 sub_filenames.append(subtitles_filename(filename, lang, sub_ext, ext))
             else:
-                if not webm_vtt_warn and ext == 'webm' and sub_ext != 'vtt':
-                    webm_vtt_warn = True
-                    self._downloader.to_screen('[ffmpeg] Only WebVTT subtitles can be embedded in webm files')
+                if not messages and ext == 'webm' and sub_ext != 'vtt':
+                    messages.append('[ffmpeg] Only WebVTT subtitles can be embedded in webm files')
 
         if not sub_langs:
-            return [], information
+            return {'message': '\n'.join(messages)}
 
-        input_files = [filename] + sub_filenames
-
-        opts = [
+        maps = [
             '-map', '0',
-            '-c', 'copy',
             # Don't copy the existing subtitles, we may be running the
             # postprocessor a second time
             '-map', '-0:s',
@@ -417,24 +583,30 @@ class FFmpegEmbedSubtitlePP(FFmpegPostProcessor):
             # https://trac.ffmpeg.org/ticket/6016)
             '-map', '-0:d',
         ]
+        opts = []
         if information['ext'] == 'mp4':
             opts += ['-c:s', 'mov_text']
         for (i, lang) in enumerate(sub_langs):
-            opts.extend(['-map', '%d:0' % (i + 1)])
+            maps.extend(['-map', '%d:0' % (first_input + i)])
             lang_code = ISO639Utils.short2long(lang) or lang
             opts.extend(['-metadata:s:s:%d' % i, 'language=%s' % lang_code])
 
-        temp_filename = prepend_extension(filename, 'temp')
-        self._downloader.to_screen('[ffmpeg] Embedding subtitles in \'%s\'' % filename)
-        self.run_ffmpeg_multiple_files(input_files, temp_filename, opts)
-        os.remove(encodeFilename(filename))
-        os.rename(encodeFilename(temp_filename), encodeFilename(filename))
-
-        return sub_filenames, information
+        messages.append('[ffmpeg] Embedding subtitles in \'%s\'' % filename)
+        return {
+            'message': '\n'.join(messages),
+            'inputs': sub_filenames,
+            'maps': maps,
+            'copy': True,
+            'opts': opts,
+            'delete': sub_filenames,
+        }
 
 
 class FFmpegMetadataPP(FFmpegPostProcessor):
     def run(self, info):
+        return self.run_steps(info, [self.plan(info)])
+
+    def plan(self, info, first_input=1):
         metadata = {}
 
         def add(meta_list, info_list=None):
@@ -473,18 +645,18 @@ class FFmpegMetadataPP(FFmpegPostProcessor):
         add('episode_sort', 'episode_number')
 
         if not metadata:
-            self._downloader.to_screen('[ffmpeg] There isn\'t any metadata to add')
-            return [], info
+            return {'message': '[ffmpeg] There isn\'t any metadata to add'}
 
         filename = info['filepath']
-        temp_filename = prepend_extension(filename, 'temp')
-        in_filenames = [filename]
+        step = {
+            'message': '[ffmpeg] Adding metadata to \'%s\'' % filename,
+        }
         options = []
 
         if info['ext'] == 'm4a':
             options.extend(['-vn', '-acodec', 'copy'])
         else:
-            options.extend(['-c', 'copy'])
+            step['copy'] = True
 
         for (name, value) in metadata.items():
             options.extend(['-metadata', '%s=%s' % (name, value)])
@@ -505,27 +677,25 @@ class FFmpegMetadataPP(FFmpegPostProcessor):
                     if chapter_title:
                         metadata_file_content += 'title=%s\n' % ffmpeg_escape(chapter_title)
                 f.write(metadata_file_content)
-                in_filenames.append(metadata_filename)
-                options.extend(['-map_metadata', '1'])
+                step['inputs'] = step['cleanup'] = [metadata_filename]
+                options.extend(['-map_metadata', '%d' % first_input])
 
-        self._downloader.to_screen('[ffmpeg] Adding metadata to \'%s\'' % filename)
-        self.run_ffmpeg_multiple_files(in_filenames, temp_filename, options)
-        if chapters:
-            os.remove(metadata_filename)
-        os.remove(encodeFilename(filename))
-        os.rename(encodeFilename(temp_filename), encodeFilename(filename))
-        return [], info
+        step['opts'] = options
+        return step
 
 
 class FFmpegMergerPP(FFmpegPostProcessor):
     def run(self, info):
-        filename = info['filepath']
-        temp_filename = prepend_extension(filename, 'temp')
-        args = ['-c', 'copy', '-map', '0:v:0', '-map', '1:a:0']
-        self._downloader.to_screen('[ffmpeg] Merging formats into "%s"' % filename)
-        self.run_ffmpeg_multiple_files(info['__files_to_merge'], temp_filename, args)
-        os.rename(encodeFilename(temp_filename), encodeFilename(filename))
-        return info['__files_to_merge'], info
+        return self.run_steps(info, [self.plan(info)])
+
+    def plan(self, info, first_input=1):
+        return {
+            'message': '[ffmpeg] Merging formats into "%s"' % info['filepath'],
+            'merge': info['__files_to_merge'],
+            'maps': ['-map', '0:v:0', '-map', '1:a:0'],
+            'copy': True,
+            'delete': info['__files_to_merge'],
+        }
 
     def can_merge(self):
         # TODO: figure out merge-capable ffmpeg version
@@ -547,54 +717,167 @@ class FFmpegMergerPP(FFmpegPostProcessor):
 
 class FFmpegFixupStretchedPP(FFmpegPostProcessor):
     def run(self, info):
+        return self.run_steps(info, [self.plan(info)])
+
+    def plan(self, info, first_input=1):
         stretched_ratio = info.get('stretched_ratio')
         if stretched_ratio is None or stretched_ratio == 1:
-            return [], info
+            return {}
 
-        filename = info['filepath']
-        temp_filename = prepend_extension(filename, 'temp')
+        return {
+            'message': '[ffmpeg] Fixing aspect ratio in "%s"' % info['filepath'],
+            'copy': True,
+            'opts': ['-aspect', '%f' % stretched_ratio],
+        }
 
-        options = ['-c', 'copy', '-aspect', '%f' % stretched_ratio]
-        self._downloader.to_screen('[ffmpeg] Fixing aspect ratio in "%s"' % filename)
-        self.run_ffmpeg(filename, temp_filename, options)
 
-        os.remove(encodeFilename(filename))
-        os.rename(encodeFilename(temp_filename), encodeFilename(filename))
+class FFmpegFixupM4aPP(FFmpegPostProcessor):
+    def run(self, info):
+        return self.run_steps(info, [self.plan(info)])
 
-        return [], info
+    def plan(self, info, first_input=1):
+        if info.get('container') != 'm4a_dash':
+            return {}
 
+        return {
+            'message': '[ffmpeg] Correcting container in "%s"' % info['filepath'],
+            'copy': True,
+            'opts': ['-f', 'mp4'],
+        }
 
-class FFmpegFixupM4aPP(FFmpegPostProcessor):
+
+class FFmpegFixupM3u8PP(FFmpegPostProcessor):
     def run(self, info):
-        if info.get('container') != 'm4a_dash':
-            return [], info
+        return self.run_steps(info, [self.plan(info)])
 
+    def plan(self, info, first_input=1):
         filename = info['filepath']
-        temp_filename = prepend_extension(filename, 'temp')
+        # Only the downloaded file can be probed, not the output of
+        # steps with other inputs planned before
+        if first_input != 1:
+            return None
+        if self.get_audio_codec(filename) != 'aac':
+            return {}
 
-        options = ['-c', 'copy', '-f', 'mp4']
-        self._downloader.to_screen('[ffmpeg] Correcting container in "%s"' % filename)
-        self.run_ffmpeg(filename, temp_filename, options)
+        return {
+            'message': '[ffmpeg] Fixing malformed AAC bitstream in "%s"' % filename,
+            'copy': True,
+            'opts': ['-f', 'mp4', '-bsf:a', 'aac_adtstoasc'],
+        }
 
-        os.remove(encodeFilename(filename))
-        os.rename(encodeFilename(temp_filename), encodeFilename(filename))
 
-        return [], info
+class FFmpegStreamer(FFmpegPostProcessor):
+    """
+    Runs ffmpeg on inputs that are written to it while they are being
+    downloaded (see FileDownloader.stream_to()), so that formats are merged
+    and fixed up in the same pass as the download rather than read back and
+    rewritten once downloaded.
 
+    A single input is read from stdin, several inputs from FIFOs, which
+    are only available on POSIX systems. Inputs must not need seeking.
+    """
 
-class FFmpegFixupM3u8PP(FFmpegPostProcessor):
-    def run(self, info):
-        filename = info['filepath']
-        if self.get_audio_codec(filename) == 'aac':
-            temp_filename = prepend_extension(filename, 'temp')
+    def __init__(self, downloader, out_path, opts, inputs=1):
+        FFmpegPostProcessor.__init__(self, downloader)
+        self._out_path = out_path
+        self._opts = opts
+        self._inputs = inputs
+        self._proc = None
+        self._fifo_dir = None
+        self._log = []
+        self._log_thread = None
 
-            options = ['-c', 'copy', '-f', 'mp4', '-bsf:a', 'aac_adtstoasc']
-            self._downloader.to_screen('[ffmpeg] Fixing malformed AAC bitstream in "%s"' % filename)
-            self.run_ffmpeg(filename, temp_filename, options)
+    @property
+    def supported(self):
+        return self.basename == 'ffmpeg' and (
+            self._inputs == 1 or (hasattr(os, 'mkfifo') and fcntl is not None))
 
-            os.remove(encodeFilename(filename))
-            os.rename(encodeFilename(temp_filename), encodeFilename(filename))
-        return [], info
+    def _fifo_path(self, index):
+        return os.path.join(self._fifo_dir, 'input%d' % index)
+
+    def start(self):
+        self.check_version()
+        if self._inputs == 1:
+            input_paths = ['pipe:0']
+        else:
+            self._fifo_dir = tempfile.mkdtemp(prefix='youtube-dl-')
+            input_paths = []
+            for index in range(self._inputs):
+                os.mkfifo(self._fifo_path(index))
+                input_paths.append(self._ffmpeg_filename_argument(self._fifo_path(index)))
+
+        cmd = [
+            encodeFilename(self.executable, True), encodeArgument('-y'),
+            encodeArgument('-loglevel'), encodeArgument('repeat+info')]
+        for path in input_paths:
+            cmd += [encodeArgument('-i'), encodeFilename(path, True)]
+        cmd += (
+            [encodeArgument(o) for o in self._opts + self._configuration_args()]
+            + [encodeFilename(self._ffmpeg_filename_argument(self._out_path), True)])
+
+        if self._downloader.params.get('verbose', False):
+            self._downloader.to_screen('[debug] ffmpeg command line: %s' % shell_quote(cmd))
+        self._proc = subprocess.Popen(
+            cmd, stdin=subprocess.PIPE, stdout=subprocess.PIPE, stderr=subprocess.STDOUT)
+
+        def read_log():
+            for line in iter(self._proc.stdout.readline, b''):
+                self._log.append(line)
+                del self._log[:-20]
+        self._log_thread = threading.Thread(target=read_log)
+        self._log_thread.daemon = True
+        self._log_thread.start()
+
+    def open_input(self, index):
+        """Return the binary file object to write the input index to"""
+        if self._inputs == 1:
+            return self._proc.stdin
+        # Opening a FIFO for writing blocks until it is opened for reading,
+        # poll instead so that the download fails if ffmpeg exits first
+        while True:
+            try:
+                fd = os.open(self._fifo_path(index), os.O_WRONLY | os.O_NONBLOCK)
+                break
+            except OSError as err:
+                if err.errno != errno.ENXIO:
+                    raise
+            if self._proc.poll() is not None:
+                raise IOError(errno.EPIPE, 'ffmpeg exited before reading its input')
+            time.sleep(0.05)
+        fcntl.fcntl(fd, fcntl.F_SETFL, fcntl.fcntl(fd, fcntl.F_GETFL) & ~os.O_NONBLOCK)
+        return os.fdopen(fd, 'wb')
+
+    def finish(self, success):
+        """
+        Wait for ffmpeg to finish writing the output once the inputs have
+        been downloaded, stop it if the download failed. The output is
+        removed unless ffmpeg succeeds, FFmpegPostProcessorError is raised if
+        it fails after a successful download.
+        """
+        try:
+            if not success:
+                # Inputs may never be opened
+                self._proc.kill()
+            try:
+                self._proc.stdin.close()
+            except (IOError, OSError):
+                pass
+            retcode = self._proc.wait()
+            self._log_thread.join()
+        finally:
+            if self._fifo_dir is not None:
+                shutil.rmtree(self._fifo_dir, True)
+        if success and retcode == 0:
+            return
+        try:
+            os.remove(encodeFilename(self._out_path))
+        except OSError:
+            pass
+        if success:
+            msgs = b''.join(self._log).decode('utf-8', 'replace').strip().split('\n')
+            if self._downloader.params.get('verbose', False):
+                self._downloader.to_screen('[debug] ' + '\n'.join(msgs[:-1]))
+            raise FFmpegPostProcessorError(msgs[-1])
 
 
 class FFmpegSubtitlesConvertorPP(FFmpegPostProcessor):
@@ -0,0 +1,284 @@
+from __future__ import unicode_literals
+
+import collections
+import sys
+import threading
+
+from .compat import compat_urllib_parse_urlparse
+
+
+def job_host(url):
+    """Return the key jobs for url are capped by"""
+    try:
+        return (compat_urllib_parse_urlparse(url).hostname or '').lower()
+    except (AttributeError, TypeError, ValueError):
+        return ''
+
+
+class _Job(object):
+    def __init__(self, batch, host, func, args):
+        self.batch = batch
+        self.host = host
+        self.func = func
+        self.args = args
+        self.result = None
+        self.done = False
+
+
+class _Batch(object):
+    def __init__(self):
+        self.remaining = 0
+        self.exc_info = None
+
+
+class JobScheduler(object):
+    """Run jobs in threads with a global and a per-host concurrency cap
+
+    run() takes a list of jobs, starts them as soon as the caps allow and
+    returns their results in order. Jobs may call run() themselves (e.g. a
+    playlist job running its entries); a job does not count against the
+    caps while it waits for its own jobs, so nesting cannot deadlock.
+
+    When a job raises, the pending jobs of its batch are dropped and the
+    exception is re-raised by run() once the running ones have finished.
+    """
+
+    def __init__(self, max_jobs, max_jobs_per_host=None):
+        self.max_jobs = max_jobs
+        self.max_jobs_per_host = max_jobs_per_host
+        self._cond = threading.Condition()
+        self._running = 0
+        self._host_running = collections.defaultdict(int)
+        self._pending = collections.deque()
+        self._local = threading.local()
+
+    def _can_start(self, host):
+        if self._running >= self.max_jobs:
+            return False
+        return not self.max_jobs_per_host or self._host_running[host] < self.max_jobs_per_host
+
+    def _start_jobs(self):
+        # Called with self._cond held
+        skipped = []
+        while self._pending and self._running < self.max_jobs:
+            job = self._pending.popleft()
+            if not self._can_start(job.host):
+                skipped.append(job)
+                continue
+            self._acquire(job.host)
+            thread = threading.Thread(target=self._run_job, args=(job, ))
+            thread.daemon = True
+            thread.start()
+        self._pending.extendleft(reversed(skipped))
+
+    def _acquire(self, host):
+        self._running += 1
+        self._host_running[host] += 1
+
+    def _release(self, host):
+        self._running -= 1
+        self._host_running[host] -= 1
+        if not self._host_running[host]:
+            del self._host_running[host]
+
+    def _finish(self, job):
+        # Called with self._cond held
+        job.done = True
+        job.batch.remaining -= 1
+
+    def _cancel(self, batch):
+        # Called with self._cond held
+        for job in [j for j in self._pending if j.batch is batch]:
+            self._pending.remove(job)
+            self._finish(job)
+
+    def _run_job(self, job):
+        self._local.job = job
+        exc_info = None
+        try:
+            job.result = job.func(*job.args)
+        except BaseException:
+            exc_info = sys.exc_info()
+        with self._cond:
+            self._release(job.host)
+            self._finish(job)
+            if exc_info is not None and job.batch.exc_info is None:
+                job.batch.exc_info = exc_info
+                self._cancel(job.batch)
+            self._start_jobs()
+            self._cond.notify_all()
+
+    def run(self, jobs):
+        """Run jobs, a list of (host, func, args) tuples, and return a list
+        of their results"""
+        batch = _Batch()
+        batch_jobs = [_Job(batch, host, func, args) for host, func, args in jobs]
+        current = getattr(self._local, 'job', None)
+        with self._cond:
+            batch.remaining = len(batch_jobs)
+            self._pending.extend(batch_jobs)
+            if current is not None:
+                # Let the jobs of this batch take our slot while we wait
+                self._release(current.host)
+            self._start_jobs()
+            try:
+                while batch.remaining:
+                    # Wake up periodically so that KeyboardInterrupt is
+                    # delivered on Python 2
+                    self._cond.wait(1)
+            except BaseException:
+                self._cancel(batch)
+                raise
+            finally:
+                if current is not None:
+                    # Take a slot back once the caps allow, jobs started
+                    # in the meantime may have taken ours
+                    while not self._can_start(current.host):
+                        self._cond.wait(1)
+                    self._acquire(current.host)
+        if batch.exc_info is not None:
+            exc_info = batch.exc_info
+            batch.exc_info = None
+            raise exc_info[1]
+        return [job.result for job in batch_jobs]
+
+
+class _Task(object):
+    def __init__(self, index, func, args, finish):
+        self.index = index
+        self.func = func
+        self.args = args
+        self.finish = finish
+        self.result = None
+        self.failed = False
+        self.exc_info = None
+
+
+class WorkerPool(object):
+    """Run tasks in the background in a bounded number of threads
+
+    submit() queues a task and returns; it blocks while as many tasks as
+    there are workers are waiting to start, so that the backlog stays
+    bounded. A task may have a finish function, called with its result
+    once it and all the tasks submitted before it are done, so that finish
+    functions run one at a time and in submission order.
+
+    When a task or a finish function raises, the waiting tasks are dropped.
+    The tasks submitted before it are still finished, the ones submitted
+    after it are not, and the exception is re-raised by the next submit()
+    or by join() once its turn has come.
+    """
+
+    def __init__(self, workers):
+        self.workers = workers
+        self._cond = threading.Condition()
+        self._running = 0
+        self._pending = collections.deque()
+        self._submitted = 0
+        # Index of the next task to finish and the tasks done before their
+        # turn, by index
+        self._next_finish = 0
+        self._done = {}
+        self._finishing = False
+        # Set from a failure until it has been re-raised; the tasks before
+        # _drop_until that come after the failure are not finished
+        self._failed = False
+        self._drop_until = 0
+        self._exc_info = None
+
+    def _start_tasks(self):
+        # Called with self._cond held
+        while self._pending and self._running < self.workers:
+            task = self._pending.popleft()
+            self._running += 1
+            thread = threading.Thread(target=self._run_task, args=(task, ))
+            thread.daemon = True
+            thread.start()
+
+    def _fail(self):
+        # Called with self._cond held
+        self._failed = True
+        while self._pending:
+            task = self._pending.popleft()
+            task.failed = True
+            self._done[task.index] = task
+
+    def _run_task(self, task):
+        try:
+            task.result = task.func(*task.args)
+        except BaseException:
+            task.failed = True
+            task.exc_info = sys.exc_info()
+            with self._cond:
+                if task.index >= self._drop_until:
+                    self._fail()
+        with self._cond:
+            self._running -= 1
+            self._done[task.index] = task
+            self._finish_tasks()
+            self._start_tasks()
+            self._cond.notify_all()
+
+    def _finish_tasks(self):
+        # Called with self._cond held, the finish functions are called
+        # without it by a single thread at a time
+        if self._finishing:
+            return
+        self._finishing = True
+        try:
+            while self._next_finish in self._done:
+                task = self._done.pop(self._next_finish)
+                if task.index < self._drop_until:
+                    # Came after a failure
+                    pass
+                elif task.exc_info is not None:
+                    self._fail_at(task.exc_info)
+                elif not task.failed and task.finish is not None:
+                    self._cond.release()
+                    try:
+                        task.finish(task.result)
+                    except BaseException:
+                        exc_info = sys.exc_info()
+                        self._cond.acquire()
+                        self._fail()
+                        self._fail_at(exc_info)
+                    else:
+                        self._cond.acquire()
+                self._next_finish += 1
+        finally:
+            self._finishing = False
+
+    def _fail_at(self, exc_info):
+        # Called with self._cond held when the failure has its turn to be
+        # finished; no task is submitted until it has been re-raised, so
+        # the ones submitted so far are not finished
+        self._drop_until = self._submitted
+        self._exc_info = exc_info
+
+    def _raise(self):
+        # Called with self._cond held
+        if self._exc_info is not None:
+            exc_info = self._exc_info
+            self._exc_info = None
+            self._failed = False
+            raise exc_info[1]
+
+    def submit(self, func, args=(), finish=None):
+        """Run func(*args) in the background, then finish(result)"""
+        with self._cond:
+            while ((len(self._pending) >= self.workers or self._failed)
+                   and self._exc_info is None):
+                # Wake up periodically so that KeyboardInterrupt is
+                # delivered on Python 2
+                self._cond.wait(1)
+            self._raise()
+            self._pending.append(_Task(self._submitted, func, args, finish))
+            self._submitted += 1
+            self._start_tasks()
+
+    def join(self):
+        """Wait for the submitted tasks to be finished"""
+        with self._cond:
+            while self._next_finish < self._submitted:
+                self._cond.wait(1)
+            self._raise()
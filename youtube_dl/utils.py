@@ -26,11 +26,13 @@ import os
 import platform
 import random
 import re
+import select
 import socket
 import ssl
 import subprocess
 import sys
 import tempfile
+import threading
 import time
 import traceback
 import xml.etree.ElementTree
@@ -2399,6 +2401,15 @@ class DownloadError(YoutubeDLError):
         self.exc_info = exc_info
 
 
+class DownloadCancelled(YoutubeDLError):
+    """Download Cancelled exception.
+
+    This exception is raised by FileDownloader objects whose download has
+    been cancelled from another thread, see FileDownloader.cancel().
+    """
+    pass
+
+
 class SameFileError(YoutubeDLError):
     """Same File exception.
 
@@ -2536,6 +2547,194 @@ def _create_http_connection(ydl_handler, http_class, is_https, *args, **kwargs):
     return hc
 
 
+class _PooledHTTPResponse(compat_http_client.HTTPResponse):
+    # Called once the response has been read completely or closed
+    _ytdl_release = None
+
+    def close(self):
+        if self.fp is not None and (self.chunked or self.length):
+            # Closed before being read completely, the rest of the response
+            # is still pending on the connection
+            self.will_close = True
+        compat_http_client.HTTPResponse.close(self)
+
+    def _close_conn(self):
+        release, self._ytdl_release = self._ytdl_release, None
+        compat_http_client.HTTPResponse._close_conn(self)
+        if release is not None:
+            release(not self.will_close)
+
+
+class HTTPConnectionPool(object):
+    """Pool of persistent HTTP(S) connections
+
+    Connections are kept per scheme, host, port and proxy and are reused for
+    later requests once the response has been read completely. At most
+    max_per_host connections are open per key, further requests wait for a
+    connection to become free (for at most _MAX_WAIT seconds, after which an
+    extra connection that is not kept is used). Connections idle for more
+    than idle_timeout seconds are closed.
+
+    Reuse relies on HTTPResponse._close_conn() (Python 3), with older
+    Pythons every request gets a new connection as before.
+    """
+
+    # Maximum time (in seconds) to wait for a free connection
+    _MAX_WAIT = 30
+
+    # Exceptions a request fails with when the connection breaks, see
+    # _is_dropped() for those retried on reused connections
+    _STALE_ERRORS = (
+        compat_http_client.BadStatusLine, compat_http_client.CannotSendRequest,
+        socket.error)
+
+    def __init__(self, max_per_host=8, idle_timeout=15):
+        self.max_per_host = max_per_host
+        self.idle_timeout = idle_timeout
+        self.enabled = hasattr(compat_http_client.HTTPResponse, '_close_conn')
+        self._cond = threading.Condition()
+        # key -> list of (connection, time it was released)
+        self._idle = {}
+        # key -> number of connections in use
+        self._busy = collections.defaultdict(int)
+
+    @staticmethod
+    def _is_stale(conn):
+        sock = conn.sock
+        if sock is None:
+            return True
+        try:
+            # An idle connection must not have anything to read, it is either
+            # closed by the server or out of sync
+            return bool(select.select([sock], [], [], 0)[0])
+        except (socket.error, ValueError):
+            return True
+
+    @staticmethod
+    def _is_dropped(err, sent):
+        """Whether err means that the server had closed the connection
+        before the request could be processed"""
+        if sent:
+            # Servers answer nothing on connections they have closed, timeouts
+            # and resets while waiting for the response may come after the
+            # request was processed
+            return isinstance(err, compat_http_client.BadStatusLine)
+        if isinstance(err, compat_http_client.CannotSendRequest):
+            return True
+        return (isinstance(err, socket.error)
+                and not isinstance(err, socket.timeout)
+                and err.errno in (errno.ECONNRESET, errno.EPIPE))
+
+    def _acquire(self, key, timeout):
+        deadline = None
+        with self._cond:
+            while True:
+                now = time.time()
+                idle = self._idle.get(key, [])
+                while idle:
+                    conn, released = idle.pop()
+                    if now - released > self.idle_timeout or self._is_stale(conn):
+                        conn.close()
+                        continue
+                    self._busy[key] += 1
+                    return conn, True
+                if self._busy[key] < self.max_per_host:
+                    self._busy[key] += 1
+                    return None, True
+                if deadline is None:
+                    deadline = now + self._MAX_WAIT
+                    if isinstance(timeout, (int, float)):
+                        deadline = min(deadline, now + timeout)
+                elif now >= deadline:
+                    # Do not wait forever for connections that are never released
+                    return None, False
+                self._cond.wait(min(deadline - now, 1))
+
+    def _release(self, key, conn, reusable):
+        with self._cond:
+            self._busy[key] -= 1
+            if reusable and conn.sock is not None:
+                self._idle.setdefault(key, []).append((conn, time.time()))
+            else:
+                conn.close()
+            self._cond.notify()
+
+    def close(self):
+        with self._cond:
+            for idle in self._idle.values():
+                for conn, _ in idle:
+                    conn.close()
+            self._idle.clear()
+
+    def do_open(self, handler, http_class, req, key, **http_conn_args):
+        """Replacement for AbstractHTTPHandler.do_open() reusing connections"""
+        host = req.host
+        if not host:
+            raise compat_urllib_error.URLError('no host given')
+        key = key + (host, req._tunnel_host)
+
+        headers = dict(req.unredirected_hdrs)
+        headers.update(dict(
+            (k, v) for k, v in req.headers.items() if k not in headers))
+        headers = dict((name.title(), val) for name, val in headers.items())
+        tunnel_headers = {}
+        if req._tunnel_host and 'Proxy-Authorization' in headers:
+            tunnel_headers['Proxy-Authorization'] = headers.pop('Proxy-Authorization')
+        request_kwargs = {}
+        if req.has_header('Transfer-encoding'):
+            request_kwargs['encode_chunked'] = True
+        # Only requests that can safely be sent twice are retried
+        idempotent = req.get_method() in ('GET', 'HEAD')
+
+        while True:
+            conn, pooled = self._acquire(key, req.timeout)
+            reused = conn is not None
+            if not reused:
+                conn = http_class(host, timeout=req.timeout, **http_conn_args)
+                conn.set_debuglevel(handler._debuglevel)
+                conn.response_class = _PooledHTTPResponse
+                if req._tunnel_host:
+                    conn.set_tunnel(req._tunnel_host, headers=tunnel_headers)
+            elif conn.sock is not None:
+                conn.timeout = req.timeout
+                conn.sock.settimeout(req.timeout)
+            if not pooled:
+                headers['Connection'] = 'close'
+            sent = False
+            try:
+                try:
+                    conn.request(
+                        req.get_method(), req.selector, req.data, headers,
+                        **request_kwargs)
+                    sent = True
+                    resp = conn.getresponse()
+                except self._STALE_ERRORS as err:
+                    if reused and idempotent and self._is_dropped(err, sent):
+                        if pooled:
+                            self._release(key, conn, False)
+                        continue
+                    if isinstance(err, compat_http_client.HTTPException):
+                        raise
+                    raise compat_urllib_error.URLError(err)
+            except Exception:
+                if pooled:
+                    self._release(key, conn, False)
+                else:
+                    conn.close()
+                raise
+            break
+
+        if pooled:
+            resp._ytdl_release = functools.partial(self._release, key, conn)
+            if resp.isclosed():
+                # Nothing to read (e.g. HEAD requests or empty bodies)
+                resp._ytdl_release = None
+                self._release(key, conn, not resp.will_close)
+        resp.url = req.get_full_url()
+        resp.msg = resp.reason
+        return resp
+
+
 def handle_youtubedl_headers(headers):
     filtered_headers = headers
 
@@ -2565,6 +2764,7 @@ class YoutubeDLHandler(compat_urllib_request.HTTPHandler):
     """
 
     def __init__(self, params, *args, **kwargs):
+        self._connection_pool = kwargs.pop('connection_pool', None)
         compat_urllib_request.HTTPHandler.__init__(self, *args, **kwargs)
         self._params = params
 
@@ -2576,9 +2776,12 @@ class YoutubeDLHandler(compat_urllib_request.HTTPHandler):
             conn_class = make_socks_conn_class(conn_class, socks_proxy)
             del req.headers['Ytdl-socks-proxy']
 
-        return self.do_open(functools.partial(
-            _create_http_connection, self, conn_class, False),
-            req)
+        http_class = functools.partial(
+            _create_http_connection, self, conn_class, False)
+        if self._connection_pool is not None and self._connection_pool.enabled:
+            return self._connection_pool.do_open(
+                self, http_class, req, ('http', socks_proxy))
+        return self.do_open(http_class, req)
 
     @staticmethod
     def deflate(data):
@@ -2714,6 +2917,7 @@ def make_socks_conn_class(base_class, socks_proxy):
 
 class YoutubeDLHTTPSHandler(compat_urllib_request.HTTPSHandler):
     def __init__(self, params, https_conn_class=None, *args, **kwargs):
+        self._connection_pool = kwargs.pop('connection_pool', None)
         compat_urllib_request.HTTPSHandler.__init__(self, *args, **kwargs)
         self._https_conn_class = https_conn_class or compat_http_client.HTTPSConnection
         self._params = params
@@ -2732,9 +2936,12 @@ class YoutubeDLHTTPSHandler(compat_urllib_request.HTTPSHandler):
             conn_class = make_socks_conn_class(conn_class, socks_proxy)
             del req.headers['Ytdl-socks-proxy']
 
-        return self.do_open(functools.partial(
-            _create_http_connection, self, conn_class, True),
-            req, **kwargs)
+        http_class = functools.partial(
+            _create_http_connection, self, conn_class, True)
+        if self._connection_pool is not None and self._connection_pool.enabled:
+            return self._connection_pool.do_open(
+                self, http_class, req, ('https', socks_proxy), **kwargs)
+        return self.do_open(http_class, req, **kwargs)
 
 
 class YoutubeDLCookieJar(compat_cookiejar.MozillaCookieJar):
@@ -3324,12 +3531,12 @@ else:
 
 class locked_file(object):
     def __init__(self, filename, mode, encoding=None):
-        assert mode in ['r', 'a', 'w']
+        assert mode in ['r', 'rb', 'a', 'ab', 'w', 'wb']
         self.f = io.open(filename, mode, encoding=encoding)
         self.mode = mode
 
     def __enter__(self):
-        exclusive = self.mode != 'r'
+        exclusive = self.mode not in ['r', 'rb']
         try:
             _lock_file(self.f, exclusive)
         except IOError:
@@ -3352,6 +3559,12 @@ class locked_file(object):
     def read(self, *args):
         return self.f.read(*args)
 
+    def seek(self, *args):
+        return self.f.seek(*args)
+
+    def tell(self):
+        return self.f.tell()
+
 
 def get_filesystem_encoding():
     encoding = sys.getfilesystemencoding()
@@ -3810,30 +4023,125 @@ class PagedList(object):
         # This is only useful for tests
         return len(self.getslice())
 
+    def getslice(self, start=0, end=None):
+        return list(self.iterslice(start, end))
+
+    def iterslice(self, start=0, end=None):
+        """Yield the entries from start to end, fetching pages only as they
+        are needed"""
+        raise NotImplementedError('This method must be implemented by subclasses')
+
+
+class _PageFetch(object):
+    """Fetch a page in a worker thread"""
+
+    def __init__(self, fetch, pagenum):
+        self._done = threading.Event()
+        self._result = None
+        self._exc_info = None
+        thread = threading.Thread(target=self._run, args=(fetch, pagenum))
+        thread.daemon = True
+        thread.start()
+
+    def _run(self, fetch, pagenum):
+        try:
+            self._result = fetch(pagenum)
+        except BaseException:
+            self._exc_info = sys.exc_info()
+        self._done.set()
+
+    def result(self):
+        while not self._done.is_set():
+            # Wake up periodically so that KeyboardInterrupt is delivered on
+            # Python 2
+            self._done.wait(1)
+        if self._exc_info is not None:
+            raise self._exc_info[1]
+        return self._result
+
+
+def _iter_pages(fetch, pagenums, ahead):
+    """Yield (pagenum, fetch(pagenum)) for each of pagenums, with up to ahead
+    of the following pages being fetched in worker threads meanwhile"""
+    if not ahead:
+        for pagenum in pagenums:
+            yield pagenum, fetch(pagenum)
+        return
+    pagenums = iter(pagenums)
+    pending = collections.deque()
+    while True:
+        while len(pending) <= ahead:
+            pagenum = next(pagenums, None)
+            if pagenum is None:
+                break
+            pending.append((pagenum, _PageFetch(fetch, pagenum)))
+        if not pending:
+            break
+        pagenum, page_fetch = pending.popleft()
+        yield pagenum, page_fetch.result()
+
+
+class _PageCache(object):
+    """Thread-safe page cache evicting the least recently used page once
+    more than size pages are cached (None for no limit)"""
+
+    def __init__(self, size=None):
+        self._size = size
+        self._pages = {}
+        self._order = collections.deque()
+        self._lock = threading.Lock()
+
+    def get(self, pagenum):
+        with self._lock:
+            page = self._pages.get(pagenum)
+            if page is not None and self._size is not None:
+                self._order.remove(pagenum)
+                self._order.append(pagenum)
+            return page
+
+    def set(self, pagenum, page):
+        with self._lock:
+            if self._size is None:
+                self._pages[pagenum] = page
+                return
+            if pagenum in self._pages:
+                self._order.remove(pagenum)
+            self._pages[pagenum] = page
+            self._order.append(pagenum)
+            while len(self._order) > self._size:
+                del self._pages[self._order.popleft()]
+
 
 class OnDemandPagedList(PagedList):
-    def __init__(self, pagefunc, pagesize, use_cache=True):
+    _prefetch = 0
+
+    def __init__(self, pagefunc, pagesize, use_cache=True, cache_size=None):
         self._pagefunc = pagefunc
         self._pagesize = pagesize
         self._use_cache = use_cache
         if use_cache:
-            self._cache = {}
+            self._cache = _PageCache(cache_size)
+
+    def _get_page(self, pagenum):
+        page_results = None
+        if self._use_cache:
+            page_results = self._cache.get(pagenum)
+        if page_results is None:
+            page_results = list(self._pagefunc(pagenum))
+            if self._use_cache:
+                self._cache.set(pagenum, page_results)
+        return page_results
 
-    def getslice(self, start=0, end=None):
-        res = []
-        for pagenum in itertools.count(start // self._pagesize):
+    def iterslice(self, start=0, end=None):
+        first_pagenum = start // self._pagesize
+        if end is None:
+            pagenums = itertools.count(first_pagenum)
+        else:
+            pagenums = range(first_pagenum, (end - 1) // self._pagesize + 1)
+        for pagenum, page_results in _iter_pages(
+                self._get_page, pagenums, self._prefetch):
             firstid = pagenum * self._pagesize
             nextfirstid = pagenum * self._pagesize + self._pagesize
-            if start >= nextfirstid:
-                continue
-
-            page_results = None
-            if self._use_cache:
-                page_results = self._cache.get(pagenum)
-            if page_results is None:
-                page_results = list(self._pagefunc(pagenum))
-            if self._use_cache:
-                self._cache[pagenum] = page_results
 
             startv = (
                 start % self._pagesize
@@ -3847,7 +4155,8 @@ class OnDemandPagedList(PagedList):
 
             if startv != 0 or endv is not None:
                 page_results = page_results[startv:endv]
-            res.extend(page_results)
+            for entry in page_results:
+                yield entry
 
             # A little optimization - if current page is not "full", ie. does
             # not contain page_size videos then we can assume that this page
@@ -3860,24 +4169,47 @@ class OnDemandPagedList(PagedList):
             # break out early as well
             if end == nextfirstid:
                 break
-        return res
+
+
+class PrefetchingOnDemandPagedList(OnDemandPagedList):
+    """OnDemandPagedList fetching the next prefetch pages in worker threads
+    while the current one is processed
+
+    Only the cache_size most recently used pages are cached so that memory
+    use does not grow with the length of the list. When the end of the list
+    is not known, up to prefetch pages past its last page may be requested.
+    """
+
+    def __init__(self, pagefunc, pagesize, prefetch=2, cache_size=16):
+        super(PrefetchingOnDemandPagedList, self).__init__(
+            pagefunc, pagesize, use_cache=bool(cache_size),
+            cache_size=cache_size)
+        self._prefetch = prefetch
 
 
 class InAdvancePagedList(PagedList):
-    def __init__(self, pagefunc, pagecount, pagesize):
+    """PagedList with a known number of pages, up to workers of which are
+    fetched at the same time"""
+
+    def __init__(self, pagefunc, pagecount, pagesize, workers=4):
         self._pagefunc = pagefunc
         self._pagecount = pagecount
         self._pagesize = pagesize
+        self._workers = workers
 
-    def getslice(self, start=0, end=None):
-        res = []
+    def _get_page(self, pagenum):
+        return list(self._pagefunc(pagenum))
+
+    def iterslice(self, start=0, end=None):
         start_page = start // self._pagesize
         end_page = (
-            self._pagecount if end is None else (end // self._pagesize + 1))
+            self._pagecount if end is None
+            else min(self._pagecount, (end - 1) // self._pagesize + 1))
         skip_elems = start - start_page * self._pagesize
         only_more = None if end is None else end - start
-        for pagenum in range(start_page, end_page):
-            page = list(self._pagefunc(pagenum))
+        for _, page in _iter_pages(
+                self._get_page, range(start_page, end_page),
+                max(self._workers - 1, 0)):
             if skip_elems:
                 page = page[skip_elems:]
                 skip_elems = None
@@ -3886,10 +4218,11 @@ class InAdvancePagedList(PagedList):
                     only_more -= len(page)
                 else:
                     page = page[:only_more]
-                    res.extend(page)
+                    for entry in page:
+                        yield entry
                     break
-            res.extend(page)
-        return res
+            for entry in page:
+                yield entry
 
 
 def uppercase_escape(s):